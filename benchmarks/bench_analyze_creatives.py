@@ -0,0 +1,87 @@
+"""
+Benchmark: vectorized CreativeAgent.analyze_creatives vs. the original iterrows loop.
+
+Usage:
+    python -m benchmarks.bench_analyze_creatives
+    python -m benchmarks.bench_analyze_creatives --sizes 10000 1000000 --loop-max 100000
+
+Rows come from the seeded synthetic generator (src/utils/synthetic_data.py),
+which reproduces the sample dataset's schema and distributions. The legacy loop is only timed up to
+--loop-max rows; above that its runtime is extrapolated from the measured per-row cost.
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from src.agents.creative_agent import CreativeAgent
+from src.utils.config_loader import load_config
+from src.utils.synthetic_data import generate_frame, load_profile
+
+
+def legacy_analyze(agent: CreativeAgent, df: pd.DataFrame):
+    """The original row-by-row implementation, kept here as the baseline."""
+    ctr_threshold = agent.config["thresholds"].get("low_ctr", 0.7)
+    roas_threshold = agent.config["thresholds"].get("low_roas", 1.5)
+    results = []
+    for idx, row in df.iterrows():
+        ctr = row.get("ctr", 0)
+        roas = row.get("roas", 0)
+        if ctr < ctr_threshold or roas < roas_threshold:
+            results.append({
+                "creative_id": row.get("ad_id", f"CR-{idx}"),
+                "campaign_name": row.get("campaign_name", "Unknown"),
+                "ctr": ctr,
+                "roas": roas,
+                "spend": row.get("spend", 0),
+                "identified_issue": agent.identify_issue(ctr, roas),
+            })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark CreativeAgent.analyze_creatives")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 1_000_000, 10_000_000])
+    parser.add_argument("--loop-max", type=int, default=100_000,
+                        help="Largest size for which the legacy loop is actually run.")
+    args = parser.parse_args()
+
+    config = load_config()
+    profile = load_profile(config["paths"]["data_path"])
+    seed = config["project"].get("seed", 42)
+
+    print(f"{'rows':>12} {'loop (s)':>12} {'vectorized (s)':>16} {'speedup':>10} {'flagged':>10}")
+    per_row_cost = None
+    for n_rows in args.sizes:
+        df = generate_frame(n_rows, seed=seed, profile=profile)
+        agent = CreativeAgent(config)
+        agent.data = df
+
+        start = time.perf_counter()
+        agent.analyze_creatives()
+        vectorized = time.perf_counter() - start
+
+        if n_rows <= args.loop_max:
+            start = time.perf_counter()
+            legacy_analyze(agent, df)
+            loop = time.perf_counter() - start
+            per_row_cost = loop / n_rows
+            loop_label = f"{loop:.3f}"
+        elif per_row_cost is not None:
+            loop = per_row_cost * n_rows
+            loop_label = f"~{loop:.1f}"
+        else:
+            loop, loop_label = None, "skipped"
+
+        speedup = f"{loop / vectorized:.0f}x" if loop else "-"
+        print(f"{n_rows:>12,} {loop_label:>12} {vectorized:>16.3f} {speedup:>10} "
+              f"{len(agent.underperformers):>10,}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Import-time benchmark for the CLI entry points.
+
+Runs `python -X importtime -c "import <module>"` in a fresh interpreter for
+each entry point, takes the module's cumulative import time (best of
+--repeats) and checks it against the "import_time" baselines in
+benchmarks/thresholds.json. It also fails when an entry point imports one of
+HEAVY_MODULES, which must only load once a pipeline stage needs them.
+
+Usage:
+    python -m benchmarks.import_time
+    python -m benchmarks.import_time --update     # record new baselines
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from benchmarks.suite import THRESHOLDS_PATH, load_thresholds
+
+ROOT = Path(__file__).resolve().parents[1]
+ENTRY_POINTS = ["src.run", "src.orchestrator"]
+HEAVY_MODULES = ["pandas", "numpy", "google.generativeai"]
+
+
+def measure(module: str) -> tuple:
+    """(cumulative import seconds of `module`, names of every module imported) in a fresh interpreter."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    )
+    seconds, imported = None, set()
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|", 2)
+        if not cumulative.strip().isdigit():
+            continue  # the header line
+        name = name.strip()
+        imported.add(name)
+        if name == module:
+            seconds = int(cumulative) / 1e6
+    return seconds, imported
+
+
+def run_suite(modules=ENTRY_POINTS, repeats: int = 5) -> dict:
+    """{module: {"seconds": best cumulative import time, "heavy": heavy modules it pulled in}}."""
+    results = {}
+    for module in modules:
+        runs = [measure(module) for _ in range(repeats)]
+        results[module] = {
+            "seconds": min(seconds for seconds, _ in runs),
+            "heavy": sorted(m for m in HEAVY_MODULES if m in runs[0][1]),
+        }
+    return results
+
+
+def check(results: dict, thresholds: dict) -> list:
+    """Problems as human-readable strings (heavy imports, or timings over their limit)."""
+    settings = thresholds.get("import_time", {})
+    tolerance = settings.get("tolerance", 2.0)
+    floor = settings.get("noise_floor_seconds", 0.05)
+    problems = []
+    for module, result in results.items():
+        if result["heavy"]:
+            problems.append(f"{module} imports {', '.join(result['heavy'])} at startup")
+        baseline = settings.get("baselines", {}).get(module)
+        if baseline is None:
+            continue
+        limit = max(baseline * tolerance, baseline + floor)
+        if result["seconds"] > limit:
+            problems.append(f"{module} took {result['seconds']:.4f}s to import (limit {limit:.4f}s)")
+    return problems
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check CLI import time and heavy imports")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--update", action="store_true", help="Write the timings as the new baselines")
+    args = parser.parse_args(argv)
+
+    results = run_suite(repeats=args.repeats)
+    thresholds = load_thresholds()
+    baselines = thresholds.get("import_time", {}).get("baselines", {})
+
+    print(f"{'module':<20} {'best (s)':>10} {'baseline':>10}  heavy imports")
+    for module, result in results.items():
+        baseline = baselines.get(module)
+        baseline_label = f"{baseline:.4f}" if baseline is not None else "-"
+        print(f"{module:<20} {result['seconds']:>10.4f} {baseline_label:>10}  {', '.join(result['heavy']) or '-'}")
+
+    if args.update:
+        settings = thresholds.setdefault("import_time", {"tolerance": 2.0, "noise_floor_seconds": 0.05})
+        settings.setdefault("baselines", {}).update({m: round(r["seconds"], 4) for m, r in results.items()})
+        THRESHOLDS_PATH.write_text(json.dumps(thresholds, indent=2) + "\n", encoding="utf-8")
+        print(f"Baselines written to {THRESHOLDS_PATH}")
+        return 0
+
+    problems = check(results, thresholds)
+    for problem in problems:
+        print(f"REGRESSION {problem}")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,252 @@
+"""
+Benchmark suite for the pipeline's hot paths on synthetic data.
+
+Times DataAgent.run (cold: CSV parse + summary), CreativeAgent.analyze_creatives,
+EvaluatorAgent.validate_hypotheses and ReportGenerator.generate_markdown_report
+at several dataset sizes with the LLM mocked out, and compares the best of
+--repeats runs against the baselines in benchmarks/thresholds.json. A timing
+more than `tolerance` times its baseline (and more than `noise_floor_seconds`
+above it, so sub-millisecond calls don't flap) is a regression and fails the run.
+`noise_floors` overrides the floor per benchmark, for calls that are cheap at
+every size and would otherwise never trip.
+
+Usage:
+    python -m benchmarks.suite                      # check against thresholds.json
+    python -m benchmarks.suite --sizes 10000 1000000
+    python -m benchmarks.suite --update             # record new baselines
+"""
+
+import argparse
+import copy
+import json
+import sys
+import tempfile
+import time
+from contextlib import ExitStack, contextmanager
+from pathlib import Path
+from unittest import mock
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from src.agents.creative_agent import CreativeAgent
+from src.agents.data_agent import DataAgent
+from src.agents.evaluator_agent import EvaluatorAgent
+from src.agents.report_generator import ReportGenerator
+from src.utils.config_loader import load_config
+from src.utils.data_loader import clear_datasets, read_dataset_csv
+from src.utils.synthetic_data import load_profile, write_csv
+
+THRESHOLDS_PATH = Path(__file__).with_name("thresholds.json")
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000]
+
+INSIGHTS = {
+    "summary": "ROAS declined over the period while CTR stayed flat.",
+    "hypotheses": [
+        {"id": "H1", "title": "Creative fatigue", "confidence": 0.7},
+        {"id": "H2", "title": "Rising auction competition", "confidence": 0.6},
+        {"id": "H3", "title": "Audience saturation", "confidence": 0.55},
+    ],
+}
+RECOMMENDATIONS = [
+    {"type": "Ad Copy", "headline": "All-day comfort", "primary_text": "Breathable cotton.", "cta": "Shop Now",
+     "rationale": "Lead with the comfort claim that drives CTR."},
+    {"type": "Visual Concept", "theme": "Lifestyle", "description": "Close-up fabric shots.",
+     "rationale": "Refresh a fatigued visual."},
+    {"type": "Targeting", "suggestion": "Exclude recent purchasers.", "rationale": "Cut wasted spend."},
+]
+CANNED_LLM_RESPONSE = json.dumps({
+    "tasks": [{"id": 1, "agent": "Data Agent", "action": "summarize"}],
+    "creative_recommendations": [],
+})
+
+
+@contextmanager
+def mock_llm():
+    """Replace the Gemini model with a canned, instant response."""
+    class _Response:
+        text = CANNED_LLM_RESPONSE
+
+    class _Model:
+        def __init__(self, *args, **kwargs):
+            pass
+
+        def generate_content(self, *args, **kwargs):
+            return _Response()
+
+    with mock.patch("google.generativeai.GenerativeModel", _Model), \
+            mock.patch.dict("os.environ", {"LLM_CACHE_BYPASS": "1"}):
+        yield
+
+
+class Workload:
+    """A synthetic dataset of one size plus the agent inputs derived from it."""
+
+    def __init__(self, config, n_rows: int, workdir: Path, profile: dict):
+        self.n_rows = n_rows
+        self.csv = write_csv(workdir / f"fb_ads_{n_rows}.csv", n_rows,
+                             seed=config["project"].get("seed", 42), profile=profile)
+        self.config = copy.deepcopy(config)
+        self.config["paths"]["data"] = str(self.csv)
+        self.config.setdefault("dataset", {}).update(cache=False, streaming=False, incremental=False)
+        self.frame = read_dataset_csv(self.csv)
+        self.report_path = workdir / f"report_{n_rows}.md"
+        self._summary = None
+
+    @property
+    def summary(self):
+        if self._summary is None:
+            self._summary = DataAgent(self.config).summarize_metrics(self.frame)
+        return self._summary
+
+
+def bench_data_agent_run(work: Workload):
+    clear_datasets()
+    agent = DataAgent(work.config)
+    return lambda: agent.run()
+
+
+def bench_analyze_creatives(work: Workload):
+    agent = CreativeAgent(work.config, data_path=str(work.csv))
+    agent.data = work.frame
+    return agent.analyze_creatives
+
+
+def bench_validate_hypotheses(work: Workload):
+    agent = EvaluatorAgent(work.config, data=work.frame)
+    summary = work.summary
+    return lambda: agent.validate_hypotheses(INSIGHTS, summary)
+
+
+def bench_generate_report(work: Workload):
+    creative = CreativeAgent(work.config, data_path=str(work.csv))
+    creative.data = work.frame
+    creative.analyze_creatives()
+    creative.aggregate_creatives()
+    analysis = creative._records(creative.creative_summary)
+    recommendations = [
+        {**c, "identified_issue": c.get("issue", "Low CTR"), "recommendations": RECOMMENDATIONS}
+        for c in creative.select_top_creatives()
+    ]
+    artifacts = {
+        "data_summary.json": work.summary,
+        "insights.json": INSIGHTS,
+        "evaluation_results.json": {"validated_hypotheses": EvaluatorAgent(work.config, data=work.frame)
+                                    .validate_hypotheses(INSIGHTS, work.summary)},
+        "creative_analysis.json": {"analysis": analysis},
+        "creatives.json": {"analysis": analysis, "creative_recommendations": recommendations},
+    }
+    generator = ReportGenerator(reports_dir=str(work.report_path.parent), output_file=str(work.report_path))
+    return lambda: generator.generate_markdown_report(artifacts=artifacts)
+
+
+# name -> setup(workload) returning the zero-argument callable to time
+BENCHMARKS = {
+    "DataAgent.run": bench_data_agent_run,
+    "CreativeAgent.analyze_creatives": bench_analyze_creatives,
+    "EvaluatorAgent.validate_hypotheses": bench_validate_hypotheses,
+    "ReportGenerator.generate_markdown_report": bench_generate_report,
+}
+
+
+def time_call(setup, work: Workload, repeats: int = 3) -> float:
+    """Best wall time over `repeats` runs, each with a fresh setup."""
+    best = float("inf")
+    for _ in range(repeats):
+        fn = setup(work)
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def load_thresholds(path=THRESHOLDS_PATH) -> dict:
+    if not Path(path).exists():
+        return {"tolerance": 2.0, "noise_floor_seconds": 0.05, "baselines": {}}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def check(results: dict, thresholds: dict) -> list:
+    """Regressions as (benchmark, rows, seconds, limit) for timings over their limit."""
+    tolerance = thresholds.get("tolerance", 2.0)
+    regressions = []
+    for name, by_size in results.items():
+        floor = thresholds.get("noise_floors", {}).get(name, thresholds.get("noise_floor_seconds", 0.05))
+        for rows, seconds in by_size.items():
+            baseline = thresholds.get("baselines", {}).get(name, {}).get(str(rows))
+            if baseline is None:
+                continue
+            limit = max(baseline * tolerance, baseline + floor)
+            if seconds > limit:
+                regressions.append((name, rows, seconds, limit))
+    return regressions
+
+
+def run_suite(sizes=DEFAULT_SIZES, names=None, repeats: int = 3, config=None, quiet: bool = True) -> dict:
+    """Time every benchmark at every size; returns {name: {rows: best_seconds}}."""
+    config = config or load_config()
+    profile = load_profile(config["paths"]["data_path"])
+    names = names or list(BENCHMARKS)
+    results = {name: {} for name in names}
+    with tempfile.TemporaryDirectory() as tmp, mock_llm():
+        for n_rows in sizes:
+            work = Workload(config, n_rows, Path(tmp), profile)
+            for name in names:
+                with _quiet(quiet):
+                    results[name][n_rows] = time_call(BENCHMARKS[name], work, repeats)
+            clear_datasets()
+    return results
+
+
+@contextmanager
+def _quiet(enabled: bool):
+    """Silence the agents' progress prints and log_step output while timing."""
+    if not enabled:
+        yield
+        return
+    from src.utils import logger
+
+    with ExitStack() as stack:
+        stack.enter_context(mock.patch("builtins.print"))
+        # Modules import the helpers by name, so patch every module's reference
+        for module in list(sys.modules.values()):
+            for name in ("log_step", "log_event"):
+                if getattr(module, name, None) is getattr(logger, name):
+                    stack.enter_context(mock.patch.object(module, name, lambda *args, **kwargs: None))
+        yield
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time the pipeline hot paths on synthetic data")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--only", nargs="+", choices=list(BENCHMARKS), help="Subset of benchmarks to run")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--update", action="store_true", help="Write the timings as the new baselines")
+    args = parser.parse_args(argv)
+
+    results = run_suite(args.sizes, args.only, args.repeats)
+    thresholds = load_thresholds()
+
+    print(f"{'benchmark':<42} {'rows':>12} {'best (s)':>10} {'baseline':>10}")
+    for name, by_size in results.items():
+        for rows, seconds in by_size.items():
+            baseline = thresholds.get("baselines", {}).get(name, {}).get(str(rows))
+            baseline_label = f"{baseline:.4f}" if baseline is not None else "-"
+            print(f"{name:<42} {rows:>12,} {seconds:>10.4f} {baseline_label:>10}")
+
+    if args.update:
+        baselines = thresholds.setdefault("baselines", {})
+        for name, by_size in results.items():
+            baselines.setdefault(name, {}).update({str(rows): round(s, 4) for rows, s in by_size.items()})
+        THRESHOLDS_PATH.write_text(json.dumps(thresholds, indent=2) + "\n", encoding="utf-8")
+        print(f"Baselines written to {THRESHOLDS_PATH}")
+        return 0
+
+    regressions = check(results, thresholds)
+    for name, rows, seconds, limit in regressions:
+        print(f"REGRESSION {name} at {rows:,} rows: {seconds:.4f}s > {limit:.4f}s")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,29 @@
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+import os
+import pytest
+from benchmarks.suite import BENCHMARKS, check, load_thresholds, run_suite
+
+# Keep the pytest run short by default; BENCH_SIZES=10000,100000,1000000 for the full grid
+SIZES = [int(s) for s in os.environ.get("BENCH_SIZES", "10000,100000").split(",")]
+
+
+@pytest.mark.benchmark
+@pytest.mark.parametrize("name", list(BENCHMARKS))
+def test_hot_path_within_threshold(name):
+    results = run_suite(SIZES, names=[name])
+    regressions = check(results, load_thresholds())
+    assert not regressions, "; ".join(
+        f"{bench} at {rows:,} rows took {seconds:.4f}s (limit {limit:.4f}s)"
+        for bench, rows, seconds, limit in regressions
+    )
+
+
+@pytest.mark.benchmark
+def test_cli_imports_stay_light():
+    from benchmarks import import_time
+
+    problems = import_time.check(import_time.run_suite(repeats=3), load_thresholds())
+    assert not problems, "; ".join(problems)
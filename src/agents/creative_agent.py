@@ -1,11 +1,16 @@
 import json
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from datetime import datetime
+import numpy as np
 import pandas as pd
 
-from src.utils.logger import log_step
-from src.utils.data_loader import safe_load_json
-from src.utils.llm import call_gemini
+from src.utils.logger import log_event, log_step
+from src.utils.data_loader import get_dataset, safe_load_json
+from src.utils.json_stream import JSONStreamParser
+from src.utils.llm import stream_gemini
+from src.utils.prompt_builder import PromptBuilder
+from src.utils.tracing import trace_span, traced
 
 
 class CreativeAgent:
@@ -21,6 +26,16 @@ class CreativeAgent:
       3. Generate creative improvement ideas via LLM
     """
 
+    # Ordered (column, cutoff, issue) rules: the first matching rule wins.
+    ISSUE_RULES = [
+        ("ctr", 0.5, "Low engagement — possible ad fatigue or weak copy."),
+        ("roas", 1.2, "Low conversion — possible targeting or offer mismatch."),
+    ]
+    DEFAULT_ISSUE = "Moderate performance — requires further testing."
+
+    # Columns that identify one creative; rows are collapsed across dates per key.
+    CREATIVE_KEYS = ["campaign_name", "adset_name", "creative_type", "creative_message"]
+
     def __init__(
         self,
         config,
@@ -35,14 +50,39 @@ class CreativeAgent:
         self.creative_output_path = Path(creative_output_path)
         self.prompt_path = Path(prompt_path)
         self.data = None
-        self.analysis_results = []
+        self.underperformers = None
+        self.creative_summary = None
+        creative_cfg = config.get("creative", {})
+        self.top_k = creative_cfg.get("top_k", 25)
+        self.shard_size = max(1, int(creative_cfg.get("shard_size", 5)))
+        self.shard_by = creative_cfg.get("shard_by", "campaign")
+        self.max_workers = max(1, int(creative_cfg.get("max_workers", 4)))
+        self.shard_retries = int(creative_cfg.get("shard_retries", 2))
+        self._analysis_records = None
+
+        prompts = config.get("prompts", {})
+        self.budget_tokens = prompts.get("creative_budget_tokens")
+        self.drop_fields = prompts.get("drop_fields", [])
+
+    @property
+    def analysis_results(self):
+        """Per-row dicts of the underperformers, built lazily from the columnar result."""
+        if self._analysis_records is None:
+            if self.underperformers is None:
+                return []
+            self._analysis_records = self.underperformers.to_dict("records")
+        return self._analysis_records
+
+    @analysis_results.setter
+    def analysis_results(self, records):
+        self._analysis_records = list(records)
 
+    @traced("CreativeAgent.load_data", rows=lambda result, self: len(self.data))
     def load_data(self):
-        """Load ad performance data safely and normalize column names."""
+        """Load ad performance data safely (shared frame with normalized column names)."""
         log_step("CreativeAgent", "Loading ad performance data.")
         try:
-            df = pd.read_csv(self.data_path)
-            df.columns = [c.lower() for c in df.columns]
+            df = get_dataset(self.config, self.data_path)
             self.data = df
             log_step("CreativeAgent", f"Data loaded successfully ({len(df)} rows).")
         except FileNotFoundError:
@@ -52,6 +92,7 @@ class CreativeAgent:
             log_step("CreativeAgent", f"Error loading data: {e}")
             raise
 
+    @traced("CreativeAgent.analyze_creatives", rows=lambda result, self: len(self.data))
     def analyze_creatives(self):
         """Identify creatives performing below CTR/ROAS thresholds."""
         log_step("CreativeAgent", "Analyzing underperforming creatives.")
@@ -59,74 +100,355 @@ class CreativeAgent:
         ctr_threshold = self.config["thresholds"].get("low_ctr", 0.7)
         roas_threshold = self.config["thresholds"].get("low_roas", 1.5)
 
-        for idx, row in self.data.iterrows():
-            ctr = row.get("ctr", 0)
-            roas = row.get("roas", 0)
-
-            if ctr < ctr_threshold or roas < roas_threshold:
-                issue = self.identify_issue(ctr, roas)
-                self.analysis_results.append({
-                    "creative_id": row.get("ad_id", f"CR-{idx}"),
-                    "campaign_name": row.get("campaign_name", "Unknown"),
-                    "ctr": ctr,
-                    "roas": roas,
-                    "spend": row.get("spend", 0),
-                    "identified_issue": issue,
-                })
+        df = self.data
+        ctr = self._column(df, "ctr", 0)
+        roas = self._column(df, "roas", 0)
+
+        # NaN compares False, exactly like the scalar checks in identify_issue
+        mask = (ctr < ctr_threshold) | (roas < roas_threshold)
+        flagged = df.index[mask]
+
+        if "ad_id" in df.columns:
+            creative_ids = df.loc[mask, "ad_id"].to_numpy()
+        else:
+            creative_ids = "CR-" + flagged.astype(str)
+
+        self.underperformers = pd.DataFrame(
+            {
+                "creative_id": creative_ids,
+                "campaign_name": self._column(df, "campaign_name", "Unknown")[mask],
+                "ctr": ctr[mask],
+                "roas": roas[mask],
+                "spend": self._column(df, "spend", 0)[mask],
+                "identified_issue": self.classify_issues(ctr[mask], roas[mask]),
+            },
+            index=flagged,
+        )
+        self._analysis_records = None
 
         log_step(
             "CreativeAgent",
-            f"Detected {len(self.analysis_results)} underperforming creatives."
+            f"Detected {len(self.underperformers)} underperforming creatives."
         )
 
+    @staticmethod
+    def _column(df, name, default):
+        """
+        Return a column as a NumPy array, or a constant array when it is missing.
+
+        Categorical columns stay categorical (codes into the shared value table)
+        so no full-length array of strings is materialized from the dataset.
+        """
+        if name in df.columns:
+            column = df[name]
+            if isinstance(column.dtype, pd.CategoricalDtype):
+                return column.array
+            return column.to_numpy()
+        return np.full(len(df), default, dtype=object if isinstance(default, str) else float)
+
     def identify_issue(self, ctr, roas):
         """Basic rules to identify common performance issues."""
-        if ctr < 0.5:
-            return "Low engagement — possible ad fatigue or weak copy."
-        if roas < 1.2:
-            return "Low conversion — possible targeting or offer mismatch."
-        return "Moderate performance — requires further testing."
+        for column, cutoff, issue in self.ISSUE_RULES:
+            if (ctr if column == "ctr" else roas) < cutoff:
+                return issue
+        return self.DEFAULT_ISSUE
 
-    def generate_improvements(self):
+    def classify_issues(self, ctr, roas):
+        """Vectorized identify_issue: bucket whole CTR/ROAS arrays in one np.select pass."""
+        values = {"ctr": np.asarray(ctr), "roas": np.asarray(roas)}
+        conditions = [values[column] < cutoff for column, cutoff, _ in self.ISSUE_RULES]
+        codes = np.select(conditions, range(len(self.ISSUE_RULES)), default=len(self.ISSUE_RULES))
+        categories = [issue for _, _, issue in self.ISSUE_RULES] + [self.DEFAULT_ISSUE]
+        return pd.Categorical.from_codes(codes, categories=categories)
+
+    @traced("CreativeAgent.aggregate_creatives", rows=lambda result, self: len(self.data))
+    def aggregate_creatives(self):
+        """
+        Collapse underperforming rows (one creative on one day) into one row per creative.
+
+        Each creative gets spend-weighted CTR/ROAS over all of its days, a per-day ROAS
+        trend slope, the number of underperforming days and the spend on those days
+        ("wasted_spend"). Only creatives with at least one underperforming day are kept.
+        """
+        df = self.data
+        keys = [k for k in self.CREATIVE_KEYS if k in df.columns]
+        flagged = np.zeros(len(df), dtype=bool)
+        flagged[df.index.get_indexer(self.underperformers.index)] = True
+
+        spend = np.nan_to_num(self._column(df, "spend", 0).astype(float))
+        ctr = self._column(df, "ctr", 0).astype(float)
+        roas = self._column(df, "roas", 0).astype(float)
+        dates = pd.to_datetime(df["date"], errors="coerce") if "date" in df.columns else None
+        if dates is not None:
+            day = ((dates - dates.min()).dt.days).to_numpy(dtype=float)
+        else:
+            day = np.zeros(len(df))
+        has_roas = ~np.isnan(roas) & ~np.isnan(day)
+        x = np.where(has_roas, day, 0.0)
+        y = np.where(has_roas, roas, 0.0)
+
+        work = pd.DataFrame({k: self._column(df, k, "Unknown") for k in keys})
+        work["spend"] = spend
+        work["ctr_weight"] = np.where(np.isnan(ctr), 0.0, spend)
+        work["ctr_spend"] = np.nan_to_num(ctr) * spend
+        work["roas_weight"] = np.where(np.isnan(roas), 0.0, spend)
+        work["roas_spend"] = np.nan_to_num(roas) * spend
+        work["wasted_spend"] = np.where(flagged, spend, 0.0)
+        work["n"] = has_roas.astype(float)
+        work["sx"], work["sy"] = x, y
+        work["sxx"], work["sxy"] = x * x, x * y
+        work["rows"] = 1
+        work["first_flagged"] = np.where(flagged, np.arange(len(df)), len(df))
+        # Without dates every flagged row counts as its own day
+        work["flagged_day"] = np.where(flagged, day if dates is not None else np.arange(len(df)), np.nan)
+
+        grouped = work.groupby(keys, sort=False, dropna=False, observed=True)
+        agg = grouped.sum(numeric_only=True)
+        agg["first_flagged"] = grouped["first_flagged"].min()
+        agg["days_underperforming"] = grouped["flagged_day"].nunique()
+        agg = agg[agg["first_flagged"] < len(df)]
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            agg["ctr"] = agg["ctr_spend"] / agg["ctr_weight"]
+            agg["roas"] = agg["roas_spend"] / agg["roas_weight"]
+            denominator = agg["n"] * agg["sxx"] - agg["sx"] ** 2
+            agg["roas_trend_slope"] = (
+                (agg["n"] * agg["sxy"] - agg["sx"] * agg["sy"]) / denominator.where(denominator > 0)
+            )
+
+        summary = agg.reset_index()
+        summary.insert(
+            0, "creative_id",
+            self.underperformers["creative_id"].to_numpy()[
+                np.searchsorted(np.flatnonzero(flagged), summary["first_flagged"].to_numpy())
+            ],
+        )
+        summary["identified_issue"] = self.classify_issues(summary["ctr"], summary["roas"])
+        columns = ["creative_id", *keys, "rows", "days_underperforming", "spend", "wasted_spend",
+                   "ctr", "roas", "roas_trend_slope", "identified_issue"]
+        self.creative_summary = (
+            summary[columns]
+            .sort_values(["wasted_spend", "creative_id"], ascending=[False, True], kind="stable")
+            .reset_index(drop=True)
+        )
+        log_step(
+            "CreativeAgent",
+            f"Aggregated {len(self.underperformers)} underperforming rows into "
+            f"{len(self.creative_summary)} creatives."
+        )
+        return self.creative_summary
+
+    def select_top_creatives(self, k=None):
+        """Return the top-k aggregated creatives ranked by wasted spend, as JSON-ready dicts."""
+        if self.creative_summary is None:
+            self.aggregate_creatives()
+        top = self.creative_summary.head(self.top_k if k is None else k)
+        return self._records(top)
+
+    @staticmethod
+    def _records(frame):
+        """Frame -> list of dicts with floats rounded and NaN mapped to None."""
+        numeric = frame.select_dtypes("number").columns
+        rounded = frame.astype({c: "float64" for c in numeric}).round(4).astype(object)
+        return rounded.where(pd.notna(rounded), None).to_dict("records")
+
+    @traced("CreativeAgent.generate_improvements")
+    def generate_improvements(self, insights=None, sink=None, on_recommendation=None):
         """
         Generate improvement ideas using the LLM.
         Combines creative analysis and prior insights for context.
+
+        The top creatives are split into shards (see shard_creatives) that are
+        requested concurrently; a failing shard is retried on its own and only
+        an all-shard failure raises. `on_recommendation` is called (from the shard
+        threads) with each recommendation as soon as it has streamed in.
+
+        `insights` defaults to the contents of insights_path. With an
+        ArtifactSink the result is handed to the sink instead of being written here.
         """
         log_step("CreativeAgent", "Generating creative improvement suggestions.")
 
-        insights = safe_load_json(self.insights_path)
+        if insights is None:
+            insights = safe_load_json(self.insights_path)
         prompt_template = self._load_prompt_template()
 
-        # Combine analysis + insights into a structured context
-        context = (
-            "You are a senior Facebook Ads creative strategist.\n\n"
-            "Underperforming creatives:\n"
-            f"{json.dumps(self.analysis_results, indent=2)}\n\n"
-            "Context (insights from earlier analysis):\n"
-            f"{json.dumps(insights, indent=2)}\n\n"
-            "Now, based on this information, propose 3 new creative ideas for each weak area.\n"
-            "Use the following format:\n"
-            f"{prompt_template}"
+        if self.creative_summary is None:
+            self.aggregate_creatives()
+        top_creatives = self.select_top_creatives()
+
+        shards = self.shard_creatives(top_creatives)
+        workers = min(self.max_workers, max(len(shards), 1))
+        log_step(
+            "CreativeAgent",
+            f"Requesting recommendations for {len(top_creatives)} creatives in {len(shards)} shard(s) "
+            f"(by {self.shard_by}, up to {self.shard_size} each, {workers} workers)."
         )
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="creative-shard") as pool:
+            results = list(pool.map(
+                lambda item: self._run_shard(item[0], item[1], insights, prompt_template, on_recommendation),
+                enumerate(shards),
+            ))
 
-        try:
-            llm_output = call_gemini(context)
-            parsed_output = self._parse_llm_output(llm_output)
+        recommendations = self.merge_recommendations(top_creatives, results)
+        failed = [r for r in results if r["error"]]
+        if shards and len(failed) == len(shards):
+            message = f"All {len(shards)} creative shards failed: {failed[0]['error']}"
+            log_step("CreativeAgent", f"Error generating creative recommendations: {message}")
+            raise RuntimeError(message)
 
-            final_output = {
-                "timestamp": datetime.now().isoformat(),
-                "analysis": self.analysis_results,
-                "creative_recommendations": parsed_output.get("creative_recommendations", []),
-                "raw_output": parsed_output.get("raw_output", ""),
-            }
+        final_output = {
+            "timestamp": datetime.now().isoformat(),
+            "underperforming_rows": len(self.underperformers),
+            "analysis": self._records(self.creative_summary),
+            "creative_recommendations": recommendations,
+            "raw_output": "\n".join(r["raw_output"] for r in results if r["raw_output"]),
+            "shards": {
+                "count": len(shards),
+                "shard_by": self.shard_by,
+                "attempts": sum(r["attempts"] for r in results),
+                "truncated": [r["shard"] for r in results if r["truncated"]],
+                "prompts": [r["prompt"] for r in results],
+                "failed": [{"shard": r["shard"], "creative_ids": r["creative_ids"], "error": r["error"]}
+                           for r in failed],
+            },
+        }
 
+        if sink is not None:
+            sink.put(self.creative_output_path.name, final_output)
+        else:
             self._save_json(self.creative_output_path, final_output)
             log_step("CreativeAgent", "Creative recommendations saved successfully.")
-            return final_output
+        return final_output
 
-        except Exception as e:
-            log_step("CreativeAgent", f"Error generating creative recommendations: {e}")
-            raise
+    def shard_creatives(self, creatives):
+        """
+        Split the ranked creatives into batches of at most `shard_size`.
+
+        With shard_by "campaign" each batch holds creatives of one campaign
+        (campaigns ordered by their best-ranked creative); with "size" the
+        ranking is cut into consecutive batches. Rank order is kept within a batch.
+        """
+        if self.shard_by == "campaign":
+            groups = {}
+            for creative in creatives:
+                groups.setdefault(creative.get("campaign_name"), []).append(creative)
+            ordered = list(groups.values())
+        else:
+            ordered = [creatives]
+        return [group[i:i + self.shard_size] for group in ordered for i in range(0, len(group), self.shard_size)]
+
+    def _run_shard(self, index, creatives, insights, prompt_template, on_recommendation=None):
+        """
+        One streamed LLM call for one shard.
+
+        Recommendations are parsed as they complete and passed to
+        `on_recommendation` (once per creative across attempts). A response
+        that ends early keeps every complete recommendation. A call that fails,
+        even mid-stream, or output without a recommendations list is retried,
+        reading past the response cache and replacing its entry. If every
+        attempt fails, the most complete partial output is kept and the error
+        stays set.
+        """
+        result = {
+            "shard": index,
+            "creative_ids": [c.get("creative_id") for c in creatives],
+            "recommendations": [],
+            "raw_output": "",
+            "error": None,
+            "truncated": False,
+            "attempts": 0,
+        }
+        context, result["prompt"] = self.build_prompt(creatives, insights, prompt_template)
+        emitted, partial = set(), []
+
+        def emit(recommendation):
+            key = recommendation.get("creative_id") if isinstance(recommendation, dict) else None
+            key = key if key is not None else json.dumps(recommendation, sort_keys=True, default=str)
+            if key not in emitted:
+                emitted.add(key)
+                if on_recommendation is not None:
+                    on_recommendation(recommendation)
+
+        with trace_span("CreativeAgent.shard", shard=index, creatives=len(creatives)) as span:
+            for attempt in range(1 + self.shard_retries):
+                result["attempts"] = attempt + 1
+                parser = JSONStreamParser("creative_recommendations")
+                try:
+                    for chunk in stream_gemini(context, refresh=attempt > 0):
+                        for recommendation in parser.feed(chunk):
+                            emit(recommendation)
+                except Exception as e:
+                    result["error"] = f"{type(e).__name__}: {e}"
+                    log_step("CreativeAgent", f"Shard {index} attempt {attempt + 1} failed: {result['error']}")
+                    if len(parser.items) > len(partial):
+                        partial = list(parser.items)
+                    continue
+                parsed = self._interpret(parser)
+                if not parsed.get("raw_output"):
+                    result.update(recommendations=parsed["creative_recommendations"], raw_output="", error=None,
+                                  truncated=bool(parsed.get("truncated")))
+                    break
+                result.update(raw_output=parsed["raw_output"], error="malformed LLM output")
+                log_step("CreativeAgent", f"Shard {index} attempt {attempt + 1} returned malformed output.")
+            if result["error"] and partial:
+                result.update(recommendations=partial, truncated=True)
+            if span is not None:
+                span.set(attempts=result["attempts"], failed=bool(result["error"]), truncated=result["truncated"])
+        return result
+
+    @staticmethod
+    def merge_recommendations(creatives, results):
+        """
+        Combine shard outputs in a fixed order, independent of completion order.
+
+        Recommendations are ordered by the rank of their creative_id in
+        `creatives` (unknown ids after, by shard and position); the first
+        recommendation per creative_id wins.
+        """
+        rank = {c.get("creative_id"): i for i, c in enumerate(creatives)}
+        entries = []
+        for result in sorted(results, key=lambda r: r["shard"]):
+            for position, rec in enumerate(result["recommendations"]):
+                if not isinstance(rec, dict):
+                    continue
+                entries.append((rank.get(rec.get("creative_id"), len(rank)), result["shard"], position, rec))
+        merged, seen = [], set()
+        for _, _, _, rec in sorted(entries, key=lambda e: e[:3]):
+            creative_id = rec.get("creative_id")
+            if creative_id is not None and creative_id in seen:
+                continue
+            seen.add(creative_id)
+            merged.append(rec)
+        return merged
+
+    def build_prompt(self, top_creatives, insights, prompt_template):
+        """
+        Combine analysis + insights into a structured context within the token budget.
+
+        Creatives go in as a table (already ranked by wasted spend, so the
+        cheapest rows are cut first); the insights are cut before the creatives.
+        Returns the prompt and its PromptBuilder report. The report is not kept
+        on the agent, which may be shared by concurrent queries.
+        """
+        builder = PromptBuilder(self.budget_tokens, self.drop_fields)
+        builder.add("role", "You are a senior Facebook Ads creative strategist.", required=True)
+        builder.add(
+            "creatives", top_creatives, priority=2, min_items=3,
+            header=f"Underperforming creatives, ranked by wasted spend (of {len(self.creative_summary)}):",
+        )
+        builder.add("insights", insights, priority=1, rank_by="confidence",
+                    header="Context (insights from earlier analysis):")
+        builder.add(
+            "instructions",
+            "Now, based on this information, propose 3 new creative ideas for each weak area.\n"
+            f"Use the following format:\n{prompt_template}",
+            required=True,
+        )
+        context = builder.build()
+        log_step("CreativeAgent", f"Prompt {builder.describe()}")
+        if builder.report["truncated"]:
+            log_event("CreativeAgent", "prompt_truncated", builder.report)
+        return context, builder.report
 
     def _load_prompt_template(self):
         """Read the creative prompt file."""
@@ -139,29 +461,30 @@ class CreativeAgent:
             raise
 
     def _parse_llm_output(self, text: str):
-        """Parse JSON-like LLM output safely and robustly."""
-        try:
-            start = text.find("{")
-            end = text.rfind("}") + 1
-            json_str = text[start:end].strip()
-            if not json_str:
-                raise ValueError("Empty JSON segment in LLM output.")
-            return json.loads(json_str)
-        except json.JSONDecodeError:
-            # Attempt partial recovery if malformed JSON
-            log_step("CreativeAgent", "Partial JSON detected, attempting fallback parsing.")
-            try:
-                fixed_text = text.replace("\n", " ").replace("'", '"')
-                start = fixed_text.find("{")
-                end = fixed_text.rfind("}") + 1
-                return json.loads(fixed_text[start:end])
-            except Exception:
-                log_step("CreativeAgent", "Fallback parsing failed; returning raw output.")
-                return {"creative_recommendations": [], "raw_output": text}
-        except Exception as e:
-            log_step("CreativeAgent", f"Parsing error: {e}")
-            return {"creative_recommendations": [], "raw_output": text}
+        """Parse a complete LLM response (see _interpret)."""
+        parser = JSONStreamParser("creative_recommendations")
+        parser.feed(text)
+        return self._interpret(parser)
+
+    @staticmethod
+    def _interpret(parser):
+        """
+        The response as {"creative_recommendations": [...]}.
+
+        A response cut off mid-way keeps its complete recommendations and is
+        flagged "truncated". Anything else, including valid JSON without a
+        creative_recommendations list, is malformed and returned as "raw_output".
+        """
+        document = parser.document()
+        if isinstance(document, dict) and isinstance(document.get("creative_recommendations"), list):
+            return document
+        if parser.items:
+            log_step("CreativeAgent", f"Truncated output; kept {len(parser.items)} complete recommendations.")
+            return {"creative_recommendations": list(parser.items), "truncated": True}
+        log_step("CreativeAgent", "LLM output has no creative_recommendations list; returning raw output.")
+        return {"creative_recommendations": [], "raw_output": parser.text or "<empty response>"}
 
+    @traced("CreativeAgent._save_json", category="io")
     def _save_json(self, path: Path, data: dict):
         """Save structured data to JSON file."""
         try:
@@ -173,8 +496,10 @@ class CreativeAgent:
             log_step("CreativeAgent", f"Error saving JSON file: {e}")
             raise
 
-    def run(self):
+    @traced("CreativeAgent.run")
+    def run(self, insights=None, sink=None):
         """Main entry point for the CreativeAgent."""
         self.load_data()
         self.analyze_creatives()
-        return self.generate_improvements()
\ No newline at end of file
+        self.aggregate_creatives()
+        return self.generate_improvements(insights=insights, sink=sink)
\ No newline at end of file
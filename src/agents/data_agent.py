@@ -1,6 +1,21 @@
 import pandas as pd
 from datetime import datetime
 
+from src.utils.aggregate_store import AggregateStore, scan_daily_partials
+from src.utils.columnar_store import ColumnarStore, store_filters
+from src.utils.data_loader import get_dataset, iter_dataset_chunks
+from src.utils.segment_cube import DIMENSIONS, SegmentCube
+from src.utils.streaming_stats import MetricsAccumulator
+from src.utils import timeseries
+from src.utils.tracing import traced
+
+
+def _sig(value, digits: int = 7):
+    """Round a float to the precision float32 metrics actually carry."""
+    if value is None or pd.isna(value):
+        return value
+    return float(f"{float(value):.{digits}g}")
+
 
 class DataAgent:
     """
@@ -8,16 +23,38 @@ class DataAgent:
     Produces structured summaries for other agents to use.
     """
 
+    NUMERIC_COLS = ["spend", "impressions", "clicks", "ctr", "purchases", "revenue", "roas"]
+
     def __init__(self, config):
         self.config = config
         self.data_path = config["paths"]["data"]
         self.low_ctr_threshold = config["thresholds"]["low_ctr"]
         self.roas_drop_pct = config["thresholds"]["roas_drop_pct"]
+        dataset_cfg = config.get("dataset", {})
+        self.store = dataset_cfg.get("store")
+        self.streaming = dataset_cfg.get("streaming", False)
+        self.chunksize = dataset_cfg.get("chunksize", 250_000)
+        self.incremental = dataset_cfg.get("incremental", False)
+        self.sketch_capacity = dataset_cfg.get("incremental_sketch_capacity", 256)
+        self.aggregate_store_path = config["paths"].get("aggregate_store", "reports/daily_aggregates.json")
+        segments_cfg = config.get("segments", {})
+        self.segments_enabled = segments_cfg.get("enabled", True)
+        self.segment_dimensions = segments_cfg.get("dimensions", DIMENSIONS)
+        self.segment_split_date = segments_cfg.get("split_date")
+        self.segment_top_k = segments_cfg.get("top_k", 10)
+        self.segment_min_spend_share = segments_cfg.get("min_spend_share", 0.01)
+        ts_cfg = config.get("timeseries", {})
+        self.trend_window = ts_cfg.get("window_days", 7)
+        self.min_segment_days = ts_cfg.get("min_segment_days", 3)
+        self.trend_confidence = ts_cfg.get("trend_confidence", 0.9)
+        self.change_point_min_strength = ts_cfg.get("change_point_min_strength", 0.25)
+        self.max_alerts = ts_cfg.get("max_alerts", 20)
 
+    @traced("DataAgent.load_data", rows=lambda df, *a: len(df))
     def load_data(self):
-        """Load the CSV dataset safely."""
+        """Load the shared dataset safely (parsed once per run, see get_dataset)."""
         try:
-            df = pd.read_csv(self.data_path)
+            df = get_dataset(self.config)
             print(f"Dataset loaded successfully: {len(df)} rows, {len(df.columns)} columns.")
             return df
         except FileNotFoundError:
@@ -28,70 +65,215 @@ class DataAgent:
             print(f"Unexpected error while loading dataset: {e}")
         return pd.DataFrame()
 
+    def load_chunks(self):
+        """
+        Iterate over the dataset without loading it whole: `chunksize`-row
+        frames of the CSV, or one frame per day of the columnar store
+        (only the days and campaigns selected by `dataset.filter`).
+        """
+        if self.store:
+            return ColumnarStore(self.store).iter_partitions(**store_filters(self.config))
+        return iter_dataset_chunks(self.data_path, self.chunksize)
+
+    @traced("DataAgent.summarize_metrics", rows=lambda result, self, df: len(df))
     def summarize_metrics(self, df: pd.DataFrame):
         """Summarize key metrics and trends from the dataset."""
         try:
-            numeric_cols = ["spend", "impressions", "clicks", "ctr", "purchases", "revenue", "roas"]
+            numeric_cols = self.NUMERIC_COLS
             summary = df[numeric_cols].describe().to_dict()
 
-            # Convert date column to datetime for trend analysis
-            df["date"] = pd.to_datetime(df["date"], errors="coerce")
-
-            # ROAS trend over time (simple start/end comparison)
-            roas_trend = (
-                df.groupby("date")["roas"]
-                .mean()
-                .reset_index()
-                .sort_values("date", ascending=True)
-            )
-
-            if not roas_trend.empty:
-                trend_info = {
-                    "start_roas": float(roas_trend["roas"].iloc[0]),
-                    "end_roas": float(roas_trend["roas"].iloc[-1]),
-                    "trend_direction": (
-                        "decline" if roas_trend["roas"].iloc[-1] < roas_trend["roas"].iloc[0] else "growth"
-                    ),
-                }
-            else:
-                trend_info = {"start_roas": None, "end_roas": None, "trend_direction": "unknown"}
+            # Spend-weighted ROAS/CTR/CPM components per date for the trend analysis
+            daily = timeseries.daily_totals(df)
 
             # Identify low CTR campaigns (underperformers)
             low_ctr_df = df[df["ctr"] < self.low_ctr_threshold]
             low_ctr_summary = {
                 "count": len(low_ctr_df["campaign_name"].unique()),
-                "avg_ctr": round(low_ctr_df["ctr"].mean(), 4) if not low_ctr_df.empty else None,
-                "avg_roas": round(low_ctr_df["roas"].mean(), 4) if not low_ctr_df.empty else None,
+                "avg_ctr": round(float(low_ctr_df["ctr"].mean()), 4) if not low_ctr_df.empty else None,
+                "avg_roas": round(float(low_ctr_df["roas"].mean()), 4) if not low_ctr_df.empty else None,
                 "sample_campaigns": (
                     low_ctr_df["campaign_name"].dropna().unique()[:5].tolist()
                     if not low_ctr_df.empty else []
                 ),
             }
 
-            # Final combined summary
-            summary_json = {
-                "dataset_rows": len(df),
-                "overall_summary": summary,
-                "roas_trend": trend_info,
-                "low_ctr_summary": low_ctr_summary,
-                "timestamp": datetime.now().isoformat(),
-            }
-            return summary_json
+            cube = self._segment_cube(df.columns)
+            if cube is not None:
+                cube.update(df)
+            series = self._series_accumulator(df.columns)
+            if series is not None:
+                series.update(df)
+
+            return self._build_summary(len(df), summary, daily, low_ctr_summary, cube, series)
+
+        except KeyError as e:
+            print(f"Missing expected column in dataset: {e}")
+        except Exception as e:
+            print(f"Error summarizing metrics: {e}")
+        return {}
+
+    @traced("DataAgent.summarize_metrics_streaming", rows=lambda result, *a: result.get("dataset_rows", 0))
+    def summarize_metrics_streaming(self, frames):
+        """
+        Streaming variant of summarize_metrics over any iterator of DataFrames.
+
+        Each frame is folded into mergeable partial aggregates and then dropped,
+        so peak memory is bounded by one chunk. The 25/50/75% quartiles come from
+        a quantile sketch and are approximate on large inputs; everything else is exact.
+        """
+        try:
+            acc = MetricsAccumulator(self.NUMERIC_COLS, self.low_ctr_threshold)
+            cube = series = None
+            for frame in frames:
+                acc.update(frame)
+                if cube is None:
+                    cube = self._segment_cube(frame.columns)
+                    series = self._series_accumulator(frame.columns)
+                if cube is not None:
+                    cube.update(frame)
+                if series is not None:
+                    series.update(frame)
+            return self._build_summary(acc.rows, acc.describe(), acc.daily_totals(), acc.low_ctr_summary(),
+                                       cube, series)
+        except FileNotFoundError:
+            print(f"Error: Data file not found at path '{self.data_path}'.")
+        except KeyError as e:
+            print(f"Missing expected column in dataset: {e}")
+        except Exception as e:
+            print(f"Error summarizing metrics: {e}")
+        return {}
+
+    @traced("DataAgent.summarize_incremental", rows=lambda result, *a: result.get("dataset_rows", 0))
+    def summarize_incremental(self):
+        """
+        Incremental summary backed by the per-date AggregateStore.
 
+        Only dates newer than the last stored date are aggregated; the summary is
+        then rebuilt from the stored partials. Every run still checksums each date
+        in the feed, and any edited, added or removed historical row triggers a
+        full rebuild. Note that sample_campaigns are ordered by date here, not by
+        file position, and that segment_drivers and series_trends are not
+        computed on this path (the store keeps per-date totals, not per-segment
+        or per-series cells).
+        """
+        try:
+            store = AggregateStore(self.aggregate_store_path).load()
+            settings = (self.data_path, self.low_ctr_threshold, self.NUMERIC_COLS)
+            after = store.last_date if store.is_compatible(*settings) else None
+
+            partials, checksums = scan_daily_partials(
+                self.load_chunks(), self.NUMERIC_COLS, self.low_ctr_threshold,
+                after=after, sketch_capacity=self.sketch_capacity,
+            )
+            if after is not None and not store.history_matches(checksums):
+                print("[DataAgent] Historical rows changed since the last run; rebuilding aggregates.")
+                after = None
+                partials, checksums = scan_daily_partials(
+                    self.load_chunks(), self.NUMERIC_COLS, self.low_ctr_threshold,
+                    sketch_capacity=self.sketch_capacity,
+                )
+            if after is None:
+                store.reset(*settings)
+            store.add(partials, checksums)
+            store.save()
+            print(f"[DataAgent] Aggregated {len(partials)} new date(s); store holds {len(store.dates)}.")
+
+            acc = store.combined(self.NUMERIC_COLS, self.low_ctr_threshold)
+            return self._build_summary(acc.rows, acc.describe(), acc.daily_totals(), acc.low_ctr_summary())
+        except FileNotFoundError:
+            print(f"Error: Data file not found at path '{self.data_path}'.")
         except KeyError as e:
             print(f"Missing expected column in dataset: {e}")
         except Exception as e:
             print(f"Error summarizing metrics: {e}")
         return {}
 
+    def _segment_cube(self, columns):
+        """A SegmentCube over the configured dimensions present in `columns` (None when disabled)."""
+        if not self.segments_enabled:
+            return None
+        dims = [d for d in self.segment_dimensions if d in columns]
+        if not dims or not {"date", "spend", "revenue"} <= set(columns):
+            return None
+        return SegmentCube(dims, split_date=self.segment_split_date)
+
+    def _series_accumulator(self, columns):
+        """Per-(campaign, adset) daily series, when the dataset has both columns."""
+        if not {"campaign_name", "adset_name", "date"} <= set(columns):
+            return None
+        return timeseries.SeriesAccumulator(["campaign_name", "adset_name"])
+
+    def _trend_params(self):
+        return {
+            "window": self.trend_window,
+            "min_segment": self.min_segment_days,
+            "drop_pct": self.roas_drop_pct,
+            "min_strength": self.change_point_min_strength,
+        }
+
+    def _series_trends(self, series):
+        """Batched trend analysis and ROAS drop alerts for every campaign and adset series."""
+        labels, days, grid = series.arrays()
+        levels = {
+            "campaign": timeseries.rollup(labels, grid, ["campaign_name"]),
+            "adset": (labels, grid),
+        }
+        params = self._trend_params()
+        counts, trends, alerts = {}, {}, []
+        for level, (level_labels, level_grid) in levels.items():
+            stats = timeseries.analyze(level_grid, params["window"], params["min_segment"])
+            trends[level] = timeseries.trend_counts(stats, self.trend_confidence)
+            level_alerts, counts[level] = timeseries.series_alerts(
+                level_labels, days, level_grid, level, min_confidence=self.trend_confidence,
+                limit=self.max_alerts, stats=stats, **params,
+            )
+            alerts.extend(level_alerts)
+        alerts.sort(key=lambda a: -((a["recent_spend"] or 0) * (a["drop_pct"] or 0)))
+        return {
+            "series_count": {level: len(level_labels) for level, (level_labels, _) in levels.items()},
+            "trend_counts": trends,
+            "alert_count": counts,
+            "alerts": alerts[:self.max_alerts],
+        }
+
+    def _build_summary(self, rows, overall, daily: pd.DataFrame, low_ctr_summary, cube=None, series=None):
+        """Assemble the summary JSON shared by the in-memory, streaming and incremental paths."""
+        # Spend-weighted trend: windowed start/end ROAS, OLS slope, change point, drop alert
+        trend_info = timeseries.trend_summary(daily, min_confidence=self.trend_confidence, **self._trend_params())
+
+        # Final combined summary
+        summary = {
+            "dataset_rows": rows,
+            "overall_summary": {
+                col: {stat: _sig(v) for stat, v in stats.items()} for col, stats in overall.items()
+            },
+            "roas_trend": trend_info,
+            "low_ctr_summary": low_ctr_summary,
+        }
+        if series is not None:
+            summary["series_trends"] = self._series_trends(series)
+        # Which segments drove the spend-weighted ROAS change between the two halves of the period
+        if cube is not None and cube.rows:
+            summary["segment_drivers"] = cube.drivers(
+                top_k=self.segment_top_k, min_spend_share=self.segment_min_spend_share
+            )
+        summary["timestamp"] = datetime.now().isoformat()
+        return summary
+
+    @traced("DataAgent.run")
     def run(self):
         """Main execution method for data loading and summarization."""
-        df = self.load_data()
-        if df.empty:
-            print("DataAgent terminated: No valid data to process.")
-            return {}
+        if self.incremental:
+            summary = self.summarize_incremental()
+        elif self.streaming:
+            summary = self.summarize_metrics_streaming(self.load_chunks())
+        else:
+            df = self.load_data()
+            if df.empty:
+                print("DataAgent terminated: No valid data to process.")
+                return {}
+            summary = self.summarize_metrics(df)
 
-        summary = self.summarize_metrics(df)
         if not summary:
             print("DataAgent completed with no summary generated.")
             return {}
@@ -1,21 +1,41 @@
 import json
-import random
+import math
 from datetime import datetime
 from pathlib import Path
 
+from src.utils import hypothesis_tests
+from src.utils.data_loader import get_dataset
+from src.utils.logger import log_step
+from src.utils.tracing import traced
+
 
 class EvaluatorAgent:
     """
     EvaluatorAgent
     ---------------
-    Evaluates hypotheses generated by the Insight Agent using 
-    basic quantitative logic to validate and prioritize causes.
+    Evaluates hypotheses generated by the Insight Agent against the dataset.
+    Each hypothesis is mapped to a statistical check (creative fatigue,
+    auction competition, audience differences) and scored with a seeded
+    permutation test, so the same data always gives the same verdict.
     """
 
-    def __init__(self, config):
+    def __init__(self, config, data=None):
         self.config = config
         self.insights_path = Path("reports/insights.json")
         self.summary_path = Path("reports/data_summary.json")
+        self.data = data
+
+        settings = config.get("evaluation", {})
+        self.permutations = int(settings.get("permutations", 2000))
+        self.alpha = float(settings.get("alpha", 0.05))
+        self.max_workers = int(settings.get("max_workers", 1))
+        self.parallel_min_work = int(settings.get("parallel_min_work", 50_000_000))
+        self.ctr_stable_pct = float(settings.get("ctr_stable_pct", 0.10))
+        self.min_cell_impressions = float(settings.get("min_cell_impressions", 0))
+        self.seed = int(config.get("project", {}).get("seed", 42))
+        # Cell arrays and per-test verdicts, reused by later reflection rounds
+        self._arrays = None
+        self._verdicts = {}
 
     def load_inputs(self):
         """Load insights and data summary from the reports directory."""
@@ -44,25 +64,72 @@ class EvaluatorAgent:
             print(f"[EvaluatorAgent] Error loading inputs: {e}")
             return {}, {}
 
+    def run_tests(self, test_types) -> dict:
+        """
+        Run each requested statistical test once on the dataset; {test_type: verdict}.
+
+        Verdicts are kept on the agent, so re-evaluating revised hypotheses only
+        runs tests that have not been run yet.
+        """
+        missing = sorted(set(test_types) - {None} - set(self._verdicts))
+        if missing:
+            if self._arrays is None:
+                try:
+                    df = self.data if self.data is not None else get_dataset(self.config)
+                except Exception as e:
+                    log_step("EvaluatorAgent", f"Dataset unavailable, hypotheses left untested: {e}", level="WARNING")
+                    return {}
+                self._arrays = hypothesis_tests.prepare_arrays(df, self.min_cell_impressions)
+
+            raw = hypothesis_tests.run_tests(
+                missing, self._arrays, permutations=self.permutations, seed=self.seed,
+                workers=self.max_workers, parallel_min_work=self.parallel_min_work,
+            )
+            for test_type in missing:
+                # None marks a test without enough data, so it isn't retried
+                self._verdicts[test_type] = hypothesis_tests.interpret(
+                    test_type, raw[test_type], self._arrays, self.alpha, self.ctr_stable_pct
+                ) if test_type in raw else None
+        return {t: v for t, v in self._verdicts.items() if v is not None}
+
     def validate_hypotheses(self, insights, summary):
-        """Validate hypotheses using simple rules and trends."""
+        """
+        Validate hypotheses with permutation tests on the rows.
+
+        A tested hypothesis' confidence is the mean of the Insight Agent's
+        confidence and the test evidence (1 - p when the effect points the way
+        the hypothesis claims, else 0); it is validated only when the test is
+        significant at `evaluation.alpha` and the confidence exceeds 0.6.
+        Hypotheses no test covers keep their confidence and stay unvalidated.
+        """
+        hypotheses = insights.get("hypotheses", [])
+        kinds = [hypothesis_tests.classify(hyp) for hyp in hypotheses]
+        verdicts = self.run_tests(kinds)
         results = []
 
-        for hyp in insights.get("hypotheses", []):
+        for hyp, kind in zip(hypotheses, kinds):
             base_conf = hyp.get("confidence", 0.5)
-            roas_trend = summary.get("roas_trend", {}).get("trend_direction", "neutral")
-            low_ctr_count = summary.get("low_ctr_summary", {}).get("count", 0)
-
-            # Apply heuristic validation
-            if "fatigue" in hyp.get("title", "").lower() and low_ctr_count > 100:
-                validation_conf = min(base_conf + 0.1, 1.0)
-                reason = "Strong evidence: many low CTR campaigns detected."
-            elif "competition" in hyp.get("title", "").lower():
-                validation_conf = round(base_conf + random.uniform(-0.05, 0.05), 2)
-                reason = "Moderate evidence: indirect signs via declining ROAS but stable CTR."
+            verdict = verdicts.get(kind)
+
+            if verdict is not None:
+                evidence = 1 - verdict["p_value"] if verdict["supported"] else 0.0
+                validation_conf = round(0.5 * base_conf + 0.5 * evidence, 2)
+                validated = verdict["supported"] and validation_conf > 0.6
+                reason = ("Supported by the data: " if verdict["supported"] else "Not supported by the data: ") \
+                    + verdict["reason"]
+                test = {
+                    "type": kind,
+                    "statistic": round(float(verdict["statistic"]), 6),
+                    "p_value": round(verdict["p_value"], 6),
+                    "effect": _rounded(verdict["effect"]),
+                    "permutations": verdict["permutations"],
+                }
             else:
-                validation_conf = round(base_conf + random.uniform(-0.1, 0.1), 2)
-                reason = "Limited supporting evidence; requires further validation."
+                validation_conf = base_conf
+                validated = False
+                reason = ("No statistical test matches this hypothesis; requires further validation."
+                          if kind is None else f"Not enough data to run the {kind} test.")
+                test = {"type": kind or "untested"}
 
             results.append({
                 "id": hyp.get("id"),
@@ -70,14 +137,25 @@ class EvaluatorAgent:
                 "original_confidence": base_conf,
                 "validated_confidence": validation_conf,
                 "reasoning": reason,
-                "validated": validation_conf > 0.6
+                "validated": bool(validated),
+                "test": test,
             })
 
         return results
 
-    def run(self):
-        """Main entry point for hypothesis evaluation."""
-        insights, summary = self.load_inputs()
+    @traced("EvaluatorAgent.run")
+    def run(self, insights=None, summary=None, sink=None):
+        """
+        Main entry point for hypothesis evaluation.
+
+        Upstream outputs may be passed in directly; otherwise they are read from
+        the reports directory. With an ArtifactSink the result is handed to the
+        sink instead of being written here.
+        """
+        if insights is None or summary is None:
+            loaded_insights, loaded_summary = self.load_inputs()
+            insights = loaded_insights if insights is None else insights
+            summary = loaded_summary if summary is None else summary
         if not insights:
             print("[EvaluatorAgent] No insights found. Evaluation skipped.")
             return {}
@@ -89,6 +167,11 @@ class EvaluatorAgent:
             "validated_hypotheses": validated
         }
 
+        if sink is not None:
+            sink.put("evaluation_results.json", output)
+            print(f"[EvaluatorAgent] {len(validated)} hypotheses validated successfully.")
+            return output
+
         # Ensure reports directory exists
         Path("reports").mkdir(parents=True, exist_ok=True)
 
@@ -100,4 +183,12 @@ class EvaluatorAgent:
         except Exception as e:
             print(f"[EvaluatorAgent] Error saving evaluation results: {e}")
 
-        return output
\ No newline at end of file
+        return output
+
+
+def _rounded(value):
+    """JSON-friendly copy of a test's effect sizes (plain floats, 6 decimals, NaN/inf -> None)."""
+    if isinstance(value, dict):
+        return {k: _rounded(v) for k, v in value.items()}
+    value = float(value)
+    return round(value, 6) if math.isfinite(value) else None
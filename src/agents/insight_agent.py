@@ -2,7 +2,10 @@ import json
 from datetime import datetime
 from pathlib import Path
 from src.utils.llm import call_llm_model
-from src.utils.logger import log_step
+from src.utils.llm_client import estimate_tokens
+from src.utils.logger import log_event, log_step
+from src.utils.prompt_builder import PromptBuilder
+from src.utils.tracing import traced
 
 
 class InsightAgent:
@@ -13,12 +16,31 @@ class InsightAgent:
     explaining potential factors behind ROAS (Return on Ad Spend) changes.
     """
 
+    # Which context sections survive longest when the prompt is over budget
+    SECTION_PRIORITY = {
+        "evaluator_feedback": 5,
+        "roas_trend": 5,
+        "segment_drivers": 4,
+        "key_facts": 3,
+        "overall_summary": 3,
+        "series_trends": 2,
+        "low_ctr_summary": 2,
+    }
+
     def __init__(self, config):
         self.config = config
         self.summary_path = Path("reports/data_summary.json")
         self.output_path = Path("reports/insights.json")
         self.prompt_path = Path("prompts/insight_prompt.md")
+        self.reflection_prompt_path = Path("prompts/reflection_prompt.md")
         self.model = config.get("model", "gemini-2.0-flash")
+        # Estimated tokens of the most recent LLM call, for reflection cost accounting
+        self.last_usage = {"prompt_tokens": 0, "response_tokens": 0}
+
+        prompts = config.get("prompts", {})
+        self.budget_tokens = prompts.get("insight_budget_tokens")
+        self.drop_fields = prompts.get("drop_fields", [])
+        self.prompt_report = {}
 
     def load_data_summary(self):
         """Load the JSON summary generated by the DataAgent."""
@@ -40,26 +62,43 @@ class InsightAgent:
             log_step("InsightAgent", "Data Loading Error", f"Unexpected error: {e}")
         return {}
 
-    def _load_prompt(self):
+    def _load_prompt(self, path=None):
         """Read the LLM reasoning prompt."""
         try:
-            return self.prompt_path.read_text(encoding="utf-8")
+            return Path(path or self.prompt_path).read_text(encoding="utf-8")
         except FileNotFoundError:
             log_step("InsightAgent", "Prompt Error", "insight_prompt.md not found.")
         except Exception as e:
             log_step("InsightAgent", "Prompt Error", f"Error reading prompt file: {e}")
         return None
 
-    def _run_llm(self, prompt, summary):
+    def build_prompt(self, prompt, context, label="Data Summary"):
+        """Pack the instructions and each top-level context field into the token budget."""
+        builder = PromptBuilder(self.budget_tokens, self.drop_fields)
+        builder.add("instructions", f"{prompt}\n\n{label}:", required=True)
+        for key, value in context.items():
+            builder.add(key, value, priority=self.SECTION_PRIORITY.get(key, 1), header=f"## {key}")
+        combined_prompt = builder.build()
+        self.prompt_report = builder.report
+        log_step("InsightAgent", f"Prompt {builder.describe()}", "Prompt Packing")
+        if builder.report["truncated"]:
+            log_event("InsightAgent", "prompt_truncated", builder.report)
+        return combined_prompt
+
+    def _run_llm(self, prompt, summary, label="Data Summary"):
         """Call the configured LLM with structured input."""
         try:
-            combined_prompt = f"{prompt}\n\nData Summary:\n{json.dumps(summary, indent=2)}"
+            combined_prompt = self.build_prompt(prompt, summary, label)
             log_step("InsightAgent", "LLM Execution", f"Calling model: {self.model}")
             response = call_llm_model(
                 model=self.model,
                 prompt=combined_prompt,
                 temperature=0.7,
             )
+            self.last_usage = {
+                "prompt_tokens": estimate_tokens(combined_prompt),
+                "response_tokens": estimate_tokens(response),
+            }
             return json.loads(response)
         except json.JSONDecodeError:
             log_step("InsightAgent", "LLM Error", "LLM returned invalid JSON. Using fallback logic.")
@@ -70,9 +109,9 @@ class InsightAgent:
     def _rule_based(self, summary):
         """Generate fallback hypotheses if LLM or prompt fails."""
         hypotheses = []
-        roas_trend = summary.get("roas_trend", {}).get("trend_direction")
+        roas_trend = summary.get("roas_trend", {})
 
-        if roas_trend == "decline":
+        if roas_trend.get("trend_direction") == "decline" or roas_trend.get("drop_alert"):
             hypotheses = [
                 {
                     "id": "H1",
@@ -93,11 +132,69 @@ class InsightAgent:
                     "confidence": 0.65,
                 },
             ]
+            driver = self._top_segment_driver(summary)
+            if driver:
+                hypotheses.append(driver)
         return {"hypotheses": hypotheses}
 
-    def run(self):
-        """Execute the insight generation pipeline."""
-        summary = self.load_data_summary()
+    def _top_segment_driver(self, summary):
+        """Hypothesis naming the segment that contributed most to the ROAS drop, if any."""
+        drivers = summary.get("segment_drivers", {})
+        top = next((s for s in drivers.get("top_segments", []) if (s.get("rate_effect") or 0) < 0), None)
+        if not top:
+            return None
+        segment = ", ".join(f"{k}={v}" for k, v in top["segment"].items())
+        return {
+            "id": "H3",
+            "title": f"ROAS drop concentrated in segment {segment}",
+            "evidence": (
+                f"Segment ROAS moved from {top['baseline_roas']} to {top['current_roas']} "
+                f"({drivers.get('baseline_period')} vs {drivers.get('current_period')}), contributing "
+                f"{top['contribution']} of the overall {drivers.get('roas_change')} ROAS change "
+                f"with {round(100 * (top.get('spend_share') or 0), 1)}% of spend."
+            ),
+            "confidence": 0.7,
+        }
+
+    @staticmethod
+    def key_facts(summary):
+        """The few summary fields a reflection round needs, instead of the whole summary."""
+        drivers = summary.get("segment_drivers", {})
+        return {
+            "roas_trend": summary.get("roas_trend", {}),
+            "top_segments": drivers.get("top_segments", [])[:3],
+            "series_alerts": summary.get("series_trends", {}).get("alerts", [])[:3],
+        }
+
+    @traced("InsightAgent.reflect")
+    def reflect(self, feedback, facts):
+        """
+        Revise rejected hypotheses given the evaluator's verdicts.
+
+        Only the delta is sent: the reflection instructions, the verdicts and
+        `facts` (see key_facts), not the full data summary. Returns the new
+        hypotheses, or None when the LLM gives no usable answer.
+        """
+        prompt = self._load_prompt(self.reflection_prompt_path)
+        if not prompt:
+            return None
+        result = self._run_llm(prompt, {"evaluator_feedback": feedback, "key_facts": facts},
+                               label="Reflection Context")
+        if not result:
+            return None
+        return result.get("hypotheses", [])
+
+    @traced("InsightAgent.run")
+    def run(self, summary=None, sink=None):
+        """
+        Execute the insight generation pipeline.
+
+        `summary` is the DataAgent output; when omitted it is read from
+        reports/data_summary.json. With an ArtifactSink the result is handed to
+        the sink instead of being written here.
+        """
+        if summary is None:
+            summary = self.load_data_summary()
         if not summary:
             print("InsightAgent terminated: No valid data summary available.")
             return {}
@@ -118,6 +215,10 @@ class InsightAgent:
             "summary_reference": str(self.summary_path),
         }
 
+        if sink is not None:
+            sink.put(self.output_path.name, insights_output)
+            return insights_output
+
         # Ensure output directory exists
         try:
             self.output_path.parent.mkdir(parents=True, exist_ok=True)
@@ -1,7 +1,9 @@
-import json
-import google.generativeai as genai
 from pathlib import Path
 
+from src.utils.json_stream import JSONStreamParser
+from src.utils.llm import stream_gemini
+from src.utils.tracing import traced
+
 
 class PlannerAgent:
     """
@@ -14,8 +16,8 @@ class PlannerAgent:
     def __init__(self, config):
         self.config = config
         self.model_name = config["llm"]["model"]
-        genai.configure(api_key=config["env"]["GOOGLE_API_KEY"])
 
+    @traced("PlannerAgent.run")
     def run(self, query: str) -> dict:
         """Generate a structured task plan based on the given user query."""
         prompt_path = Path("prompts/planner_prompt.md")
@@ -30,29 +32,33 @@ class PlannerAgent:
         # Construct the full LLM input prompt
         full_prompt = f"{base_prompt}\n\nUser Query: {query}\n"
 
-        # Call the Gemini model
+        # Stream the Gemini response (through the shared response cache), printing
+        # each subtask as soon as its JSON object is complete
+        parser = JSONStreamParser("subtasks")
+        print("[PlannerAgent] Task breakdown:")
         try:
-            model = genai.GenerativeModel(self.model_name)
-            response = model.generate_content(full_prompt)
-            text_output = response.text.strip()
+            for chunk in stream_gemini(full_prompt, model=self.model_name):
+                for sub in parser.feed(chunk):
+                    self._print_subtask(len(parser.items), sub)
         except Exception as e:
             print(f"[PlannerAgent] Model call failed: {e}")
-            return {"objective": query, "subtasks": []}
+            if not parser.items:
+                return {"objective": query, "subtasks": []}
 
-        # Parse JSON structure from the model output
-        try:
-            start_idx = text_output.find("{")
-            end_idx = text_output.rfind("}") + 1
-            parsed_json = text_output[start_idx:end_idx]
-            plan = json.loads(parsed_json)
-
-            print("[PlannerAgent] Task breakdown generated successfully:")
-            for i, sub in enumerate(plan.get("subtasks", []), 1):
-                print(f"   {i}. {sub.get('agent', 'Unknown Agent')} → {sub.get('action', 'No action specified')}")
+        plan = parser.document()
+        if isinstance(plan, dict):
+            print("[PlannerAgent] Task breakdown generated successfully.")
             return plan
+        if parser.items:
+            print(f"[PlannerAgent] Response was cut off; keeping {len(parser.items)} complete subtask(s).")
+            return parser.result({"objective": query})
 
-        except Exception as e:
-            print(f"[PlannerAgent] Failed to parse plan: {e}")
-            print("[PlannerAgent] Raw model output:")
-            print(text_output)
-            return {"objective": query, "subtasks": []}
+        print("[PlannerAgent] Failed to parse plan.")
+        print("[PlannerAgent] Raw model output:")
+        print(parser.text.strip())
+        return {"objective": query, "subtasks": []}
+
+    @staticmethod
+    def _print_subtask(number, sub):
+        if isinstance(sub, dict):
+            print(f"   {number}. {sub.get('agent', 'Unknown Agent')} → {sub.get('action', 'No action specified')}")
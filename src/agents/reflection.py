@@ -0,0 +1,174 @@
+import re
+import time
+from datetime import datetime
+
+from src.agents.evaluator_agent import EvaluatorAgent
+from src.agents.insight_agent import InsightAgent
+from src.utils.logger import log_event, log_step
+from src.utils.tracing import traced
+
+
+class ReflectionLoop:
+    """
+    ReflectionLoop
+    ---------------
+    Insight/evaluate cycle driven by `thresholds.evaluation_confidence`.
+
+    When the mean validated confidence is below the threshold, the rejected
+    hypotheses and their test results are sent back to the Insight Agent,
+    which proposes replacements; only those are evaluated, against the same
+    in-memory summary and the evaluator's cached test results. The loop stops
+    when the threshold is met, after `thresholds.max_reflections` rounds, when
+    a round gains less than `thresholds.reflection_min_gain`, or when the LLM
+    proposes nothing new. Latency and estimated tokens are recorded per round.
+    """
+
+    def __init__(self, config, insight_agent=None, evaluator=None):
+        self.config = config
+        self.insight_agent = insight_agent or InsightAgent(config)
+        self.evaluator = evaluator or EvaluatorAgent(config)
+        thresholds = config.get("thresholds", {})
+        self.threshold = float(thresholds.get("evaluation_confidence", 0.75))
+        self.max_reflections = int(thresholds.get("max_reflections", 2))
+        self.min_gain = float(thresholds.get("reflection_min_gain", 0.02))
+
+    @staticmethod
+    def confidence(results):
+        """Mean validated confidence over the evaluated hypotheses (0 when there are none)."""
+        if not results:
+            return 0.0
+        return round(sum(r.get("validated_confidence", 0) for r in results) / len(results), 4)
+
+    @staticmethod
+    def _key(title):
+        return re.sub(r"[^a-z0-9]+", " ", str(title).lower()).strip()
+
+    @staticmethod
+    def _feedback(results):
+        """Delta context for the LLM: full verdicts for rejected hypotheses, titles for the rest."""
+        return {
+            "validated": [r["title"] for r in results if r.get("validated")],
+            "rejected": [
+                {k: r.get(k) for k in ("id", "title", "validated_confidence", "reasoning", "test")}
+                for r in results if not r.get("validated")
+            ],
+        }
+
+    @staticmethod
+    def _renumber(hypotheses, taken):
+        """Give revised hypotheses ids that don't collide with the ones already kept."""
+        numbers = [int(m.group(1)) for h in taken if (m := re.fullmatch(r"H(\d+)", str(h.get("id", ""))))]
+        next_id = max(numbers, default=0) + 1
+        renumbered = []
+        for offset, hyp in enumerate(hypotheses):
+            renumbered.append({**hyp, "id": f"H{next_id + offset}"})
+        return renumbered
+
+    @traced("ReflectionLoop.run")
+    def run(self, insights, summary, sink=None):
+        """
+        Evaluate `insights`, reflecting while confidence is below the threshold.
+
+        Returns (insights, evaluation). When a round changed the hypotheses the
+        revised insights replace insights.json; evaluation_results.json gains a
+        "reflection" block with the per-round record.
+        """
+        start = time.perf_counter()
+        hypotheses = list(insights.get("hypotheses", []))
+        results = self.evaluator.validate_hypotheses({"hypotheses": hypotheses}, summary)
+        confidence = self.confidence(results)
+        iterations = [{
+            "iteration": 0,
+            "confidence": confidence,
+            "hypotheses": len(hypotheses),
+            "latency_seconds": round(time.perf_counter() - start, 4),
+            "prompt_tokens": 0,
+            "response_tokens": 0,
+        }]
+        log_event("EvaluatorAgent", "evaluation_result", {
+            "confidence": confidence,
+            "threshold": self.threshold,
+            "status": "passed" if confidence >= self.threshold else "below_threshold",
+        })
+
+        stop_reason = "threshold_met" if confidence >= self.threshold else "max_reflections"
+        seen = {self._key(h.get("title")) for h in hypotheses}
+        facts = InsightAgent.key_facts(summary)
+        attempt = 0
+
+        while confidence < self.threshold and attempt < self.max_reflections:
+            attempt += 1
+            round_start = time.perf_counter()
+            log_event("EvaluatorAgent", "reflection_triggered", {
+                "reason": f"Low confidence ({confidence} < {self.threshold})",
+                "attempt": attempt,
+            })
+            proposed = self.insight_agent.reflect(self._feedback(results), facts)
+            usage = dict(self.insight_agent.last_usage) if proposed is not None else {}
+            fresh = [h for h in proposed or [] if self._key(h.get("title")) not in seen]
+
+            kept = [(h, r) for h, r in zip(hypotheses, results) if r.get("validated")]
+            candidate_results = [r for _, r in kept]
+            candidate = [h for h, _ in kept]
+            if fresh:
+                fresh = self._renumber(fresh, candidate + hypotheses)
+                seen.update(self._key(h.get("title")) for h in fresh)
+                candidate += fresh
+                candidate_results += self.evaluator.validate_hypotheses({"hypotheses": fresh}, summary)
+            new_confidence = self.confidence(candidate_results)
+
+            iterations.append({
+                "iteration": attempt,
+                "confidence": new_confidence if fresh else confidence,
+                "hypotheses": len(fresh),
+                "latency_seconds": round(time.perf_counter() - round_start, 4),
+                "prompt_tokens": usage.get("prompt_tokens", 0),
+                "response_tokens": usage.get("response_tokens", 0),
+            })
+
+            if proposed is None:
+                stop_reason = "llm_unavailable"
+                break
+            if not fresh:
+                stop_reason = "no_new_hypotheses"
+                break
+            gain = new_confidence - confidence
+            if gain > 0:
+                hypotheses, results, confidence = candidate, candidate_results, new_confidence
+            if confidence >= self.threshold:
+                stop_reason = "threshold_met"
+                break
+            if gain < self.min_gain:
+                stop_reason = "converged"
+                break
+
+        reflection = {
+            "threshold": self.threshold,
+            "max_reflections": self.max_reflections,
+            "reflections": attempt,
+            "stop_reason": stop_reason,
+            "final_confidence": confidence,
+            "total_latency_seconds": round(time.perf_counter() - start, 4),
+            "total_tokens": sum(i["prompt_tokens"] + i["response_tokens"] for i in iterations),
+            "iterations": iterations,
+        }
+        log_event("EvaluatorAgent", "reflection_completed", {
+            "new_confidence": confidence,
+            "reflection_attempts": attempt,
+            "status": stop_reason,
+        })
+        log_step("ReflectionLoop", f"{attempt} reflection(s), confidence {confidence} ({stop_reason}).")
+
+        if hypotheses != insights.get("hypotheses", []):
+            insights = {**insights, "hypotheses": hypotheses, "reflection_rounds": attempt}
+            if sink is not None:
+                sink.put("insights.json", insights)
+
+        evaluation = {
+            "timestamp": datetime.now().isoformat(),
+            "validated_hypotheses": results,
+            "reflection": reflection,
+        }
+        if sink is not None:
+            sink.put("evaluation_results.json", evaluation)
+        return insights, evaluation
@@ -2,6 +2,8 @@ import json
 from datetime import datetime
 from pathlib import Path
 
+from src.utils.tracing import traced
+
 
 class ReportGenerator:
     """
@@ -13,7 +15,6 @@ class ReportGenerator:
     def __init__(self, reports_dir: str = "reports", output_file: str = "reports/report.md"):
         self.reports_dir = Path(reports_dir)
         self.output_file = Path(output_file)
-        self.output_file.parent.mkdir(exist_ok=True)
 
     def _load_json(self, filename: str):
         """Safely load a JSON file from the reports directory."""
@@ -26,18 +27,31 @@ class ReportGenerator:
                 print(f"[ReportGenerator] Warning: Failed to parse JSON from {filename}.")
         return None
 
-    def generate_markdown_report(self):
-        """Combine agent outputs into a structured Markdown report."""
+    @traced("ReportGenerator.generate_markdown_report")
+    def generate_markdown_report(self, artifacts=None, sink=None):
+        """
+        Combine agent outputs into a structured Markdown report.
+
+        `artifacts` maps artifact file names (e.g. "insights.json") to the
+        in-memory outputs of earlier stages; anything missing is loaded from
+        reports_dir. With an ArtifactSink the report is handed to the sink.
+        """
         now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        artifacts = artifacts or {}
+
+        def load(filename):
+            if filename in artifacts:
+                return artifacts[filename]
+            return self._load_json(filename)
 
         # === Load all agent outputs ===
-        data_summary = self._load_json("data_summary.json")
-        insights = self._load_json("insights.json")
-        evaluation = self._load_json("evaluation_results.json")
-        creative_analysis = self._load_json("creative_analysis.json")
+        data_summary = load("data_summary.json")
+        insights = load("insights.json")
+        evaluation = load("evaluation_results.json")
+        creative_analysis = load("creative_analysis.json")
         creative_recommendations = (
-            self._load_json("creative_recommendations.json")
-            or self._load_json("creatives.json")
+            load("creative_recommendations.json")
+            or load("creatives.json")
         )
 
         md = [
@@ -128,5 +142,11 @@ class ReportGenerator:
         md.append("**End of Report**")
 
         # === Write to Markdown file ===
-        self.output_file.write_text("\n".join(md), encoding="utf-8")
-        print(f"[ReportGenerator] Report successfully generated at: {self.output_file}")
\ No newline at end of file
+        report = "\n".join(md)
+        if sink is not None:
+            sink.put(self.output_file.name, report)
+        else:
+            self.output_file.parent.mkdir(exist_ok=True)
+            self.output_file.write_text(report, encoding="utf-8")
+        print(f"[ReportGenerator] Report successfully generated at: {self.output_file}")
+        return report
\ No newline at end of file
@@ -0,0 +1,122 @@
+"""
+Batch query mode for the Agentic Facebook Performance Analyst.
+
+Usage:
+    python run.py --batch queries.jsonl [--workers 4] [--output-dir reports/batch]
+    python -m src.batch queries.jsonl
+
+Each JSONL line is an object with a "query" (or "title") and an optional
+"request_id"/"id". Configuration, the parsed dataset, the data summary and the
+creative row analysis are loaded once and shared by every query; queries run
+concurrently on a bounded worker pool and each one writes its artifacts to
+<output-dir>/<id>/.
+"""
+
+import argparse
+import json
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from src.agents.creative_agent import CreativeAgent
+from src.agents.data_agent import DataAgent
+from src.orchestrator import run_pipeline
+from src.utils.artifacts import ArtifactSink
+from src.utils.config_loader import load_config
+from src.utils.data_loader import get_dataset
+from src.utils.llm import configure_llm_cache
+from src.utils.llm_client import configure_llm_client
+from src.utils.logger import configure_logging, log_event
+
+
+def load_queries(path):
+    """Read [{"id", "query"}] from a JSONL file, skipping blank lines."""
+    queries = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line_no, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            query = item.get("query") or item.get("title")
+            if not query:
+                raise ValueError(f"{path}:{line_no}: expected a 'query' or 'title' field.")
+            query_id = item.get("request_id") or item.get("id") or f"query-{len(queries) + 1:04d}"
+            queries.append({"id": str(query_id), "query": query})
+    return queries
+
+
+def _safe_dirname(query_id: str) -> str:
+    return re.sub(r"[^A-Za-z0-9._-]+", "_", query_id).strip("_") or "query"
+
+
+def prepare_shared_state(config):
+    """Compute the query-independent stages once: dataset, data summary, creative analysis."""
+    get_dataset(config)
+    data_summary = DataAgent(config).run()
+    creative_agent = CreativeAgent(config=config, data_path=config["paths"]["data"])
+    creative_agent.load_data()
+    creative_agent.analyze_creatives()
+    creative_agent.aggregate_creatives()
+    return {"data": data_summary, "creative_analysis": creative_agent}
+
+
+def run_batch(queries_path, output_dir=None, workers=None, config=None):
+    """Run every query in `queries_path`; returns the per-query status list."""
+    config = config or load_config()
+    configure_logging(config)
+    configure_llm_cache(config)
+    configure_llm_client(config)
+    batch_cfg = config.get("batch", {})
+    output_dir = Path(output_dir or batch_cfg.get("output_dir", "reports/batch"))
+    workers = workers or batch_cfg.get("max_workers", 4)
+    compact = config.get("output", {}).get("compact_json", False)
+
+    queries = load_queries(queries_path)
+    print(f"[Batch] {len(queries)} queries, {workers} workers, output: {output_dir}")
+    shared = prepare_shared_state(config)
+
+    def run_one(item):
+        started = time.perf_counter()
+        sink = ArtifactSink(output_dir / _safe_dirname(item["id"]), compact=compact)
+        try:
+            dag = run_pipeline(item["query"], config, sink=sink, precomputed=shared)
+            errors = {name: str(e) for name, e in dag.errors.items()}
+            status = "failed" if dag.failed else "completed"
+        except Exception as e:
+            errors, status = {"pipeline": str(e)}, "failed"
+        result = {
+            "id": item["id"],
+            "query": item["query"],
+            "status": status,
+            "output_dir": str(sink.output_dir),
+            "seconds": round(time.perf_counter() - started, 3),
+            "errors": errors,
+        }
+        log_event("Batch", "query_" + status, result)
+        return result
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(run_one, queries))
+
+    output_dir.mkdir(parents=True, exist_ok=True)
+    with open(output_dir / "batch_summary.json", "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2, ensure_ascii=False)
+
+    failed = sum(r["status"] != "completed" for r in results)
+    print(f"[Batch] Completed {len(results) - failed}/{len(results)} queries "
+          f"(summary: {output_dir / 'batch_summary.json'}).")
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run many analyst queries over one loaded dataset.")
+    parser.add_argument("queries", help="JSONL file with one {'query': ...} object per line")
+    parser.add_argument("--workers", type=int, default=None, help="Concurrent queries (default: batch.max_workers)")
+    parser.add_argument("--output-dir", default=None, help="Per-query report root (default: batch.output_dir)")
+    args = parser.parse_args(argv)
+    run_batch(args.queries, output_dir=args.output_dir, workers=args.workers)
+
+
+if __name__ == "__main__":
+    main()
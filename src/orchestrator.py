@@ -2,151 +2,276 @@ import argparse
 import json
 from pathlib import Path
 
+from src.utils.artifacts import ArtifactSink
 from src.utils.config_loader import load_config
-from src.utils.logger import log_event
+from src.utils.dag import DAGScheduler
+from src.utils.logger import configure_logging, log_event
+from src.utils import report_cache
+from src.utils.tracing import configure_tracing, finish_tracing, trace_span
 
-from src.agents.planner import PlannerAgent
-from src.agents.data_agent import DataAgent
-from src.agents.insight_agent import InsightAgent
-from src.agents.evaluator_agent import EvaluatorAgent
-from src.agents.creative_agent import CreativeAgent
-from src.agents.report_generator import ReportGenerator
+# Agents (and with them pandas, numpy and the LLM client) are imported inside
+# the stages that use them, so `--help` and cached-report runs start fast.
 
+OUTPUTS = ["data_summary.json", "insights.json", "evaluation_results.json", "creatives.json", "report.md"]
 
-def main(query: str | None = None):
-    """Main orchestrator for the Kasparro Agentic FB Analyst project."""
-    
-    # Allow both CLI and programmatic use
-    if query is None:
-        parser = argparse.ArgumentParser(description="Kasparro Agentic FB Analyst")
-        parser.add_argument("query", type=str, help="Example: 'Analyze ROAS drop'")
-        args = parser.parse_args()
-        query = args.query
 
-    # --- Initialize configuration and environment ---
-    try:
-        config = load_config()
-        Path("logs").mkdir(exist_ok=True)
-        Path("reports").mkdir(exist_ok=True)
-    except Exception as e:
-        print(f"Error initializing environment: {e}")
-        return
+def build_pipeline(config, query: str, sink: ArtifactSink, precomputed: dict | None = None,
+                   memo=None) -> DAGScheduler:
+    """
+    Declare the agent graph (see agent_graph.md).
 
-    print("Starting Agentic System")
-    print(f"Query: {query}")
-    print(f"Mode: {config['project']['mode']}")
-    print(f"Using data: {config['paths']['data']}")
-    print("Configuration and environment loaded successfully.\n")
+    Each node lists the upstream nodes whose outputs it consumes; the scheduler
+    runs every node whose inputs are ready, so the Planner call, dataset summary
+    and creative row analysis overlap. Outputs travel between stages in memory
+    and are persisted once, by `sink`.
 
-    log_event("System", "initialized", {"query": query, "mode": config["project"]["mode"]})
+    `precomputed` may supply the query-independent results ("data",
+    "creative_analysis") so batch runs compute them once for all queries.
+    With a StageMemo (`memo`), stages whose inputs are unchanged are served
+    from its cache; `memo_inputs` lists what each stage's key covers.
+    """
+    precomputed = precomputed or {}
+    max_workers = config.get("orchestration", {}).get("max_workers", 4)
+    dag = DAGScheduler(max_workers=max_workers)
+    reports_dir = sink.output_dir
 
-    # --- Step 1: Planner Agent ---
-    print("[Planner Agent] Decomposing query into subtasks...")
-    try:
-        planner = PlannerAgent(config)
-        plan = planner.run(query)
+    # --- Planner Agent ---
+    def run_planner(inputs):
+        from src.agents.planner import PlannerAgent
+        print("[Planner Agent] Decomposing query into subtasks...")
+        plan = PlannerAgent(config).run(query)
         log_event("PlannerAgent", "completed", plan)
-
         print("Planner stage completed.\n")
         print("Structured Plan Output:")
         print(json.dumps(plan, indent=2, ensure_ascii=False))
-    except Exception as e:
-        print(f"Planner Agent failed: {e}")
-        return
-
-    # --- Step 2: Data Agent ---
-    print("\n[Data Agent] Summarizing dataset...")
-    try:
-        data_agent = DataAgent(config)
-        data_summary = data_agent.run()
-        log_event("DataAgent", "completed", data_summary)
+        return plan
 
-        data_summary_path = Path("reports/data_summary.json")
-        with open(data_summary_path, "w", encoding="utf-8") as f:
-            json.dump(data_summary, f, indent=2, ensure_ascii=False)
+    # --- Data Agent ---
+    def run_data(inputs):
+        if "data" in precomputed:
+            data_summary = precomputed["data"]
+        else:
+            from src.agents.data_agent import DataAgent
+            print("\n[Data Agent] Summarizing dataset...")
+            data_summary = DataAgent(config).run()
+            log_event("DataAgent", "completed", data_summary)
+        print(f"Data summary saved to {sink.put('data_summary.json', data_summary)}")
+        return data_summary
 
-        print(f"Data summary saved to {data_summary_path}")
-        print("Next: Insight Agent will generate hypotheses (Step 3).")
-    except Exception as e:
-        print(f"Data Agent failed: {e}")
-        return
-
-    # --- Step 3: Insight Agent ---
-    print("\n[Insight Agent] Generating hypotheses...")
-    try:
-        insight_agent = InsightAgent(config)
-        insights = insight_agent.run()
+    # --- Insight Agent ---
+    def run_insight(inputs):
+        from src.agents.insight_agent import InsightAgent
+        print("\n[Insight Agent] Generating hypotheses...")
+        insights = InsightAgent(config).run(summary=inputs["data"], sink=sink)
         log_event("InsightAgent", "completed", insights)
+        return insights
 
-        insights_path = Path("reports/insights.json")
-        with open(insights_path, "w", encoding="utf-8") as f:
-            json.dump(insights, f, indent=2, ensure_ascii=False)
-
-        print("Insights saved to reports/insights.json")
-    except Exception as e:
-        print(f"Insight Agent failed: {e}")
-        return
-
-    # --- Step 4: Evaluator Agent ---
-    print("\n[Evaluator Agent] Validating hypotheses...")
-    try:
-        evaluator_agent = EvaluatorAgent(config)
-        evaluation = evaluator_agent.run()
+    # --- Evaluator Agent (with the reflection loop back into the Insight Agent) ---
+    def run_evaluator(inputs):
+        from src.agents.reflection import ReflectionLoop
+        print("\n[Evaluator Agent] Validating hypotheses...")
+        insights, evaluation = ReflectionLoop(config).run(inputs["insight"], inputs["data"], sink=sink)
+        reflection = evaluation["reflection"]
+        print(f"[EvaluatorAgent] {len(evaluation['validated_hypotheses'])} hypotheses validated "
+              f"(confidence {reflection['final_confidence']}, {reflection['reflections']} reflection(s), "
+              f"{reflection['stop_reason']}).")
         log_event("EvaluatorAgent", "completed", evaluation)
+        return evaluation
 
-        eval_path = Path("reports/evaluation_results.json")
-        with open(eval_path, "w", encoding="utf-8") as f:
-            json.dump(evaluation, f, indent=2, ensure_ascii=False)
-
-        print("Evaluation results saved to reports/evaluation_results.json")
-        print("Next: Creative Agent will analyze underperforming creatives (Step 5).")
-    except Exception as e:
-        print(f"Evaluator Agent failed: {e}")
-        return
-
-    # --- Step 5: Creative Agent ---
-    print("\n[Creative Agent] Analyzing and generating creative recommendations...")
-    try:
+    # --- Creative Agent: row analysis needs only the dataset ---
+    def run_creative_analysis(inputs):
+        if "creative_analysis" in precomputed:
+            return precomputed["creative_analysis"]
+        from src.agents.creative_agent import CreativeAgent
+        print("\n[Creative Agent] Analyzing underperforming creatives...")
         creative_agent = CreativeAgent(
             config=config,
             data_path=config["paths"]["data"],
-            insights_path="reports/insights.json",
-            creative_output_path="reports/creatives.json",
+            insights_path=reports_dir / "insights.json",
+            creative_output_path=reports_dir / "creatives.json",
             prompt_path="prompts/creative_prompt.md"
         )
+        creative_agent.load_data()
+        creative_agent.analyze_creatives()
+        creative_agent.aggregate_creatives()
+        return creative_agent
 
-        creative_output = creative_agent.run()
+    # --- Creative Agent: recommendations need the (possibly revised) insights ---
+    def run_creative(inputs):
+        print("\n[Creative Agent] Generating creative recommendations...")
+        creative_output = inputs["creative_analysis"].generate_improvements(
+            insights=sink.get("insights.json", inputs["insight"]), sink=sink
+        )
         log_event("CreativeAgent", "completed", creative_output)
+        return creative_output
 
-        creative_output_path = Path("reports/creatives.json")
-        with open(creative_output_path, "w", encoding="utf-8") as f:
-            json.dump(creative_output, f, indent=2, ensure_ascii=False)
+    # --- Report Generator ---
+    def run_report(inputs):
+        from src.agents.report_generator import ReportGenerator
+        print("\n[Report Generator] Compiling final report...")
+        report_gen = ReportGenerator(reports_dir=reports_dir, output_file=reports_dir / "report.md")
+        report = report_gen.generate_markdown_report(artifacts=sink.artifacts, sink=sink)
+        log_event("ReportGenerator", "completed", {"output": str(report_gen.output_file)})
+        return report
 
-        print("Creative output saved to reports/creatives.json")
+    memo_inputs = {
+        "planner": {"query": query, "config": ["llm"], "files": ["prompts/planner_prompt.md"]},
+        "data": {"config": ["dataset", "segments", "timeseries", "thresholds"], "data": True},
+        "insight": {"config": ["llm", "prompts"], "files": ["prompts/insight_prompt.md"]},
+        "evaluator": {"config": ["evaluation", "thresholds", "project", "llm", "prompts", "dataset"],
+                      "files": ["prompts/insight_prompt.md", "prompts/reflection_prompt.md"], "data": True},
+        "creative_analysis": {"config": ["creative", "thresholds", "dataset"], "data": True, "store": False},
+        "creative": {"config": ["creative", "prompts", "llm"], "files": ["prompts/creative_prompt.md"]},
+        "report": {},
+    }
+
+    def add(name, fn, deps=(), outputs=()):
+        if memo is not None and not precomputed:
+            fn = memo.wrap(name, fn, memo_inputs[name], deps, config, sink)
+        dag.add(name, fn, deps=deps, outputs=outputs)
+
+    add("planner", run_planner, outputs=["plan"])
+    add("data", run_data, outputs=["data_summary.json"])
+    add("insight", run_insight, deps=["data"], outputs=["insights.json"])
+    add("evaluator", run_evaluator, deps=["data", "insight"], outputs=["evaluation_results.json"])
+    add("creative_analysis", run_creative_analysis, outputs=["underperforming creatives"])
+    add("creative", run_creative, deps=["creative_analysis", "insight", "evaluator"], outputs=["creatives.json"])
+    add("report", run_report, deps=["planner", "data", "insight", "evaluator", "creative"],
+        outputs=["report.md"])
+    return dag
+
+
+def run_pipeline(query: str, config, sink: ArtifactSink | None = None,
+                 precomputed: dict | None = None, memo=None) -> DAGScheduler:
+    """
+    Run the full agent graph for one query and return the finished scheduler.
+
+    Artifacts are available in `sink.artifacts` (and `dag.results`); pass
+    `ArtifactSink(persist=False)` to keep the whole run in memory.
+    """
+    if sink is None:
+        sink = ArtifactSink("reports", compact=config.get("output", {}).get("compact_json", False))
+    dag = build_pipeline(config, query, sink, precomputed, memo)
+    try:
+        dag.run()
+    finally:
+        sink.close()
+    return dag
+
+
+def serve_cached_report(query: str, config, reports_dir="reports") -> bool:
+    """Fast path: restore a previous run of `query` on the same data and config into reports_dir."""
+    if not report_cache.enabled(config):
+        return False
+    cache = report_cache.ReportCache.from_config(config)
+    restored = cache.restore(cache.key(query, config), reports_dir)
+    if not restored:
+        return False
+    print(f"Query: {query}")
+    print("Served from the report cache (same query, data and config); use --refresh to re-run.")
+    print("Outputs restored:")
+    for path in restored:
+        print(f" - {path.as_posix()}")
+    log_event("System", "served_from_cache", {"query": query, "outputs_dir": str(reports_dir)})
+    return True
+
+
+def main(query: str | None = None, trace: bool | None = None, refresh: bool = False, force: bool = False):
+    """
+    Main orchestrator for the Kasparro Agentic FB Analyst project.
+
+    `trace` forces profiling on/off; by default `tracing.enabled` from config decides.
+    Unless `refresh` (or tracing) is set, a previous run of the same query on the
+    same data and config is served from the report cache; otherwise stages whose
+    inputs are unchanged are served from the stage memo. `force` recomputes everything.
+    """
+    
+    # Allow both CLI and programmatic use
+    if query is None:
+        parser = argparse.ArgumentParser(description="Kasparro Agentic FB Analyst")
+        parser.add_argument("query", type=str, help="Example: 'Analyze ROAS drop'")
+        parser.add_argument("--trace", action="store_true", default=None,
+                            help="Record a per-stage timing/memory trace (reports/trace.json)")
+        parser.add_argument("--refresh", action="store_true",
+                            help="Ignore the report cache (unchanged stages still come from the stage memo)")
+        parser.add_argument("--force", action="store_true",
+                            help="Recompute every stage, ignoring the report cache and the stage memo")
+        args = parser.parse_args()
+        query, trace, refresh, force = args.query, args.trace, args.refresh, args.force
+
+    # --- Initialize configuration and environment ---
+    try:
+        config = load_config()
+        configure_logging(config)
+        Path("logs").mkdir(exist_ok=True)
+        Path("reports").mkdir(exist_ok=True)
     except Exception as e:
-        print(f"Creative Agent failed: {e}")
+        print(f"Error initializing environment: {e}")
+        return
+
+    # --- Fast path: nothing below this point is imported for a cache hit ---
+    if not (refresh or force or trace) and serve_cached_report(query, config):
         return
 
-    # --- Step 6: Report Generator ---
-    print("\n[Report Generator] Compiling final report...")
     try:
-        report_gen = ReportGenerator(reports_dir="reports", output_file="reports/report.md")
-        report_gen.generate_markdown_report()
-        log_event("ReportGenerator", "completed", {"output": "reports/report.md"})
-        print("Report successfully generated at: reports/report.md")
+        from src.utils import memo as memo_cache
+        from src.utils.llm import configure_llm_cache
+        from src.utils.llm_client import configure_llm_client
+        configure_tracing(config, enabled=trace)
+        configure_llm_cache(config)
+        configure_llm_client(config)
     except Exception as e:
-        print(f"Report Generator failed: {e}")
+        print(f"Error initializing environment: {e}")
+        return
+
+    print("Starting Agentic System")
+    print(f"Query: {query}")
+    print(f"Mode: {config['project']['mode']}")
+    print(f"Using data: {config['paths']['data']}")
+    print("Configuration and environment loaded successfully.\n")
+
+    log_event("System", "initialized", {"query": query, "mode": config["project"]["mode"]})
+
+    sink = ArtifactSink("reports", compact=config.get("output", {}).get("compact_json", False))
+    memo = None
+    if memo_cache.enabled(config):
+        memo = memo_cache.StageMemo.from_config(config, force=force)
+    with trace_span("pipeline", query=query):
+        dag = run_pipeline(query, config, sink=sink, memo=memo)
+    finish_tracing(config)
+
+    print("\nStage timings:")
+    print(dag.timing_report())
+    if memo is not None:
+        print(f"Stage memo: {memo.describe()}")
+    log_event("System", "timings", {
+        "stages": dag.timings,
+        "critical_path": dag.critical_path()[0],
+        "wall_time": dag.wall_time,
+    })
+
+    if dag.failed:
+        for name, error in dag.errors.items():
+            print(f"{name} stage failed: {error}")
+        if dag.skipped:
+            print(f"Skipped because an upstream stage failed: {', '.join(dag.skipped)}")
         return
 
+    if report_cache.enabled(config):
+        cache = report_cache.ReportCache.from_config(config)
+        cache.store(cache.key(query, config), {name: sink.get(name) for name in OUTPUTS if name in sink.artifacts},
+                    query=query, compact=sink.compact)
+
     # --- Completion ---
     print("\nAgentic System Run Complete.")
     print("Outputs generated:")
-    print(" - reports/data_summary.json")
-    print(" - reports/insights.json")
-    print(" - reports/evaluation_results.json")
-    print(" - reports/creatives.json")
-    print(" - reports/report.md")
+    for name in OUTPUTS:
+        print(f" - reports/{name}")
     print("End-to-end analysis completed successfully.")
+    from src.utils.llm import get_llm_cache
+    cache = get_llm_cache()
+    if cache is not None:
+        print(f"LLM cache: {cache.hits} hits, {cache.misses} misses.")
     log_event("System", "completed", {"outputs_dir": "reports"})
 
 
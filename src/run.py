@@ -3,27 +3,56 @@ Main entry point for the Agentic Facebook Performance Analyst system.
 
 Usage:
     python run.py "Analyze ROAS drop"
+    python run.py --trace "Analyze ROAS drop"
+    python run.py --refresh "Analyze ROAS drop"     # ignore the cached report
+    python run.py --force "Analyze ROAS drop"       # recompute every stage (no report cache, no stage memo)
+    python run.py --batch queries.jsonl [--workers 4] [--output-dir reports/batch]
+    python run.py --serve [--host 127.0.0.1] [--port 8765] [--workers 2]
 
 This script serves as a CLI wrapper for the orchestrator module.
 It loads configuration, initializes the orchestrator, and executes the full agentic workflow.
+Heavy modules are imported only once a mode actually needs them, and a query
+already answered on the same data and config is served from the report cache.
 """
 
 import sys
 import traceback
-from src.orchestrator import main
+
+USAGE = """Usage: python run.py [--trace] [--refresh] [--force] "<query>"
+       python run.py --batch queries.jsonl [--workers N] [--output-dir DIR]
+       python run.py --serve [--host HOST] [--port PORT] [--workers N]
+
+  --trace     record a per-stage timing/memory trace (reports/trace.json)
+  --refresh   ignore the report cache (unchanged stages still come from the stage memo)
+  --force     recompute every stage, ignoring the report cache and the stage memo
+Example: python run.py "Analyze ROAS drop"
+"""
 
 
 def run():
     """Execute the full pipeline with the provided query."""
     try:
-        if len(sys.argv) < 2:
-            print("Usage: python run.py \"<query>\"")
-            print("Example: python run.py \"Analyze ROAS drop\"")
-            sys.exit(1)
+        if len(sys.argv) < 2 or sys.argv[1] in ("-h", "--help"):
+            print(USAGE)
+            sys.exit(0 if len(sys.argv) > 1 else 1)
+
+        if sys.argv[1] == "--batch":
+            from src.batch import main as batch_main
+            batch_main(sys.argv[2:])
+            return
+
+        if sys.argv[1] == "--serve":
+            from src.service import main as service_main
+            service_main(sys.argv[2:])
+            return
+
+        from src.orchestrator import main
 
-        query = " ".join(sys.argv[1:])
+        flags = {"--trace", "--refresh", "--force"}
+        args = sys.argv[1:]
+        query = " ".join(a for a in args if a not in flags)
         print("\n=== Starting Agentic Facebook Analyst System ===\n")
-        main(query)
+        main(query, trace=("--trace" in args) or None, refresh="--refresh" in args, force="--force" in args)
         print("\n=== Execution Completed Successfully ===\n")
 
     except KeyboardInterrupt:
@@ -0,0 +1,340 @@
+"""
+Resident analyst service.
+
+Usage:
+    python run.py --serve [--host 127.0.0.1] [--port 8765] [--workers 2]
+    python -m src.service
+
+Keeps configuration, the parsed dataset, the query-independent stages (data
+summary, creative row analysis), the LLM client and the LLM cache warm across
+requests, so a query only pays for its own LLM calls.
+
+HTTP API (JSON):
+    POST /analyze      {"query": "...", "id": optional}  -> 202 {"id", "status": "queued"}
+                       503 + Retry-After when the queue is full (backpressure)
+    GET  /jobs/<id>    job status; "result" once finished (?wait=<seconds> blocks)
+    GET  /metrics      queue depth, in-flight jobs, counters, latency percentiles
+    GET  /health       liveness
+
+Accepted queries wait in a bounded queue and run on a fixed pool of worker
+threads; each job writes its artifacts to <output_dir>/<id>/.
+"""
+
+import argparse
+import json
+import queue
+import re
+import threading
+import time
+import uuid
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+from src.batch import _safe_dirname, prepare_shared_state
+from src.orchestrator import run_pipeline
+from src.utils.artifacts import ArtifactSink
+from src.utils.config_loader import load_config
+from src.utils.fingerprint import dataset_path, file_signature
+from src.utils.llm import configure_llm_cache, get_llm_cache
+from src.utils.llm_client import configure_llm_client
+from src.utils.logger import configure_logging, log_event
+
+_STOP = object()
+LATENCY_WINDOW = 1000
+
+
+class QueueFull(Exception):
+    """Raised by AnalystService.submit when the request queue is at capacity."""
+
+
+def _percentiles(values) -> dict:
+    if not values:
+        return {"p50": None, "p95": None, "max": None}
+    ordered = sorted(values)
+
+    def pick(q):
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))], 4)
+
+    return {"p50": pick(0.50), "p95": pick(0.95), "max": round(ordered[-1], 4)}
+
+
+class AnalystService:
+    """
+    AnalystService
+    ---------------
+    Warm pipeline state plus a bounded job queue drained by worker threads.
+
+        service = AnalystService(config).start()
+        job = service.submit("Analyze ROAS drop")
+        service.wait(job["id"], timeout=60)
+        service.stop()
+
+    The shared state is rebuilt when the data file changes on disk.
+    """
+
+    def __init__(self, config=None, workers=None, queue_size=None, output_dir=None):
+        self.config = config or load_config()
+        settings = self.config.get("service", {})
+        self.workers = workers or settings.get("max_workers", 2)
+        self.queue_size = queue_size or settings.get("queue_size", 16)
+        self.output_dir = Path(output_dir or settings.get("output_dir", "reports/service"))
+        self.persist = settings.get("persist", True)
+        self.job_history = settings.get("job_history", 1000)
+
+        self._queue = queue.Queue(maxsize=self.queue_size)
+        self._threads = []
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._state_lock = threading.Lock()
+        self._shared = None
+        self._signature = None
+        self._in_flight = 0
+        self._counters = {"accepted": 0, "rejected": 0, "completed": 0, "failed": 0}
+        self._queue_wait = deque(maxlen=LATENCY_WINDOW)
+        self._run_time = deque(maxlen=LATENCY_WINDOW)
+        self._started_at = None
+
+    # --- Warm state ---
+    def _data_signature(self):
+        return file_signature(dataset_path(self.config))
+
+    def shared_state(self) -> dict:
+        """The precomputed query-independent stages, refreshed if the dataset changed."""
+        with self._state_lock:
+            signature = self._data_signature()
+            if self._shared is None or signature != self._signature:
+                started = time.perf_counter()
+                self._shared = prepare_shared_state(self.config)
+                self._signature = signature
+                log_event("Service", "state_loaded", {"seconds": round(time.perf_counter() - started, 3)})
+            return self._shared
+
+    def start(self):
+        """Configure the process-wide clients, warm the shared state and start the workers."""
+        configure_logging(self.config)
+        configure_llm_cache(self.config)
+        configure_llm_client(self.config)
+        self.shared_state()
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"analyst-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        self._started_at = time.time()
+        print(f"[Service] Ready: {self.workers} workers, queue size {self.queue_size}.")
+        return self
+
+    def stop(self, timeout=None):
+        """Let queued jobs finish, then stop the workers."""
+        for _ in self._threads:
+            self._queue.put(_STOP)
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    # --- Jobs ---
+    def submit(self, query: str, job_id=None) -> dict:
+        """Queue a query; raises QueueFull instead of blocking when at capacity."""
+        if not query or not str(query).strip():
+            raise ValueError("expected a non-empty 'query'.")
+        job_id = str(job_id or uuid.uuid4().hex[:12])
+        job = {
+            "id": job_id,
+            "query": str(query),
+            "status": "queued",
+            "submitted_at": time.time(),
+            "done": threading.Event(),
+        }
+        with self._lock:
+            if job_id in self._jobs and self._jobs[job_id]["status"] in ("queued", "running"):
+                raise ValueError(f"job '{job_id}' is already {self._jobs[job_id]['status']}.")
+            try:
+                self._queue.put_nowait(job)
+            except queue.Full:
+                self._counters["rejected"] += 1
+                raise QueueFull(f"queue is full ({self.queue_size} jobs waiting)")
+            self._counters["accepted"] += 1
+            self._jobs[job_id] = job
+            self._evict_finished()
+        return self.job(job_id)
+
+    def _evict_finished(self):
+        excess = len(self._jobs) - self.job_history
+        for job_id in [k for k, j in self._jobs.items() if j["done"].is_set()][:max(excess, 0)]:
+            del self._jobs[job_id]
+
+    def job(self, job_id: str):
+        """Public view of a job (None if unknown)."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            return {k: v for k, v in job.items() if k != "done"}
+
+    def wait(self, job_id: str, timeout=None):
+        """Block until the job finishes (or `timeout` seconds pass); returns its view."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is not None:
+            job["done"].wait(timeout)
+        return self.job(job_id)
+
+    def _work(self):
+        while True:
+            job = self._queue.get()
+            try:
+                if job is _STOP:
+                    return
+                self._run(job)
+            finally:
+                self._queue.task_done()
+
+    def _run(self, job):
+        started = time.time()
+        with self._lock:
+            job["status"] = "running"
+            job["started_at"] = started
+            self._in_flight += 1
+            self._queue_wait.append(started - job["submitted_at"])
+
+        output_dir = self.output_dir / _safe_dirname(job["id"])
+        sink = ArtifactSink(output_dir, persist=self.persist,
+                            compact=self.config.get("output", {}).get("compact_json", False))
+        try:
+            dag = run_pipeline(job["query"], self.config, sink=sink, precomputed=self.shared_state())
+            errors = {name: str(e) for name, e in dag.errors.items()}
+            status = "failed" if dag.failed else "completed"
+        except Exception as e:
+            dag, errors, status = None, {"pipeline": str(e)}, "failed"
+
+        evaluation = sink.get("evaluation_results.json") or {}
+        result = {
+            "output_dir": str(output_dir) if self.persist else None,
+            "artifacts": sorted(sink.artifacts),
+            "validated_hypotheses": evaluation.get("validated_hypotheses", []),
+            "report": sink.get("report.md"),
+            "timings": dag.timings if dag is not None else {},
+        }
+        finished = time.time()
+        with self._lock:
+            self._in_flight -= 1
+            self._run_time.append(finished - started)
+            self._counters[status] += 1
+            job.update(status=status, finished_at=finished, seconds=round(finished - started, 3),
+                       errors=errors, result=result)
+        job["done"].set()
+        log_event("Service", "job_" + status, {
+            "id": job["id"], "query": job["query"], "seconds": job["seconds"], "errors": errors,
+        })
+
+    # --- Metrics ---
+    def metrics(self) -> dict:
+        with self._lock:
+            cache = get_llm_cache()
+            return {
+                "uptime_seconds": round(time.time() - self._started_at, 3) if self._started_at else 0.0,
+                "workers": self.workers,
+                "queue": {"depth": self._queue.qsize(), "capacity": self.queue_size},
+                "in_flight": self._in_flight,
+                "jobs": dict(self._counters),
+                "latency_seconds": {
+                    "queue_wait": _percentiles(self._queue_wait),
+                    "run": _percentiles(self._run_time),
+                },
+                "llm_cache": {"hits": cache.hits, "misses": cache.misses} if cache is not None else None,
+            }
+
+
+class _Handler(BaseHTTPRequestHandler):
+    service: AnalystService = None
+    retry_after = 5
+
+    def log_message(self, format, *args):
+        # Requests are recorded through log_event instead of stderr
+        pass
+
+    def _send(self, status, payload, headers=None):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == "/health":
+            return self._send(200, {"status": "ok"})
+        if url.path == "/metrics":
+            return self._send(200, self.service.metrics())
+        match = re.fullmatch(r"/jobs/([^/]+)", url.path)
+        if match:
+            wait = parse_qs(url.query).get("wait")
+            try:
+                job = (self.service.wait(match.group(1), float(wait[0])) if wait
+                       else self.service.job(match.group(1)))
+            except ValueError:
+                return self._send(400, {"error": "'wait' must be a number of seconds."})
+            if job is None:
+                return self._send(404, {"error": f"unknown job '{match.group(1)}'."})
+            return self._send(200, job)
+        self._send(404, {"error": f"no route for GET {url.path}"})
+
+    def do_POST(self):
+        if urlparse(self.path).path != "/analyze":
+            return self._send(404, {"error": f"no route for POST {self.path}"})
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+            body = json.loads(self.rfile.read(length) or b"{}")
+            job = self.service.submit(body.get("query"), body.get("id") or body.get("request_id"))
+        except QueueFull as e:
+            return self._send(503, {"error": str(e)}, headers={"Retry-After": str(self.retry_after)})
+        except (ValueError, AttributeError) as e:
+            return self._send(400, {"error": f"bad request: {e}"})
+        self._send(202, job)
+
+
+def make_server(service: AnalystService, host=None, port=None) -> ThreadingHTTPServer:
+    """HTTP front end for `service` (port 0 picks a free port; see server.server_address)."""
+    settings = service.config.get("service", {})
+    handler = type("AnalystHandler", (_Handler,), {
+        "service": service,
+        "retry_after": settings.get("retry_after_seconds", 5),
+    })
+    server = ThreadingHTTPServer((host or settings.get("host", "127.0.0.1"),
+                                  settings.get("port", 8765) if port is None else port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def serve(host=None, port=None, workers=None, config=None):
+    """Start the service and block until interrupted."""
+    service = AnalystService(config, workers=workers).start()
+    server = make_server(service, host, port)
+    address = "%s:%s" % server.server_address[:2]
+    print(f"[Service] Listening on http://{address}")
+    log_event("Service", "started", {"address": address, "workers": service.workers,
+                                     "queue_size": service.queue_size})
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n[Service] Shutting down...")
+    finally:
+        server.server_close()
+        service.stop()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve analyst queries from a warm, resident process.")
+    parser.add_argument("--host", default=None, help="Bind address (default: service.host)")
+    parser.add_argument("--port", type=int, default=None, help="Port (default: service.port)")
+    parser.add_argument("--workers", type=int, default=None, help="Concurrent queries (default: service.max_workers)")
+    args = parser.parse_args(argv)
+    serve(host=args.host, port=args.port, workers=args.workers)
+
+
+if __name__ == "__main__":
+    main()
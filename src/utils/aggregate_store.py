@@ -0,0 +1,141 @@
+"""
+Persisted per-date aggregates for incremental DataAgent summaries.
+
+Each date in the feed is stored as a MetricsAccumulator partial plus an
+order-independent checksum of that date's rows. A daily run only folds in
+rows newer than the last stored date; if any historical date's checksum no
+longer matches the feed, the store is rebuilt from scratch.
+"""
+
+import json
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src.utils.streaming_stats import MetricsAccumulator
+
+UNDATED = "undated"
+
+
+def _date_keys(df: pd.DataFrame) -> np.ndarray:
+    """YYYY-MM-DD key per row (UNDATED for unparseable dates), formatted once per distinct day."""
+    dates = df["date"]
+    if not pd.api.types.is_datetime64_any_dtype(dates):
+        dates = pd.to_datetime(dates, errors="coerce")
+    days = dates.to_numpy().astype("datetime64[D]")
+    uniques, inverse = np.unique(days, return_inverse=True)
+    labels = np.array([UNDATED if np.isnat(d) else str(d) for d in uniques], dtype=object)
+    return labels[inverse.reshape(-1)]
+
+
+def scan_daily_partials(frames, numeric_cols, low_ctr_threshold, after: str | None = None,
+                        sketch_capacity: int = 256):
+    """
+    Stream `frames` once, returning (partials, checksums).
+
+    `checksums` covers every date in the feed: {date: [rows, hi_sum, lo_sum]} where the
+    sums are over the 64-bit row hashes split into 32-bit halves, so they can be
+    added across chunks exactly and do not depend on row order. `partials` holds
+    MetricsAccumulators only for dates strictly after `after` (all dates when None).
+    """
+    partials, checksums = {}, {}
+    for frame in frames:
+        keys = _date_keys(frame)
+        hashes = pd.util.hash_pandas_object(frame, index=False).to_numpy()
+        sums = (
+            pd.DataFrame({
+                "key": keys,
+                "rows": 1,
+                "hi": (hashes >> np.uint64(32)).astype("int64"),
+                "lo": (hashes & np.uint64(0xFFFFFFFF)).astype("int64"),
+            })
+            .groupby("key", sort=False)
+            .sum()
+        )
+        for key, rows, hi, lo in zip(sums.index, sums["rows"], sums["hi"], sums["lo"]):
+            prev = checksums.get(key, [0, 0, 0])
+            checksums[key] = [prev[0] + int(rows), prev[1] + int(hi), prev[2] + int(lo)]
+
+        new_mask = np.ones(len(frame), dtype=bool) if after is None else (keys != UNDATED) & (keys > after)
+        if not new_mask.any():
+            continue
+        new_rows = frame[new_mask]
+        for key, part in new_rows.groupby(keys[new_mask], sort=False):
+            acc = partials.setdefault(key, MetricsAccumulator(numeric_cols, low_ctr_threshold, sketch_capacity))
+            acc.update(part)
+    return partials, checksums
+
+
+class AggregateStore:
+    """
+    AggregateStore
+    ---------------
+    JSON file of per-date partial aggregates keyed by YYYY-MM-DD.
+    """
+
+    VERSION = 2  # 2: partials carry per-date ROAS/CTR/CPM components
+
+    def __init__(self, path="reports/daily_aggregates.json"):
+        self.path = Path(path)
+        self.meta = {}
+        self.dates = {}
+
+    def load(self):
+        """Load the store from disk; a missing or unreadable file leaves it empty."""
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+            self.meta, self.dates = data["meta"], data["dates"]
+        except FileNotFoundError:
+            pass
+        except (json.JSONDecodeError, KeyError) as e:
+            print(f"[AggregateStore] Ignoring unreadable store {self.path}: {e}")
+        return self
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.meta["updated_at"] = datetime.now().isoformat()
+        payload = {"meta": self.meta, "dates": dict(sorted(self.dates.items()))}
+        self.path.write_text(json.dumps(payload, ensure_ascii=False), encoding="utf-8")
+
+    @property
+    def last_date(self):
+        dated = [key for key in self.dates if key != UNDATED]
+        return max(dated) if dated else None
+
+    def _settings(self, source, low_ctr_threshold, numeric_cols):
+        return {
+            "version": self.VERSION,
+            "source": str(source),
+            "low_ctr_threshold": low_ctr_threshold,
+            "numeric_cols": list(numeric_cols),
+        }
+
+    def is_compatible(self, source, low_ctr_threshold, numeric_cols):
+        """True when the store was built from the same source with the same settings."""
+        expected = self._settings(source, low_ctr_threshold, numeric_cols)
+        return bool(self.dates) and all(self.meta.get(k) == v for k, v in expected.items())
+
+    def history_matches(self, checksums):
+        """True when every stored date still has exactly the same rows in the feed."""
+        last = self.last_date
+        historical = {key for key in checksums if key == UNDATED or (last and key <= last)}
+        if historical != set(self.dates):
+            return False
+        return all(self.dates[key]["checksum"] == checksums[key] for key in historical)
+
+    def reset(self, source, low_ctr_threshold, numeric_cols):
+        self.meta = self._settings(source, low_ctr_threshold, numeric_cols)
+        self.dates = {}
+
+    def add(self, partials, checksums):
+        for key, acc in partials.items():
+            self.dates[key] = {"checksum": checksums[key], "partial": acc.to_dict()}
+
+    def combined(self, numeric_cols, low_ctr_threshold) -> MetricsAccumulator:
+        """Merge every stored partial into one accumulator."""
+        total = MetricsAccumulator(numeric_cols, low_ctr_threshold)
+        for key in sorted(self.dates):
+            total.merge(MetricsAccumulator.from_dict(self.dates[key]["partial"], low_ctr_threshold))
+        return total
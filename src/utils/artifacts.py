@@ -0,0 +1,110 @@
+"""
+In-memory artifact bus with write-behind persistence.
+
+Stages hand their outputs to each other directly; the ArtifactSink keeps the
+latest copy of every artifact in memory and persists it from a background
+thread, so no stage waits on disk writes or re-parses its predecessor's JSON.
+"""
+
+import json
+import queue
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+from src.utils.tracing import trace_span
+
+_STOP = object()
+
+
+class ArtifactSink:
+    """
+    ArtifactSink
+    -------------
+    Collects pipeline artifacts by file name (e.g. "insights.json").
+
+    - `persist=False` keeps everything in memory (batch / test use).
+    - `compact=True` writes JSON without indentation or extra whitespace.
+
+    Payloads are serialized on the writer thread, so callers must not mutate
+    them after handing them over.
+    """
+
+    def __init__(self, output_dir="reports", compact: bool = False, persist: bool = True):
+        self.output_dir = Path(output_dir)
+        self.compact = compact
+        self.persist = persist
+        self.artifacts = {}
+        self.errors = []
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _ensure_writer(self):
+        with self._lock:
+            if self._thread is None:
+                self.output_dir.mkdir(parents=True, exist_ok=True)
+                self._thread = threading.Thread(target=self._drain, name="artifact-writer", daemon=True)
+                self._thread.start()
+
+    def _drain(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is _STOP:
+                    return
+                name, payload = item
+                with trace_span(f"ArtifactSink.write:{name}", "io") as span:
+                    if isinstance(payload, str):
+                        text = payload
+                    elif self.compact:
+                        text = json.dumps(payload, ensure_ascii=False, separators=(",", ":"))
+                    else:
+                        text = json.dumps(payload, indent=2, ensure_ascii=False)
+                    (self.output_dir / name).write_text(text, encoding="utf-8")
+                    if span is not None:
+                        span.set(bytes=len(text))
+            except Exception as e:
+                self.errors.append((item[0], e))
+                print(f"[ArtifactSink] Failed to write {item[0]}: {e}")
+            finally:
+                self._queue.task_done()
+
+    def put(self, name: str, payload):
+        """Publish an artifact (dict/list for JSON, str for text) and schedule its write."""
+        self.artifacts[name] = payload
+        recorded = getattr(self._local, "recorded", None)
+        if recorded is not None:
+            recorded[name] = payload
+        if self.persist:
+            self._ensure_writer()
+            self._queue.put((name, payload))
+        return self.output_dir / name
+
+    @contextmanager
+    def record(self):
+        """Collect the artifacts put by the current thread inside the block (name -> payload)."""
+        previous = getattr(self._local, "recorded", None)
+        self._local.recorded = recorded = {}
+        try:
+            yield recorded
+        finally:
+            self._local.recorded = previous
+            if previous is not None:
+                previous.update(recorded)
+
+    def get(self, name: str, default=None):
+        return self.artifacts.get(name, default)
+
+    def flush(self):
+        """Block until every scheduled write has reached disk."""
+        if self._thread is not None:
+            self._queue.join()
+
+    def close(self):
+        """Flush pending writes and stop the writer thread."""
+        if self._thread is not None:
+            self._queue.put(_STOP)
+            self._thread.join()
+            self._thread = None
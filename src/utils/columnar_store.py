@@ -0,0 +1,369 @@
+"""
+Date-partitioned, memory-mapped columnar store for long ad histories.
+
+A year of daily exports is too large to read_csv on every run. The store keeps
+the same rows as one directory per day with one .npy file per column:
+
+    <root>/manifest.json                  schema, dictionaries, partitions
+    <root>/date=2025-01-01/spend.npy
+    <root>/date=2025-01-01/campaign_name.npy
+    ...
+
+- Text columns are dictionary-encoded against one store-wide dictionary per
+  column (kept in the manifest); the files hold the smallest integer codes.
+- Metrics keep their load dtype (float32, see data_loader).
+- The date is implied by the partition and not stored.
+- Rows inside a partition are sorted by campaign, and the manifest records
+  each campaign's row range.
+
+Reads are pushed down: a date range only opens the matching partitions, a
+campaign filter turns into row-range slices of memory-mapped arrays, and only
+the requested columns are opened. A query over the last 14 days of one
+campaign therefore touches only those pages, not the rest of the year.
+
+Ingesting streams the CSV in chunks and replaces the partitions of every date
+present in the feed, so re-ingesting a (corrected) export is idempotent.
+
+Usage:
+    python -m src.utils.columnar_store ingest data/history.csv --store .cache/store
+    python -m src.utils.columnar_store info --store .cache/store
+"""
+
+import argparse
+import hashlib
+import json
+import shutil
+import sys
+from datetime import date, timedelta
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src.utils.logger import log_step
+
+STORE_VERSION = 1
+MANIFEST = "manifest.json"
+PARTITION_COLUMN = "date"
+SORT_COLUMN = "campaign_name"
+
+
+def _code_dtype(size: int):
+    """Smallest signed integer type holding codes 0..size-1 and -1 for missing values."""
+    for dtype in (np.int8, np.int16, np.int32):
+        if size <= np.iinfo(dtype).max:
+            return np.dtype(dtype)
+    return np.dtype(np.int64)
+
+
+def _partition_dir(root: Path, day: str) -> Path:
+    return root / f"{PARTITION_COLUMN}={day}"
+
+
+def store_filters(config) -> dict:
+    """Row filters from `dataset.filter` as keyword arguments for ColumnarStore.read/iter_partitions."""
+    settings = config.get("dataset", {}).get("filter") or {}
+    return {
+        "start": settings.get("start_date"),
+        "end": settings.get("end_date"),
+        "last_days": settings.get("last_days"),
+        "campaigns": settings.get("campaigns") or None,
+    }
+
+
+class ColumnarStore:
+    """
+    ColumnarStore
+    --------------
+    Reader for a store written by ingest_csv.
+
+        store = ColumnarStore(".cache/store")
+        df = store.read(columns=["date", "spend", "revenue"], last_days=14,
+                        campaigns=["Men ComfortMax Launch"])
+        for frame in store.iter_partitions(start="2025-03-01"):   # one frame per day
+            ...
+
+    Frames have the same columns and dtypes as read_dataset_csv (categoricals
+    share the store-wide categories, so per-day frames concatenate cleanly).
+    `last_scan` reports what the latest read touched: partitions, rows and bytes.
+    """
+
+    def __init__(self, root):
+        self.root = Path(root)
+        self.manifest = json.loads((self.root / MANIFEST).read_text(encoding="utf-8"))
+        self.last_scan = {}
+        self._categories = {}
+
+    @staticmethod
+    def exists(root) -> bool:
+        return (Path(root) / MANIFEST).exists()
+
+    @property
+    def columns(self) -> list:
+        return [c["name"] for c in self.manifest["columns"]]
+
+    @property
+    def dates(self) -> list:
+        return sorted(self.manifest["partitions"])
+
+    @property
+    def rows(self) -> int:
+        return sum(p["rows"] for p in self.manifest["partitions"].values())
+
+    def select_dates(self, start=None, end=None, last_days=None) -> list:
+        """Partitions within [start, end] and, with `last_days`, the last N calendar days of the store."""
+        start = str(pd.Timestamp(start).date()) if start else None
+        end = str(pd.Timestamp(end).date()) if end else None
+        dates = self.dates
+        if last_days and dates:
+            first = (date.fromisoformat(dates[-1]) - timedelta(days=int(last_days) - 1)).isoformat()
+            start = max(start, first) if start else first
+        return [d for d in dates if (start is None or d >= start) and (end is None or d <= end)]
+
+    def _campaign_codes(self, campaigns) -> set:
+        codes = {value: str(code) for code, value in enumerate(self.manifest["dictionaries"].get(SORT_COLUMN, []))}
+        return {codes[c] for c in campaigns if c in codes}
+
+    def _row_ranges(self, day: str, wanted) -> list:
+        """[(start, stop)] row slices of `day` holding the `wanted` campaign codes (every row when None)."""
+        partition = self.manifest["partitions"][day]
+        if wanted is None:
+            return [(0, partition["rows"])] if partition["rows"] else []
+        return sorted(tuple(r) for code, r in partition["campaigns"].items() if code in wanted)
+
+    def _categorical(self, name: str, codes: np.ndarray) -> pd.Categorical:
+        """Decode dictionary codes; categories are sorted, as read_csv would produce them."""
+        if name not in self._categories:
+            dictionary = self.manifest["dictionaries"][name]
+            order = np.argsort(np.array(dictionary, dtype=object), kind="stable")
+            remap = np.empty(len(dictionary) + 1, dtype=_code_dtype(len(dictionary)))
+            remap[order] = np.arange(len(dictionary))
+            remap[-1] = -1  # missing values keep code -1
+            self._categories[name] = (remap, [dictionary[i] for i in order])
+        remap, categories = self._categories[name]
+        return pd.Categorical.from_codes(remap[codes], categories=categories)
+
+    def _frame(self, day: str, columns, ranges) -> pd.DataFrame:
+        """Build one partition's frame from memory-mapped slices of the requested columns."""
+        rows = sum(stop - start for start, stop in ranges)
+        data = {}
+        for spec in self.manifest["columns"]:
+            name = spec["name"]
+            if name not in columns:
+                continue
+            if spec["kind"] == "partition":
+                data[name] = np.full(rows, np.datetime64(day), dtype=spec["dtype"])
+                continue
+            mapped = np.load(_partition_dir(self.root, day) / f"{name}.npy", mmap_mode="r")
+            values = np.concatenate([mapped[start:stop] for start, stop in ranges]) if ranges else mapped[:0].copy()
+            self.last_scan["bytes"] += values.nbytes
+            if spec["kind"] == "category":
+                values = self._categorical(name, values)
+            data[name] = values
+        return pd.DataFrame(data)
+
+    def iter_partitions(self, columns=None, start=None, end=None, last_days=None, campaigns=None):
+        """Yield one frame per selected day (days without matching rows are skipped)."""
+        columns = [c for c in self.columns if columns is None or c in columns]
+        wanted = None if campaigns is None else self._campaign_codes(campaigns)
+        self.last_scan = {"partitions": 0, "rows": 0, "bytes": 0}
+        for day in self.select_dates(start, end, last_days):
+            ranges = self._row_ranges(day, wanted)
+            if not ranges:
+                continue
+            frame = self._frame(day, columns, ranges)
+            self.last_scan["partitions"] += 1
+            self.last_scan["rows"] += len(frame)
+            yield frame
+
+    def read(self, columns=None, start=None, end=None, last_days=None, campaigns=None) -> pd.DataFrame:
+        """The selected rows and columns as one frame (empty, with the schema, when nothing matches)."""
+        frames = list(self.iter_partitions(columns, start, end, last_days, campaigns))
+        if len(frames) > 1:
+            return pd.concat(frames, ignore_index=True)
+        if frames:
+            return frames[0]
+        selected = [c for c in self.columns if columns is None or c in columns]
+        if not self.dates:
+            return pd.DataFrame(columns=selected)
+        return self._frame(self.dates[0], selected, [])
+
+    def describe(self) -> str:
+        dates = self.dates
+        span = f"{dates[0]} .. {dates[-1]}" if dates else "empty"
+        size = sum(f.stat().st_size for f in self.root.glob(f"{PARTITION_COLUMN}=*/*.npy"))
+        return f"{self.rows:,} rows in {len(dates)} partitions ({span}), {len(self.columns)} columns, {size / 1e6:.1f} MB"
+
+
+class _Encoder:
+    """Maps chunks onto the store schema and store-wide dictionaries (extended as new values appear)."""
+
+    def __init__(self, manifest: dict | None):
+        self.columns = list(manifest["columns"]) if manifest else None
+        self.dictionaries = {name: {value: code for code, value in enumerate(values)}
+                             for name, values in (manifest or {}).get("dictionaries", {}).items()}
+
+    def register(self, chunk: pd.DataFrame):
+        columns = []
+        for name in chunk.columns:
+            series = chunk[name]
+            if name == PARTITION_COLUMN:
+                columns.append({"name": name, "kind": "partition", "dtype": str(series.dtype)})
+            elif isinstance(series.dtype, pd.CategoricalDtype) or pd.api.types.is_object_dtype(series.dtype) \
+                    or pd.api.types.is_string_dtype(series.dtype):
+                columns.append({"name": name, "kind": "category"})
+            else:
+                columns.append({"name": name, "kind": "numeric", "dtype": str(series.dtype)})
+        if self.columns is None:
+            self.columns = columns
+        elif [c["name"] for c in columns] != [c["name"] for c in self.columns]:
+            raise ValueError(f"CSV columns {[c['name'] for c in columns]} do not match the store schema "
+                             f"{[c['name'] for c in self.columns]}; ingest into a new store.")
+
+    def encode(self, spec: dict, series: pd.Series) -> np.ndarray:
+        if spec["kind"] == "category":
+            dictionary = self.dictionaries.setdefault(spec["name"], {})
+            categorical = series if isinstance(series.dtype, pd.CategoricalDtype) else series.astype("category")
+            lookup = np.array([dictionary.setdefault(str(v), len(dictionary))
+                               for v in categorical.cat.categories], dtype=np.int32)
+            codes = categorical.cat.codes.to_numpy()
+            return np.where(codes >= 0, lookup[np.maximum(codes, 0)] if len(lookup) else -1, -1).astype(np.int32)
+        values = series.to_numpy()
+        dtype = np.dtype(spec["dtype"])
+        if values.dtype != dtype:
+            if not np.can_cast(values.dtype, dtype, casting="same_kind"):
+                raise ValueError(f"Column {spec['name']} changed from {dtype} to {values.dtype} mid-file.")
+            values = values.astype(dtype)
+        return values
+
+    def staged_dtype(self, spec: dict):
+        return np.dtype(np.int32) if spec["kind"] == "category" else np.dtype(spec["dtype"])
+
+    def final_dtype(self, spec: dict):
+        if spec["kind"] == "category":
+            return _code_dtype(len(self.dictionaries.get(spec["name"], {})))
+        return np.dtype(spec["dtype"])
+
+
+def ingest_csv(csv_path, root, chunksize: int = 250_000) -> dict:
+    """
+    Convert a CSV export into (or merge it into) the store at `root`.
+
+    Pass 1 streams the CSV in chunks and appends each day's encoded rows to
+    per-column staging files; pass 2 sorts every day by campaign and writes its
+    .npy files. Partitions of dates present in the feed are replaced, others
+    are kept. Returns {"rows", "partitions", "skipped_rows"}.
+    """
+    from src.utils.data_loader import iter_dataset_chunks
+
+    root = Path(root)
+    root.mkdir(parents=True, exist_ok=True)
+    manifest = json.loads((root / MANIFEST).read_text(encoding="utf-8")) if ColumnarStore.exists(root) else None
+    encoder = _Encoder(manifest)
+    staging = root / ".staging"
+    shutil.rmtree(staging, ignore_errors=True)
+    staging.mkdir()
+
+    counts, skipped = {}, 0
+    for chunk in iter_dataset_chunks(csv_path, chunksize):
+        encoder.register(chunk)
+        days = chunk[PARTITION_COLUMN].to_numpy().astype("datetime64[D]")
+        valid = ~np.isnat(days)
+        skipped += int((~valid).sum())
+        uniques, inverse = np.unique(days[valid], return_inverse=True)
+        rows = np.flatnonzero(valid)[np.argsort(inverse, kind="stable")]
+        bounds = np.concatenate([[0], np.cumsum(np.bincount(inverse, minlength=len(uniques)))])
+        encoded = {spec["name"]: encoder.encode(spec, chunk[spec["name"]])
+                   for spec in encoder.columns if spec["kind"] != "partition"}
+        for i, day in enumerate(uniques):
+            day = str(day)
+            day_rows = rows[bounds[i]:bounds[i + 1]]
+            (staging / day).mkdir(exist_ok=True)
+            for name, values in encoded.items():
+                with open(staging / day / f"{name}.bin", "ab") as f:
+                    f.write(np.ascontiguousarray(values[day_rows]).tobytes())
+            counts[day] = counts.get(day, 0) + len(day_rows)
+
+    if encoder.columns is None:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise ValueError(f"{csv_path} has no rows to ingest.")
+    if not any(c["kind"] == "partition" for c in encoder.columns):
+        shutil.rmtree(staging, ignore_errors=True)
+        raise ValueError(f"{csv_path} has no '{PARTITION_COLUMN}' column to partition by.")
+
+    partitions = dict((manifest or {}).get("partitions", {}))
+    for day, rows in counts.items():
+        partitions[day] = _write_partition(root, staging / day, day, rows, encoder)
+    shutil.rmtree(staging, ignore_errors=True)
+
+    manifest = {
+        "version": STORE_VERSION,
+        "columns": encoder.columns,
+        "sort_column": SORT_COLUMN,
+        "dictionaries": {name: list(values) for name, values in encoder.dictionaries.items()},
+        "partitions": dict(sorted(partitions.items())),
+    }
+    # The manifest is replaced last, so readers never see a half-written store
+    tmp = root / f"{MANIFEST}.tmp"
+    tmp.write_text(json.dumps(manifest, ensure_ascii=False), encoding="utf-8")
+    tmp.replace(root / MANIFEST)
+
+    total = sum(counts.values())
+    log_step("ColumnarStore", f"Ingested {total} rows into {len(counts)} partitions of {root}"
+                              + (f" ({skipped} rows without a date skipped)." if skipped else "."))
+    return {"rows": total, "partitions": len(counts), "skipped_rows": skipped}
+
+
+def _write_partition(root: Path, staged: Path, day: str, rows: int, encoder: _Encoder) -> dict:
+    """Sort one staged day by campaign, write its .npy files and return its manifest entry."""
+    arrays = {spec["name"]: np.fromfile(staged / f"{spec['name']}.bin", dtype=encoder.staged_dtype(spec))
+              for spec in encoder.columns if spec["kind"] != "partition"}
+    sort_codes = arrays.get(SORT_COLUMN)
+    order = np.argsort(sort_codes, kind="stable") if sort_codes is not None else None
+
+    target = _partition_dir(root, day)
+    tmp = target.with_name(target.name + ".tmp")
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir()
+    checksum = hashlib.sha256()
+    for spec in encoder.columns:
+        name = spec["name"]
+        if name not in arrays:
+            continue
+        values = arrays[name] if order is None else arrays[name][order]
+        values = values.astype(encoder.final_dtype(spec), copy=False)
+        checksum.update(name.encode("utf-8") + values.tobytes())
+        np.save(tmp / f"{name}.npy", values)
+    shutil.rmtree(target, ignore_errors=True)
+    tmp.rename(target)
+
+    campaigns = {}
+    if order is not None:
+        codes, starts, sizes = np.unique(sort_codes[order], return_index=True, return_counts=True)
+        campaigns = {str(c): [int(s), int(s + n)] for c, s, n in zip(codes, starts, sizes)}
+    return {"rows": rows, "campaigns": campaigns, "sha256": checksum.hexdigest()}
+
+
+def main(argv=None):
+    from src.utils.config_loader import load_config
+
+    config = load_config()
+    parser = argparse.ArgumentParser(description="Build or inspect the date-partitioned columnar store")
+    parser.add_argument("command", choices=["ingest", "info"])
+    parser.add_argument("csv", nargs="?", default=None, help="CSV export to ingest (default: paths.data)")
+    parser.add_argument("--store", default=config.get("dataset", {}).get("store") or ".cache/store",
+                        help="Store directory (default: dataset.store)")
+    parser.add_argument("--chunksize", type=int, default=config.get("dataset", {}).get("chunksize", 250_000))
+    args = parser.parse_args(argv)
+
+    if args.command == "ingest":
+        ingest_csv(args.csv or config["paths"]["data"], args.store, args.chunksize)
+    if not ColumnarStore.exists(args.store):
+        print(f"No columnar store at {args.store}")
+        return 1
+    print(ColumnarStore(args.store).describe())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -12,6 +12,12 @@ def load_config(config_path: str = "config/config.yaml") -> dict:
     with open(config_path, "r") as f:
         config = yaml.safe_load(f)
 
+    # Resolve the active dataset from project.mode ("sample" or "full")
+    paths = config.get("paths", {})
+    if "data" not in paths:
+        full_mode = config.get("project", {}).get("mode") == "full"
+        paths["data"] = paths.get("full_data_path") if full_mode else paths.get("data_path")
+
     # Inject environment variables
     config["env"] = {
         "GOOGLE_API_KEY": os.getenv("GOOGLE_API_KEY"),
@@ -0,0 +1,143 @@
+"""
+Minimal dependency-graph scheduler for the agent pipeline.
+
+Nodes declare which other nodes they consume. Every node whose dependencies
+have finished is submitted to a thread pool, so independent stages (for
+example the Planner LLM call and dataset loading) overlap instead of running
+back to back.
+"""
+
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+
+class DAGNode:
+    """A named pipeline stage: `fn(inputs)` receives {dependency name: its result}."""
+
+    def __init__(self, name, fn, deps=(), outputs=()):
+        self.name = name
+        self.fn = fn
+        self.deps = list(deps)
+        self.outputs = list(outputs)
+
+
+class DAGScheduler:
+    """
+    DAGScheduler
+    -------------
+    Runs DAGNodes concurrently in dependency order and records per-node timing.
+    A failed node's dependents are skipped; independent branches keep running.
+    """
+
+    def __init__(self, max_workers: int = 4):
+        self.max_workers = max_workers
+        self.nodes = {}
+        self.results = {}
+        self.errors = {}
+        self.skipped = []
+        self.timings = {}
+        self.wall_time = 0.0
+        self._origin = None
+
+    def add(self, name, fn, deps=(), outputs=()):
+        if name in self.nodes:
+            raise ValueError(f"Duplicate node: {name}")
+        self.nodes[name] = DAGNode(name, fn, deps, outputs)
+        return self
+
+    def _validate(self):
+        for node in self.nodes.values():
+            missing = [d for d in node.deps if d not in self.nodes]
+            if missing:
+                raise ValueError(f"Node '{node.name}' depends on unknown node(s): {missing}")
+        # Kahn's algorithm, only to reject cycles up front
+        indegree = {name: len(node.deps) for name, node in self.nodes.items()}
+        ready = [name for name, deg in indegree.items() if deg == 0]
+        seen = 0
+        while ready:
+            current = ready.pop()
+            seen += 1
+            for node in self.nodes.values():
+                if current in node.deps:
+                    indegree[node.name] -= 1
+                    if indegree[node.name] == 0:
+                        ready.append(node.name)
+        if seen != len(self.nodes):
+            raise ValueError("Pipeline graph contains a cycle.")
+
+    def _run_node(self, node):
+        start = time.perf_counter()
+        try:
+            return node.fn({dep: self.results[dep] for dep in node.deps})
+        finally:
+            self.timings[node.name] = {
+                "start": start - self._origin,
+                "end": time.perf_counter() - self._origin,
+                "duration": time.perf_counter() - start,
+            }
+
+    def run(self):
+        """Execute the graph; returns {node name: result} for the nodes that succeeded."""
+        self._validate()
+        self._origin = time.perf_counter()
+        pending = dict(self.nodes)
+        running = {}
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            while pending or running:
+                # Repeat until stable, so skips reach every transitive dependent
+                blocked = True
+                while blocked:
+                    blocked = [n for n in pending.values()
+                               if any(d in self.errors or d in self.skipped for d in n.deps)]
+                    for node in blocked:
+                        self.skipped.append(node.name)
+                        del pending[node.name]
+
+                ready = [n for n in pending.values() if all(d in self.results for d in n.deps)]
+                for node in ready:
+                    running[pool.submit(self._run_node, node)] = node
+                    del pending[node.name]
+
+                if not running:
+                    break
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    node = running.pop(future)
+                    try:
+                        self.results[node.name] = future.result()
+                    except Exception as e:
+                        self.errors[node.name] = e
+
+        self.wall_time = time.perf_counter() - self._origin
+        return self.results
+
+    @property
+    def failed(self):
+        return bool(self.errors or self.skipped)
+
+    def critical_path(self):
+        """Longest chain of finished nodes by summed duration: (names, seconds)."""
+        best = {}
+
+        def longest(name):
+            if name not in best:
+                own = self.timings.get(name, {}).get("duration", 0.0)
+                chains = [longest(dep) for dep in self.nodes[name].deps]
+                path, total = max(chains, key=lambda c: c[1], default=([], 0.0))
+                best[name] = (path + [name], total + own)
+            return best[name]
+
+        return max((longest(name) for name in self.nodes), key=lambda c: c[1], default=([], 0.0))
+
+    def timing_report(self):
+        """Per-node timing table plus the critical path, as printable text."""
+        path, path_time = self.critical_path()
+        lines = [f"{'stage':<20} {'start (s)':>10} {'end (s)':>10} {'duration (s)':>13}"]
+        for name, t in sorted(self.timings.items(), key=lambda item: item[1]["start"]):
+            marker = " *" if name in path else ""
+            lines.append(f"{name:<20} {t['start']:>10.2f} {t['end']:>10.2f} {t['duration']:>13.2f}{marker}")
+        total = sum(t["duration"] for t in self.timings.values())
+        lines.append(f"Critical path (*): {' -> '.join(path)} = {path_time:.2f}s")
+        lines.append(f"Wall time: {self.wall_time:.2f}s (sum of stages: {total:.2f}s)")
+        return "\n".join(lines)
@@ -1,4 +1,28 @@
+import hashlib
 import json
+import threading
+from pathlib import Path
+
+import pandas as pd
+
+from src.utils.compact_frame import column_bytes, compact_frame, release_free_heap
+from src.utils.fingerprint import file_signature
+from src.utils.logger import log_step
+
+# Explicit schema for the ad exports: low-cardinality text as categoricals,
+# metrics as float32 and dates parsed at load time. Creative messages are long
+# but repeat across rows and days, so they are interned the same way (each text
+# stored once in the category table, rows hold an integer code). Columns outside
+# the schema are compacted after parsing (see compact_frame).
+CATEGORICAL_COLUMNS = ["campaign_name", "adset_name", "creative_type", "audience_type", "platform", "country",
+                       "creative_message"]
+METRIC_COLUMNS = ["spend", "impressions", "clicks", "ctr", "purchases", "revenue", "roas"]
+DATE_COLUMNS = ["date"]
+
+# One parsed frame per dataset path for the lifetime of the process
+_DATASETS = {}
+_DATASETS_LOCK = threading.Lock()
+
 
 def safe_load_json(path):
     """Safely loads a JSON file."""
@@ -8,3 +32,168 @@ def safe_load_json(path):
     except Exception as e:
         print(f"[WARN] Could not load JSON from {path}: {e}")
         return {}
+
+
+def read_dataset_csv(path, **kwargs) -> pd.DataFrame:
+    """Parse an ad export CSV with the explicit schema; column names are lower-cased."""
+    header = pd.read_csv(path, nrows=0).columns
+    by_lower = {c.lower(): c for c in header}
+    dtype = {by_lower[c]: "category" for c in CATEGORICAL_COLUMNS if c in by_lower}
+    dtype.update({by_lower[c]: "float32" for c in METRIC_COLUMNS if c in by_lower})
+    parse_dates = [by_lower[c] for c in DATE_COLUMNS if c in by_lower]
+
+    result = pd.read_csv(path, dtype=dtype, parse_dates=parse_dates, **kwargs)
+    if isinstance(result, pd.DataFrame):
+        # Chunked reads keep the plain dtypes so every chunk has the same schema
+        compact_frame(result, columns=[c for c in result.columns if c not in dtype and c not in parse_dates])
+        result.columns = [c.lower() for c in result.columns]
+    return result
+
+
+def iter_dataset_chunks(path, chunksize: int = 250_000):
+    """Yield the dataset as `chunksize`-row frames with the same schema as read_dataset_csv."""
+    with read_dataset_csv(path, chunksize=chunksize) as reader:
+        for chunk in reader:
+            chunk.columns = [c.lower() for c in chunk.columns]
+            yield chunk
+
+
+class DatasetCache:
+    """
+    DatasetCache
+    -------------
+    Columnar sidecar cache for parsed CSV datasets.
+
+    The parsed frame is stored as Parquet (or a pickle when pyarrow is not
+    installed) together with a small JSON manifest holding the source file
+    signature. A cached copy is only used while that signature still matches.
+    """
+
+    def __init__(self, cache_dir: str = ".cache/datasets", validation: str = "mtime"):
+        self.cache_dir = Path(cache_dir)
+        self.validation = validation
+
+    def _paths(self, source: Path):
+        stem = f"{source.stem}-{hashlib.sha1(str(source.resolve()).encode()).hexdigest()[:8]}"
+        return self.cache_dir / f"{stem}.meta.json", stem
+
+    @staticmethod
+    def _parquet_available():
+        try:
+            import pyarrow  # noqa: F401
+            return True
+        except ImportError:
+            return False
+
+    def load(self, source) -> pd.DataFrame | None:
+        """Return the cached frame for `source`, or None if missing or stale."""
+        source = Path(source)
+        meta_path, _ = self._paths(source)
+        if not meta_path.exists():
+            return None
+        try:
+            meta = json.loads(meta_path.read_text(encoding="utf-8"))
+            if meta.get("signature") != file_signature(source, self.validation):
+                log_step("DatasetCache", f"Cache for {source.name} is stale; re-parsing CSV.")
+                return None
+            data_path = self.cache_dir / meta["file"]
+            if meta["format"] == "parquet":
+                return pd.read_parquet(data_path)
+            return pd.read_pickle(data_path)
+        except Exception as e:
+            log_step("DatasetCache", f"Ignoring unreadable cache for {source.name}: {e}")
+            return None
+
+    def store(self, source, df: pd.DataFrame):
+        """Write `df` as the cached copy of `source`."""
+        source = Path(source)
+        meta_path, stem = self._paths(source)
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            if self._parquet_available():
+                fmt, data_file = "parquet", f"{stem}.parquet"
+                df.to_parquet(self.cache_dir / data_file, index=False)
+            else:
+                fmt, data_file = "pickle", f"{stem}.pkl"
+                df.to_pickle(self.cache_dir / data_file)
+            meta = {
+                "source": str(source),
+                "file": data_file,
+                "format": fmt,
+                "signature": file_signature(source, self.validation),
+            }
+            meta_path.write_text(json.dumps(meta, indent=2), encoding="utf-8")
+        except Exception as e:
+            log_step("DatasetCache", f"Could not write dataset cache: {e}")
+
+
+def load_dataset(path, cache: DatasetCache | None = None) -> pd.DataFrame:
+    """Load a dataset from the sidecar cache when fresh, otherwise parse the CSV (and cache it)."""
+    if cache is not None:
+        df = cache.load(path)
+        if df is not None:
+            log_step("DatasetService", f"Loaded {len(df)} rows from cache for {path}.")
+            return df
+
+    df = read_dataset_csv(path)
+    release_free_heap()
+    log_step("DatasetService", f"Parsed {len(df)} rows from {path} "
+                               f"({sum(column_bytes(df).values()) / 1e6:.1f} MB in memory).")
+    if cache is not None:
+        cache.store(path, df)
+    return df
+
+
+def get_dataset(config, path=None) -> pd.DataFrame:
+    """
+    Return the shared, parsed dataset for `path` (default: the configured data path).
+
+    The file is parsed at most once per process (and, with the sidecar cache
+    enabled, at most once per file version). Every agent receives the same
+    frame, so callers must treat it as read-only. With `dataset.store` set,
+    the configured data is read from that columnar store instead, keeping
+    only the rows selected by `dataset.filter`.
+    """
+    path = Path(path or config["paths"]["data"])
+    settings = config.get("dataset", {})
+    if settings.get("store") and path == Path(config["paths"]["data"]):
+        return get_store_dataset(config)
+    cache = None
+    if settings.get("cache", True):
+        cache = DatasetCache(
+            cache_dir=settings.get("cache_dir", ".cache/datasets"),
+            validation=settings.get("cache_validation", "mtime"),
+        )
+
+    key = str(path.resolve())
+    with _DATASETS_LOCK:
+        signature = file_signature(path)
+        cached = _DATASETS.get(key)
+        if cached is None or cached[0] != signature:
+            _DATASETS[key] = (signature, load_dataset(path, cache))
+        return _DATASETS[key][1]
+
+
+def get_store_dataset(config) -> pd.DataFrame:
+    """Rows of the `dataset.store` columnar store selected by `dataset.filter`, read once per store version."""
+    from src.utils.columnar_store import ColumnarStore, store_filters
+
+    root = Path(config["dataset"]["store"])
+    filters = store_filters(config)
+    key = (str(root.resolve()), json.dumps(filters, sort_keys=True, default=str))
+    with _DATASETS_LOCK:
+        signature = file_signature(root / "manifest.json")
+        cached = _DATASETS.get(key)
+        if cached is None or cached[0] != signature:
+            store = ColumnarStore(root)
+            df = store.read(**filters)
+            log_step("DatasetService", f"Read {len(df)} rows from the columnar store {root} "
+                                       f"({store.last_scan['partitions']} of {len(store.dates)} partitions).")
+            _DATASETS[key] = (signature, df)
+        return _DATASETS[key][1]
+
+
+def clear_datasets():
+    """Drop the in-process dataset cache (the sidecar files are kept)."""
+    with _DATASETS_LOCK:
+        _DATASETS.clear()
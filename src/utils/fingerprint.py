@@ -0,0 +1,46 @@
+"""
+Cheap, dependency-free fingerprints for cache keys.
+
+Kept free of pandas/numpy so that cache lookups (e.g. the CLI's cached-report
+fast path) can run before the analytics stack is imported.
+"""
+
+import hashlib
+import json
+import os
+from pathlib import Path
+
+
+def env_flag(name: str) -> bool:
+    """True when environment variable `name` is set to 1/true/yes (case-insensitive)."""
+    return os.getenv(name, "").strip().lower() in ("1", "true", "yes")
+
+
+def file_signature(path, validation: str = "mtime") -> dict:
+    """Identify a file version by mtime + size, or by a SHA-256 of its contents."""
+    stat = Path(path).stat()
+    signature = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+    if validation == "hash":
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        signature = {"size": stat.st_size, "sha256": digest.hexdigest()}
+    return signature
+
+
+def dataset_path(config) -> Path:
+    """The file identifying the configured dataset version: the columnar store manifest, or the CSV."""
+    store = config.get("dataset", {}).get("store")
+    return Path(store) / "manifest.json" if store else Path(config["paths"]["data"])
+
+
+def prompt_hashes(prompts_dir="prompts") -> dict:
+    """{file name: SHA-256} of every prompt template (*.md) in `prompts_dir`."""
+    return {path.name: file_signature(path, "hash")["sha256"] for path in sorted(Path(prompts_dir).glob("*.md"))}
+
+
+def digest(*parts) -> str:
+    """SHA-256 of the canonical JSON encoding of `parts` (non-JSON values via str())."""
+    text = json.dumps(parts, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
@@ -0,0 +1,348 @@
+"""
+Statistical checks that test InsightAgent hypotheses against the dataset.
+
+Each hypothesis is mapped to a test type by keywords, and each test type runs
+once per evaluation however many hypotheses share it:
+
+- fatigue:     CTR decays with creative age. Within-creative correlation of
+               cell CTR (creative x day) with days since the creative's first
+               appearance; one-sided permutation test for a negative correlation.
+- competition: CPM rises while CTR stays stable. Relative change of daily CPM
+               between the two halves of the period (permutation test over the
+               day labels), with the CTR change required to stay within
+               `ctr_stable_pct` or to be insignificant.
+- audience:    CTR differs across audience_type. Ratio of between- to
+               within-audience variance of (audience x day) cell CTR, tested by
+               permuting the audience labels.
+
+Rows are first reduced to small cell arrays with integer codes and bincount,
+so permutation cost does not grow with the number of rows. Permutations run in
+fixed-size blocks, each seeded from SeedSequence(seed).spawn, optionally across
+a process pool; results are identical for any worker count.
+"""
+
+import multiprocessing
+import re
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+import pandas as pd
+
+from src.utils.logger import log_step
+from src.utils.timeseries import ratio_components
+
+TEST_TYPES = ["fatigue", "competition", "audience"]
+KEYWORDS = {
+    "fatigue": r"fatigue|wear[- ]?out|stale|frequency|creative (?:decay|burnout)|repetit",
+    "competition": r"competition|competitor|auction|cpm|bid|cost per|inflation|seasonal",
+    "audience": r"audience|targeting|segment|demographic|saturation|lookalike|retarget",
+}
+# Permutations per seeded block; fixed so results don't depend on the worker count
+BLOCK_SIZE = 500
+# Cap on the (block x cells) permutation matrix held in memory at once
+MAX_BLOCK_ELEMENTS = 4_000_000
+
+
+def classify(hypothesis: dict):
+    """Test type for a hypothesis from its title (then evidence), or None when nothing matches."""
+    for field in ("title", "evidence"):
+        text = str(hypothesis.get(field, "")).lower()
+        for test_type in TEST_TYPES:
+            if re.search(KEYWORDS[test_type], text):
+                return test_type
+    return None
+
+
+def _codes(column: pd.Series) -> np.ndarray:
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        return column.cat.codes.to_numpy().astype("int64")
+    return pd.factorize(column)[0].astype("int64")
+
+
+def _cell_sums(keys, weights_list):
+    """Sum each weight array over the distinct combinations of integer key arrays (-1 = missing, dropped)."""
+    valid = np.logical_and.reduce([k >= 0 for k in keys])
+    keys = [k[valid] for k in keys]
+    weights_list = [w[valid] for w in weights_list]
+    cards = [int(k.max()) + 1 if len(k) else 1 for k in keys]
+    key = np.zeros(len(keys[0]), dtype="int64")
+    for k, card in zip(keys, cards):
+        key = key * card + k
+    inverse, uniques = pd.factorize(key)
+    sums = [np.bincount(inverse, weights=w, minlength=len(uniques)) for w in weights_list]
+    decoded = []
+    for card in reversed(cards):
+        decoded.append(uniques % card)
+        uniques = uniques // card
+    return decoded[::-1], sums
+
+
+def prepare_arrays(df: pd.DataFrame, min_cell_impressions: float = 0.0) -> dict:
+    """Reduce the rows to the cell arrays every test works on."""
+    dates = df["date"]
+    if not pd.api.types.is_datetime64_any_dtype(dates):
+        dates = pd.to_datetime(dates, errors="coerce")
+    days = dates.to_numpy().astype("datetime64[D]")
+    dated = ~np.isnat(days)
+    comps = ratio_components(df)[dated]
+    day = days[dated].view("int64")
+    day = day - day.min() if len(day) else day
+    clicks, impressions = comps[:, 2], comps[:, 3]
+    cpm_spend, cpm_impressions = comps[:, 4], comps[:, 5]
+    arrays = {}
+
+    # Day level: CPM and CTR per day, period label
+    (d,), (sp, imp_cpm, clk, imp_ctr) = _cell_sums([day], [cpm_spend, cpm_impressions, clicks, impressions])
+    order = np.argsort(d)
+    d, sp, imp_cpm, clk, imp_ctr = d[order], sp[order], imp_cpm[order], clk[order], imp_ctr[order]
+    ok = (imp_cpm > 0) & (imp_ctr > 0)
+    arrays["day_cpm"] = 1000 * sp[ok] / imp_cpm[ok]
+    arrays["day_ctr"] = clk[ok] / imp_ctr[ok]
+    day_ok = d[ok]
+    split = np.unique(day_ok)[len(np.unique(day_ok)) // 2] if len(day_ok) else 0
+    arrays["day_late"] = day_ok >= split
+
+    # Creative x day: CTR against the creative's age
+    creative_col = next((c for c in ("creative_message", "ad_id", "creative_type") if c in df.columns), None)
+    if creative_col is not None:
+        creative = _codes(df[creative_col])[dated]
+        (cr, cd), (clk, imp) = _cell_sums([creative, day], [clicks, impressions])
+        keep = imp > max(min_cell_impressions, 0)
+        cr, cd, ctr, imp = cr[keep], cd[keep], clk[keep] / imp[keep], imp[keep]
+        first_day = np.full(cr.max() + 1 if len(cr) else 0, np.iinfo("int64").max)
+        np.minimum.at(first_day, cr, cd)
+        age = (cd - first_day[cr]).astype("float64")
+        # Demean within creative so only the age effect remains
+        counts = np.bincount(cr)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            ctr_mean = np.bincount(cr, weights=ctr) / counts
+            age_mean = np.bincount(cr, weights=age) / counts
+        multi_day = counts[cr] >= 3
+        arrays["fatigue_ctr"] = (ctr - ctr_mean[cr])[multi_day]
+        arrays["fatigue_age"] = (age - age_mean[cr])[multi_day]
+        arrays["fatigue_raw_ctr"] = ctr[multi_day]
+
+    # Audience x day: CTR by audience_type
+    if "audience_type" in df.columns:
+        column = df["audience_type"]
+        names = column.cat.categories if isinstance(column.dtype, pd.CategoricalDtype) else pd.factorize(column)[1]
+        (aud, _), (clk, imp) = _cell_sums([_codes(column)[dated], day], [clicks, impressions])
+        keep = imp > max(min_cell_impressions, 0)
+        labels, present = pd.factorize(aud[keep])
+        arrays["audience_ctr"] = clk[keep] / imp[keep]
+        arrays["audience_label"] = labels.astype("int64")
+        arrays["audience_names"] = [str(names[c]) for c in present]
+    return arrays
+
+
+# ---------------------------------------------------------------- statistics
+def _corr(x: np.ndarray, y: np.ndarray) -> np.ndarray:
+    """Correlation of each row of x (B, n) with y (n,) (both already centred)."""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return (x @ y) / (np.sqrt((x * x).sum(axis=-1)) * np.sqrt(y @ y))
+
+
+def _relative_change(values: np.ndarray, late: np.ndarray) -> np.ndarray:
+    """mean(late) / mean(early) - 1 for each row of a (B, n) late-mask matrix."""
+    late = late.astype("float64")
+    n_late = late.sum(axis=-1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        late_mean = (late * values).sum(axis=-1) / n_late
+        early_mean = ((1 - late) * values).sum(axis=-1) / (len(values) - n_late)
+        return late_mean / early_mean - 1
+
+
+def _variance_ratio(values: np.ndarray, labels: np.ndarray, groups: int) -> np.ndarray:
+    """Between- / within-group variance (one-way ANOVA F numerator/denominator) per label row."""
+    labels = np.atleast_2d(labels)
+    total_mean = values.mean()
+    between = np.zeros(labels.shape[0])
+    within = np.zeros(labels.shape[0])
+    for g in range(groups):
+        mask = labels == g
+        n = mask.sum(axis=-1)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            mean = np.where(n > 0, (mask * values).sum(axis=-1) / n, 0.0)
+        between += n * (mean - total_mean) ** 2
+        within += (mask * (values - mean[:, None]) ** 2).sum(axis=-1)
+    dof_between, dof_within = max(groups - 1, 1), max(len(values) - groups, 1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return (between / dof_between) / (within / dof_within)
+
+
+def _permute(values: np.ndarray, rng, n_perm: int) -> np.ndarray:
+    """`n_perm` independent shuffles of `values`, one per row."""
+    return rng.permuted(np.broadcast_to(values, (n_perm, len(values))), axis=1)
+
+
+def statistics(test_type: str, arrays: dict, rng=None, n_perm: int = 0) -> np.ndarray:
+    """
+    Test statistics as an (n, k) array: one row for the real labels when `rng`
+    is None, otherwise one row per permutation of the shuffled labels.
+    """
+    if test_type == "fatigue":
+        x = arrays["fatigue_ctr"]
+        x = _permute(x, rng, n_perm) if rng is not None else x[None, :]
+        return _corr(x, arrays["fatigue_age"])[:, None]
+    if test_type == "competition":
+        late = arrays["day_late"]
+        late = _permute(late, rng, n_perm) if rng is not None else late[None, :]
+        return np.column_stack([_relative_change(arrays["day_cpm"], late),
+                                _relative_change(arrays["day_ctr"], late)])
+    if test_type == "audience":
+        labels = arrays["audience_label"]
+        groups = int(labels.max()) + 1 if len(labels) else 0
+        labels = _permute(labels, rng, n_perm) if rng is not None else labels[None, :]
+        return _variance_ratio(arrays["audience_ctr"], labels, groups)[:, None]
+    raise ValueError(f"Unknown test type: {test_type}")
+
+
+def permutation_block(test_type: str, arrays: dict, n_perm: int, seed_seq) -> np.ndarray:
+    """Statistics for `n_perm` label permutations, (n_perm, k). Runs in worker processes."""
+    rng = np.random.default_rng(seed_seq)
+    n_cells = max(len(v) for v in arrays.values()) or 1
+    step = max(1, min(n_perm, MAX_BLOCK_ELEMENTS // n_cells))
+    return np.concatenate([statistics(test_type, arrays, rng, min(step, n_perm - i))
+                           for i in range(0, n_perm, step)])
+
+
+def _test_arrays(test_type: str, arrays: dict) -> dict:
+    """Only the arrays a test needs, so worker processes receive as little as possible."""
+    keys = {
+        "fatigue": ["fatigue_ctr", "fatigue_age"],
+        "competition": ["day_cpm", "day_ctr", "day_late"],
+        "audience": ["audience_ctr", "audience_label"],
+    }[test_type]
+    return {k: arrays[k] for k in keys}
+
+
+def _has_data(test_type: str, arrays: dict) -> bool:
+    if test_type == "fatigue":
+        return len(arrays.get("fatigue_ctr", [])) >= 10
+    if test_type == "competition":
+        late = arrays.get("day_late", np.array([], dtype=bool))
+        return late.sum() >= 3 and (~late).sum() >= 3
+    if test_type == "audience":
+        labels = arrays.get("audience_label", np.array([], dtype="int64"))
+        return len(labels) >= 6 and len(np.unique(labels)) >= 2
+    return False
+
+
+# ---------------------------------------------------------------- execution
+_POOL = None
+_POOL_WORKERS = 0
+
+
+def _get_pool(workers: int) -> ProcessPoolExecutor:
+    """A process pool reused across evaluations (forkserver/spawn: safe with the pipeline's threads)."""
+    global _POOL, _POOL_WORKERS
+    if _POOL is None or _POOL_WORKERS != workers:
+        if _POOL is not None:
+            _POOL.shutdown(wait=False, cancel_futures=True)
+        methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+        _POOL = ProcessPoolExecutor(max_workers=workers, mp_context=context)
+        _POOL_WORKERS = workers
+    return _POOL
+
+
+def shutdown_pool():
+    global _POOL
+    if _POOL is not None:
+        _POOL.shutdown(wait=False, cancel_futures=True)
+        _POOL = None
+
+
+def run_tests(test_types, arrays: dict, permutations: int = 2000, seed: int = 42,
+              workers: int = 1, parallel_min_work: int = 5_000_000) -> dict:
+    """
+    Observed statistics and permutation distributions for each test type.
+
+    Every (test, block) pair has its own child of SeedSequence(seed), spawned in
+    a fixed order, so the result only depends on `seed` and `permutations`.
+    The pool is used when `workers` > 1 and the total permutation work
+    (permutations x cells) exceeds `parallel_min_work`; otherwise blocks run inline.
+    """
+    test_types = [t for t in TEST_TYPES if t in set(test_types) and _has_data(t, arrays)]
+    n_blocks = (permutations + BLOCK_SIZE - 1) // BLOCK_SIZE
+    children = np.random.SeedSequence(seed).spawn(len(TEST_TYPES))
+    tasks = []
+    for test_type in test_types:
+        seeds = children[TEST_TYPES.index(test_type)].spawn(n_blocks)
+        sub = _test_arrays(test_type, arrays)
+        for b in range(n_blocks):
+            tasks.append((test_type, sub, min(BLOCK_SIZE, permutations - b * BLOCK_SIZE), seeds[b]))
+
+    work = sum(n * max(len(v) for v in sub.values()) for _, sub, n, _ in tasks)
+    blocks = None
+    if workers > 1 and work >= parallel_min_work and len(tasks) > 1:
+        try:
+            blocks = list(_get_pool(workers).map(permutation_block, *zip(*tasks)))
+        except (BrokenProcessPool, OSError) as e:
+            # Same seeds inline, so the fallback gives the same answer
+            log_step("HypothesisTests", f"Process pool unavailable ({e}); running permutations inline.", level="WARNING")
+            shutdown_pool()
+    if blocks is None:
+        blocks = [permutation_block(*task) for task in tasks]
+
+    results = {}
+    for test_type in test_types:
+        perms = np.concatenate([blk for (t, *_), blk in zip(tasks, blocks) if t == test_type])
+        results[test_type] = {"observed": statistics(test_type, arrays)[0], "permuted": perms}
+    return results
+
+
+def _p_value(observed: float, permuted: np.ndarray, alternative: str) -> float:
+    """Permutation p-value with the +1 correction (never exactly zero)."""
+    permuted = permuted[np.isfinite(permuted)]
+    if not np.isfinite(observed) or len(permuted) == 0:
+        return 1.0
+    if alternative == "less":
+        extreme = (permuted <= observed).sum()
+    elif alternative == "greater":
+        extreme = (permuted >= observed).sum()
+    else:
+        extreme = (np.abs(permuted) >= abs(observed)).sum()
+    return float((1 + extreme) / (1 + len(permuted)))
+
+
+def interpret(test_type: str, result: dict, arrays: dict, alpha: float = 0.05, ctr_stable_pct: float = 0.1) -> dict:
+    """Turn raw statistics into a verdict: supported, p-value, effect and a plain-language reason."""
+    observed, permuted = result["observed"], result["permuted"]
+    n_perm = int(len(permuted))
+    if test_type == "fatigue":
+        corr = float(observed[0])
+        p = _p_value(corr, permuted[:, 0], "less")
+        x, y = arrays["fatigue_age"], arrays["fatigue_raw_ctr"]
+        slope = (x @ arrays["fatigue_ctr"]) / (x @ x) if x @ x > 0 else np.nan
+        weekly = 7 * slope / y.mean() if len(y) and y.mean() else np.nan
+        supported = corr < 0 and p < alpha
+        reason = (f"Within-creative CTR vs. creative age correlation {corr:.3f} (p={p:.4f}); "
+                  f"CTR changes {weekly:+.1%} per week of creative age.")
+        return {"supported": supported, "p_value": p, "statistic": corr,
+                "effect": {"ctr_change_per_week": weekly}, "permutations": n_perm, "reason": reason}
+    if test_type == "competition":
+        cpm_change, ctr_change = float(observed[0]), float(observed[1])
+        p_cpm = _p_value(cpm_change, permuted[:, 0], "greater")
+        p_ctr = _p_value(ctr_change, permuted[:, 1], "two-sided")
+        ctr_stable = abs(ctr_change) <= ctr_stable_pct or p_ctr >= alpha
+        supported = cpm_change > 0 and p_cpm < alpha and ctr_stable
+        reason = (f"Daily CPM changed {cpm_change:+.1%} between halves of the period (p={p_cpm:.4f}) "
+                  f"while CTR changed {ctr_change:+.1%} (p={p_ctr:.4f}, "
+                  f"{'stable' if ctr_stable else 'not stable'}).")
+        return {"supported": supported, "p_value": p_cpm, "statistic": cpm_change,
+                "effect": {"cpm_change": cpm_change, "ctr_change": ctr_change, "ctr_p_value": p_ctr},
+                "permutations": n_perm, "reason": reason}
+    if test_type == "audience":
+        ratio = float(observed[0])
+        p = _p_value(ratio, permuted[:, 0], "greater")
+        ctr, labels = arrays["audience_ctr"], arrays["audience_label"]
+        means = {name: float(ctr[labels == g].mean()) for g, name in enumerate(arrays["audience_names"])}
+        spread = max(means.values()) / min(means.values()) - 1 if means and min(means.values()) > 0 else np.nan
+        supported = p < alpha
+        reason = (f"CTR variance ratio across audience types {ratio:.2f} (p={p:.4f}); "
+                  f"best audience CTR is {spread:.1%} above the worst.")
+        return {"supported": supported, "p_value": p, "statistic": ratio,
+                "effect": {"audience_ctr": means, "ctr_spread": spread}, "permutations": n_perm, "reason": reason}
+    raise ValueError(f"Unknown test type: {test_type}")
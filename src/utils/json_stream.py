@@ -0,0 +1,145 @@
+"""
+Incremental JSON parsing for streamed LLM output.
+
+LLM responses arrive as text chunks, often wrapped in prose or ``` fences.
+JSONStreamParser scans each chunk once, tracking strings, escapes and
+object/array nesting, and emits every element of a named array (e.g.
+"creative_recommendations" or "subtasks") as soon as its closing brace
+arrives. When the response is cut off, every element completed so far is
+still available; when it finishes, the whole document is parsed from the
+span between the first opening brace and its matching close.
+"""
+
+import json
+
+
+class JSONStreamParser:
+    """
+    JSONStreamParser
+    -----------------
+    Feed text chunks; get back the array items completed by each chunk.
+
+        parser = JSONStreamParser("subtasks")
+        for chunk in stream:
+            for subtask in parser.feed(chunk):
+                ...
+        plan = parser.result()   # full document, or {"subtasks": [...]} if truncated
+
+    Text before the first "{" or "[" (prose, code fences) is ignored.
+    """
+
+    def __init__(self, array_key=None):
+        self.array_key = array_key
+        self.items = []
+        self.text = ""
+        self.root_start = None
+        self.root_end = None
+        self._pos = 0
+        self._in_string = False
+        self._escape = False
+        self._string_start = None
+        # One frame per open container: [kind, key it sits under, pending key, expecting a key, start]
+        self._stack = []
+
+    @property
+    def complete(self) -> bool:
+        """True once the root value has closed."""
+        return self.root_end is not None
+
+    def _is_target_array(self, frame) -> bool:
+        return frame[0] == "[" and (self.array_key is None or frame[1] == self.array_key)
+
+    def feed(self, chunk: str) -> list:
+        """Consume a chunk and return the items it completed (possibly none)."""
+        self.text += chunk
+        completed = []
+        text = self.text
+        for pos in range(self._pos, len(text)):
+            if self.complete:
+                break
+            ch = text[pos]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    self._close_string(text[self._string_start:pos + 1])
+                continue
+            if not self._stack:
+                if ch in "{[":
+                    self.root_start = pos
+                    self._open(ch, pos)
+                continue
+            if ch == '"':
+                self._in_string = True
+                self._string_start = pos
+            elif ch in "{[":
+                self._open(ch, pos)
+            elif ch in "}]":
+                frame = self._stack.pop()
+                if ch == "}" and self._stack and self._is_target_array(self._stack[-1]):
+                    item = self._load(text[frame[4]:pos + 1])
+                    if item is not None:
+                        self.items.append(item)
+                        completed.append(item)
+                if not self._stack:
+                    self.root_end = pos + 1
+            elif self._stack[-1][0] == "{":
+                if ch == ":":
+                    self._stack[-1][3] = False
+                elif ch == ",":
+                    self._stack[-1][3] = True
+                    self._stack[-1][2] = None
+        self._pos = len(text)
+        return completed
+
+    def _open(self, kind, pos):
+        parent = self._stack[-1] if self._stack else None
+        key = parent[2] if parent is not None and parent[0] == "{" else None
+        self._stack.append([kind, key, None, kind == "{", pos])
+
+    def _close_string(self, literal):
+        frame = self._stack[-1] if self._stack else None
+        if frame is not None and frame[0] == "{" and frame[3]:
+            frame[2] = self._load(literal)
+
+    @staticmethod
+    def _load(fragment):
+        try:
+            return json.loads(fragment)
+        except json.JSONDecodeError:
+            return None
+
+    def document(self):
+        """The parsed root value once complete, else None."""
+        if not self.complete:
+            return None
+        return self._load(self.text[self.root_start:self.root_end])
+
+    def result(self, default=None):
+        """
+        The full document when it parsed, otherwise the completed items under
+        `array_key` merged into `default` (a truncated or malformed response).
+        """
+        document = self.document()
+        if document is not None:
+            return document
+        if self.array_key is None:
+            return default
+        return {**(default or {}), self.array_key: list(self.items)}
+
+
+def iter_items(chunks, array_key):
+    """Yield the elements of `array_key` from a stream of text chunks as each one completes."""
+    parser = JSONStreamParser(array_key)
+    for chunk in chunks:
+        yield from parser.feed(chunk)
+
+
+def parse_response(text: str, array_key=None):
+    """Parse a complete response text; returns the parser (see .document(), .items, .result())."""
+    parser = JSONStreamParser(array_key)
+    parser.feed(text)
+    return parser
@@ -1,28 +1,216 @@
-import os
 import json
-import google.generativeai as genai
+import time
+import hashlib
+import sqlite3
+import threading
+from pathlib import Path
+from src.utils.fingerprint import env_flag
+from src.utils.llm_client import estimate_tokens, get_llm_client
 from src.utils.logger import log_step
+from src.utils.tracing import trace_span
 
-# Configure Gemini (ensure GOOGLE_API_KEY is set in .env)
-genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
+
+class LLMCache:
+    """
+    LLMCache
+    ---------
+    Content-addressed cache of LLM responses in a local SQLite file.
+
+    Entries are keyed by a SHA-256 of (model, prompt, temperature), expire after
+    `ttl_seconds`, and the least recently used entries are evicted once the store
+    exceeds `max_entries` or `max_bytes`.
+    """
+
+    def __init__(self, path=".cache/llm_cache.sqlite", ttl_seconds=7 * 24 * 3600,
+                 max_entries=5000, max_bytes=50 * 1024 * 1024, name="LLM cache"):
+        self.path = Path(path)
+        self.name = name
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                " key TEXT PRIMARY KEY, model TEXT, response TEXT, size INTEGER,"
+                " created_at REAL, accessed_at REAL)"
+            )
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30)
+
+    @staticmethod
+    def make_key(model, prompt, temperature=None):
+        payload = json.dumps([model, prompt, temperature], ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        """Return the cached response text, or None on a miss or an expired entry."""
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            row = conn.execute("SELECT response, created_at FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None or now - row[1] > self.ttl_seconds:
+                if row is not None:
+                    conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self.misses += 1
+                return None
+            conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+            self.hits += 1
+            return row[0]
+
+    def set(self, key, model, response):
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)",
+                (key, model, response, len(response.encode("utf-8")), now, now),
+            )
+            self._evict(conn, now)
+
+    def _evict(self, conn, now):
+        conn.execute("DELETE FROM responses WHERE created_at < ?", (now - self.ttl_seconds,))
+        count, total = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        if count <= self.max_entries and total <= self.max_bytes:
+            return
+        # Drop least recently used rows until both limits hold again
+        removed = 0
+        for key, size in conn.execute("SELECT key, size FROM responses ORDER BY accessed_at ASC").fetchall():
+            if count <= self.max_entries and total <= self.max_bytes:
+                break
+            conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            count, total, removed = count - 1, total - size, removed + 1
+        log_step("LLM", f"{self.name} evicted {removed} entries.", "cache")
+
+    def clear(self):
+        with self._lock, self._connect() as conn:
+            conn.execute("DELETE FROM responses")
+
+    def stats(self):
+        with self._lock, self._connect() as conn:
+            count, total = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        return {"hits": self.hits, "misses": self.misses, "entries": count, "bytes": total}
+
+
+_cache = None
+_cache_enabled = True
+
+
+def configure_llm_cache(config):
+    """Set up the shared response cache from the `llm.cache` config section."""
+    global _cache, _cache_enabled
+    settings = config.get("llm", {}).get("cache", {})
+    _cache_enabled = settings.get("enabled", True)
+    _cache = LLMCache(
+        path=settings.get("path", ".cache/llm_cache.sqlite"),
+        ttl_seconds=settings.get("ttl_seconds", 7 * 24 * 3600),
+        max_entries=settings.get("max_entries", 5000),
+        max_bytes=int(settings.get("max_mb", 50) * 1024 * 1024),
+    ) if _cache_enabled else None
+    return _cache
 
 
-def call_gemini(prompt: str, model: str = "gemini-2.0-flash"):
-    """Wrapper to call Google Gemini model for real LLM inference."""
-    log_step("LLM", "call_gemini", f"Calling Gemini model: {model}")
-    try:
-        response = genai.GenerativeModel(model).generate_content(prompt)
-        return response.text
-    except Exception as e:
-        log_step("LLM", "call_gemini", f" Gemini API call failed: {e}")
-        raise
+def get_llm_cache():
+    """Return the shared cache, or None when caching is disabled or bypassed (LLM_CACHE_BYPASS=1)."""
+    global _cache
+    if not _cache_enabled or env_flag("LLM_CACHE_BYPASS"):
+        return None
+    if _cache is None:
+        _cache = LLMCache()
+    return _cache
 
 
-def call_llm_model(model: str, prompt: str, temperature: float = 0.7):
+def _cached_call(model, prompt, temperature, use_cache, produce, span_name="LLM.call"):
+    """Serve `produce()` through the response cache unless bypassed (traced with token counts)."""
+    with trace_span(span_name, "llm", model=model, prompt_tokens=estimate_tokens(prompt)) as span:
+        response = _lookup_or_produce(model, prompt, temperature, use_cache, produce, span)
+        if span is not None:
+            span.set(response_tokens=estimate_tokens(response))
+        return response
+
+
+def _lookup_or_produce(model, prompt, temperature, use_cache, produce, span):
+    cache = get_llm_cache() if use_cache else None
+    if cache is None:
+        return produce()
+    key = cache.make_key(model, prompt, temperature)
+    cached = cache.get(key)
+    if cached is not None:
+        log_step("LLM", f"Cache hit for model: {model}", "cache")
+        if span is not None:
+            span.set(cache_hit=True)
+        return cached
+    response = produce()
+    cache.set(key, model, response)
+    return response
+
+
+def call_gemini(prompt: str, model: str = "gemini-2.0-flash", use_cache: bool = True):
+    """Wrapper to call Google Gemini model for real LLM inference (served from cache when possible)."""
+    def produce():
+        log_step("LLM", "call_gemini", f"Calling Gemini model: {model}")
+        try:
+            # Shared client: reused model handle, rate limits, retries and deadlines
+            return get_llm_client().generate_sync(prompt, model=model)
+        except Exception as e:
+            log_step("LLM", "call_gemini", f" Gemini API call failed: {e}")
+            raise
+
+    return _cached_call(model, prompt, None, use_cache, produce, "LLM.call_gemini")
+
+
+def stream_gemini(prompt: str, model: str = "gemini-2.0-flash", use_cache: bool = True, refresh: bool = False):
+    """
+    Yield the Gemini response in chunks as it is generated.
+
+    A cached response is yielded as one chunk; a fresh one is stored in the
+    cache only once the stream has finished, so truncated output never is.
+    `refresh` skips the cache read but still stores the new response, so a
+    retry after a bad cached answer replaces it.
+    """
+    cache = get_llm_cache() if use_cache else None
+    key = cache.make_key(model, prompt, None) if cache is not None else None
+    with trace_span("LLM.stream_gemini", "llm", model=model, prompt_tokens=estimate_tokens(prompt)) as span:
+        cached = cache.get(key) if cache is not None and not refresh else None
+        if cached is not None:
+            log_step("LLM", f"Cache hit for model: {model}", "cache")
+            if span is not None:
+                span.set(cache_hit=True, response_tokens=estimate_tokens(cached))
+            yield cached
+            return
+
+        log_step("LLM", "stream_gemini", f"Streaming Gemini model: {model}")
+        start = time.perf_counter()
+        parts = []
+        try:
+            for chunk in get_llm_client().stream_sync(prompt, model=model):
+                if not parts and span is not None:
+                    span.set(first_chunk_seconds=round(time.perf_counter() - start, 4))
+                parts.append(chunk)
+                yield chunk
+        except Exception as e:
+            log_step("LLM", "stream_gemini", f" Gemini streaming call failed: {e}")
+            raise
+        response = "".join(parts)
+        if span is not None:
+            span.set(response_tokens=estimate_tokens(response), chunks=len(parts))
+        if cache is not None:
+            cache.set(key, model, response)
+
+
+def call_llm_model(model: str, prompt: str, temperature: float = 0.7, use_cache: bool = True):
     """
     Simulated LLM interface used by InsightAgent or fallback mode.
     If Gemini API fails or simulation is preferred, returns a JSON-like response.
     """
+    return _cached_call(model, prompt, temperature, use_cache,
+                        lambda: _simulate_llm_model(model, prompt, temperature), "LLM.call_llm_model")
+
+
+def _simulate_llm_model(model: str, prompt: str, temperature: float):
+    """Produce the simulated response for call_llm_model."""
     log_step("LLM", "call_llm_model", f"Simulating call for model: {model}")
 
     # Simulated responses for Insight Agent
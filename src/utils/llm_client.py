@@ -0,0 +1,443 @@
+"""
+Shared asynchronous LLM client.
+
+One AsyncLLMClient per process owns the model handles, a token-bucket limiter
+(requests and tokens per minute), a concurrency cap, per-call deadlines and
+jittered exponential backoff on 429/5xx responses. The network layer is a
+pluggable transport, so the client can be pointed at a local fake server.
+
+Synchronous code (the agents) calls `generate_sync`, which runs the request on
+the client's background event loop; limits are therefore shared by every
+thread in the process. `stream_sync` yields the response in chunks as the
+model produces them, under the same limits.
+"""
+
+import asyncio
+import json
+import os
+import random
+import threading
+import time
+import http.client
+from urllib.parse import urlparse
+
+from src.utils.logger import log_step
+
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+
+
+class LLMError(Exception):
+    """An LLM call failed; `status` carries the HTTP-style code when known."""
+
+    def __init__(self, message, status=None, retry_after=None):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+    @property
+    def retryable(self):
+        return self.status in RETRYABLE_STATUS
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token) used for rate limiting."""
+    return max(1, len(text) // 4)
+
+
+class TokenBucket:
+    """Continuous-refill token bucket: `rate` tokens per minute, bursts up to `rate`."""
+
+    def __init__(self, rate_per_minute: float):
+        self.capacity = float(rate_per_minute)
+        self.tokens = float(rate_per_minute)
+        self.refill_per_second = rate_per_minute / 60.0
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.refill_per_second)
+        self.updated = now
+
+    async def acquire(self, amount: float = 1.0):
+        amount = min(float(amount), self.capacity)
+        async with self._lock:
+            while True:
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                await asyncio.sleep((amount - self.tokens) / self.refill_per_second)
+
+
+class GeminiTransport:
+    """Calls google-generativeai, reusing one GenerativeModel handle per model name."""
+
+    def __init__(self, api_key=None):
+        import google.generativeai as genai
+
+        self._genai = genai
+        genai.configure(api_key=api_key or os.getenv("GOOGLE_API_KEY"))
+        self._models = {}
+        self._lock = threading.Lock()
+
+    def _model(self, name):
+        with self._lock:
+            if name not in self._models:
+                self._models[name] = self._genai.GenerativeModel(name)
+            return self._models[name]
+
+    def _call(self, model, prompt, temperature, timeout=None):
+        kwargs = {}
+        if temperature is not None:
+            kwargs["generation_config"] = {"temperature": temperature}
+        if timeout is not None:
+            kwargs["request_options"] = {"timeout": timeout}
+        try:
+            return self._model(model).generate_content(prompt, **kwargs).text
+        except Exception as e:
+            raise LLMError(str(e), status=_status_of(e)) from e
+
+    async def generate(self, model, prompt, temperature=None, timeout=None):
+        """One request; `timeout` is passed to the SDK, which abandons the call itself (DeadlineExceeded)."""
+        return await asyncio.to_thread(self._call, model, prompt, temperature, timeout)
+
+    def stream(self, model, prompt, temperature=None, timeout=None):
+        """Yield text chunks as the model produces them (blocking; run off the event loop)."""
+        kwargs = {}
+        if temperature is not None:
+            kwargs["generation_config"] = {"temperature": temperature}
+        if timeout is not None:
+            kwargs["request_options"] = {"timeout": timeout}
+        try:
+            response = self._model(model).generate_content(prompt, stream=True, **kwargs)
+            if not hasattr(response, "__iter__"):
+                yield response.text
+                return
+            for chunk in response:
+                text = chunk.text
+                if text:
+                    yield text
+        except LLMError:
+            raise
+        except Exception as e:
+            raise LLMError(str(e), status=_status_of(e)) from e
+
+
+class HTTPTransport:
+    """
+    Minimal JSON-over-HTTP transport: POST {"model", "prompt", "temperature"} to
+    `base_url` and read {"text": ...}. Keeps one keep-alive connection per thread.
+
+    Streaming requests add "stream": true; a server that supports it answers
+    with application/x-ndjson, one {"text": chunk} per line, anything else is
+    read as a single chunk.
+    """
+
+    def __init__(self, base_url: str, timeout: float = 60.0):
+        parsed = urlparse(base_url)
+        self.host, self.port = parsed.hostname, parsed.port
+        self.path = parsed.path or "/"
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            self._local.conn = conn
+        return conn
+
+    def _request(self, payload, timeout=None):
+        """Send one request; returns the response with the body still unread."""
+        conn = self._connection()
+        conn.timeout = timeout or self.timeout
+        if conn.sock is not None:
+            conn.sock.settimeout(conn.timeout)
+        try:
+            conn.request("POST", self.path, body=json.dumps(payload), headers={"Content-Type": "application/json"})
+            response = conn.getresponse()
+        except TimeoutError as e:
+            self._reset()
+            raise LLMError(f"Request timed out after {conn.timeout:.1f}s.", status=408) from e
+        except (OSError, http.client.HTTPException) as e:
+            self._reset()
+            raise LLMError(f"Transport error: {e}", status=503) from e
+        if response.status != 200:
+            body = response.read()
+            retry_after = response.getheader("Retry-After")
+            raise LLMError(
+                f"HTTP {response.status}: {body[:200]!r}",
+                status=response.status,
+                retry_after=float(retry_after) if retry_after else None,
+            )
+        return response
+
+    def _reset(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+        self._local.conn = None
+
+    def _call(self, model, prompt, temperature, timeout=None):
+        response = self._request({"model": model, "prompt": prompt, "temperature": temperature}, timeout)
+        try:
+            payload = response.read()
+        except TimeoutError as e:
+            self._reset()
+            raise LLMError("Request timed out while reading the response.", status=408) from e
+        except (OSError, http.client.HTTPException) as e:
+            self._reset()
+            raise LLMError(f"Transport error: {e}", status=503) from e
+        return json.loads(payload)["text"]
+
+    async def generate(self, model, prompt, temperature=None, timeout=None):
+        """One request; `timeout` (default: the transport's) is the socket timeout for connect and each read."""
+        return await asyncio.to_thread(self._call, model, prompt, temperature, timeout)
+
+    def stream(self, model, prompt, temperature=None, timeout=None):
+        """Yield text chunks from an NDJSON response; `timeout` bounds the connect and each read."""
+        response = self._request({"model": model, "prompt": prompt, "temperature": temperature, "stream": True},
+                                 timeout)
+        try:
+            if "ndjson" not in (response.getheader("Content-Type") or ""):
+                yield json.loads(response.read())["text"]
+                return
+            while True:
+                line = response.readline()
+                if not line:
+                    return
+                if line.strip():
+                    text = json.loads(line).get("text", "")
+                    if text:
+                        yield text
+        except TimeoutError as e:
+            self._reset()
+            raise LLMError("Stream stalled: no data within the read timeout.", status=408) from e
+        except (OSError, http.client.HTTPException) as e:
+            self._reset()
+            raise LLMError(f"Transport error: {e}", status=503) from e
+        finally:
+            if not response.isclosed():
+                # Abandoned mid-stream: the connection can't be reused
+                self._reset()
+
+
+def _status_of(exc):
+    """Best-effort HTTP status for SDK exceptions (google.api_core errors carry .code)."""
+    for attr in ("code", "status_code", "status"):
+        value = getattr(exc, attr, None)
+        value = getattr(value, "value", value)
+        if isinstance(value, int):
+            return value
+    name = type(exc).__name__
+    return {"ResourceExhausted": 429, "ServiceUnavailable": 503, "InternalServerError": 500,
+            "DeadlineExceeded": 504, "TooManyRequests": 429}.get(name)
+
+
+class AsyncLLMClient:
+    """
+    AsyncLLMClient
+    ---------------
+    Rate-limited, retrying LLM client shared by all agents.
+
+    The per-attempt `timeout` is enforced by the transport (socket timeout,
+    or the SDK's request timeout), not by cancelling the awaiting coroutine:
+    the request runs in a worker thread that cannot be cancelled, so the
+    concurrency slot is held until that thread has actually returned. A
+    timed-out attempt is therefore never still running when it is retried.
+    """
+
+    def __init__(self, transport, model="gemini-2.0-flash", requests_per_minute=60,
+                 tokens_per_minute=1_000_000, max_concurrency=8, max_retries=4,
+                 backoff_base=1.0, backoff_max=30.0, timeout=60.0, deadline=180.0):
+        self.transport = transport
+        self.model = model
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.timeout = timeout
+        self.deadline = deadline
+        self.stats = {"calls": 0, "attempts": 0, "retries": 0, "failures": 0}
+        self._loop = None
+        self._loop_lock = threading.Lock()
+        self._primitives = {}
+
+    # --- event loop plumbing ---
+    def _ensure_loop(self):
+        with self._loop_lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(target=self._loop.run_forever, name="llm-client", daemon=True).start()
+            return self._loop
+
+    def _limits(self):
+        # asyncio primitives are bound to the loop that uses them
+        loop = asyncio.get_running_loop()
+        if loop not in self._primitives:
+            self._primitives[loop] = (
+                asyncio.Semaphore(self.max_concurrency),
+                TokenBucket(self.requests_per_minute),
+                TokenBucket(self.tokens_per_minute),
+            )
+        return self._primitives[loop]
+
+    def _backoff(self, attempt, retry_after=None):
+        if retry_after is not None:
+            return min(self.backoff_max, retry_after)
+        # "Full jitter": uniform in [0, base * 2^attempt], capped
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    # --- public API ---
+    async def generate(self, prompt, model=None, temperature=None, timeout=None, deadline=None):
+        """Generate text for `prompt`, retrying retryable failures until the deadline."""
+        model = model or self.model
+        timeout = timeout or self.timeout
+        deadline_at = time.monotonic() + (deadline or self.deadline)
+        semaphore, requests, tokens = self._limits()
+        self.stats["calls"] += 1
+
+        attempt = 0
+        while True:
+            remaining = deadline_at - time.monotonic()
+            if remaining <= 0:
+                self.stats["failures"] += 1
+                raise LLMError(f"Deadline exceeded after {attempt} attempt(s).", status=504)
+            await requests.acquire(1)
+            await tokens.acquire(estimate_tokens(prompt))
+            try:
+                async with semaphore:
+                    self.stats["attempts"] += 1
+                    return await self.transport.generate(model, prompt, temperature,
+                                                         timeout=min(timeout, remaining))
+            except LLMError as e:
+                error = e
+            if not error.retryable or attempt >= self.max_retries:
+                self.stats["failures"] += 1
+                raise error
+            delay = min(self._backoff(attempt, error.retry_after), max(0.0, deadline_at - time.monotonic()))
+            log_step("LLM", f"Retrying after {error} (attempt {attempt + 1}, sleeping {delay:.2f}s)", "retry")
+            self.stats["retries"] += 1
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    def generate_sync(self, prompt, **kwargs):
+        """Blocking wrapper around `generate` for synchronous callers (any thread)."""
+        loop = self._ensure_loop()
+        return asyncio.run_coroutine_threadsafe(self.generate(prompt, **kwargs), loop).result()
+
+    async def _admit(self, prompt):
+        """Wait for the rate limits and a concurrency slot; returns the semaphore to release."""
+        semaphore, requests, tokens = self._limits()
+        await requests.acquire(1)
+        await tokens.acquire(estimate_tokens(prompt))
+        await semaphore.acquire()
+        return semaphore
+
+    def stream_sync(self, prompt, model=None, temperature=None, deadline=None):
+        """
+        Yield the response text in chunks as they arrive (synchronous callers, any thread).
+
+        Rate limits and the concurrency cap are shared with `generate`; the slot
+        is held until the stream ends. Retryable failures are retried only
+        before the first chunk, since retrying later would repeat text already
+        handed out. Each attempt passes `timeout` (capped by the remaining
+        deadline) to the transport, which bounds the connect and every read, and
+        the stream is abandoned with a 504 once the deadline passes between chunks.
+        """
+        model = model or self.model
+        deadline_at = time.monotonic() + (deadline or self.deadline)
+        loop = self._ensure_loop()
+        self.stats["calls"] += 1
+
+        attempt = 0
+        while True:
+            remaining = deadline_at - time.monotonic()
+            if remaining <= 0:
+                self.stats["failures"] += 1
+                raise LLMError(f"Deadline exceeded after {attempt} attempt(s).", status=504)
+            semaphore = asyncio.run_coroutine_threadsafe(self._admit(prompt), loop).result()
+            started = False
+            chunks = self.transport.stream(model, prompt, temperature, timeout=min(self.timeout, remaining))
+            try:
+                self.stats["attempts"] += 1
+                for chunk in chunks:
+                    started = True
+                    yield chunk
+                    if time.monotonic() > deadline_at:
+                        raise LLMError("Deadline exceeded mid-stream.", status=504)
+                return
+            except LLMError as e:
+                error = e
+            finally:
+                chunks.close()
+                loop.call_soon_threadsafe(semaphore.release)
+            if started or not error.retryable or attempt >= self.max_retries:
+                self.stats["failures"] += 1
+                raise error
+            delay = min(self._backoff(attempt, error.retry_after), max(0.0, deadline_at - time.monotonic()))
+            log_step("LLM", f"Retrying stream after {error} (attempt {attempt + 1}, sleeping {delay:.2f}s)", "retry")
+            self.stats["retries"] += 1
+            attempt += 1
+            time.sleep(delay)
+
+    def close(self):
+        with self._loop_lock:
+            if self._loop is not None:
+                self._loop.call_soon_threadsafe(self._loop.stop)
+                self._primitives.pop(self._loop, None)
+                self._loop = None
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def build_llm_client(config=None) -> AsyncLLMClient:
+    """Create a client from the `llm` / `llm.client` config sections."""
+    llm_cfg = (config or {}).get("llm", {})
+    settings = llm_cfg.get("client", {})
+    if settings.get("transport", "gemini") == "http":
+        transport = HTTPTransport(settings["base_url"], timeout=settings.get("timeout_seconds", 60))
+    else:
+        api_key = (config or {}).get("env", {}).get("GOOGLE_API_KEY")
+        transport = GeminiTransport(api_key=api_key)
+    return AsyncLLMClient(
+        transport,
+        model=llm_cfg.get("model", "gemini-2.0-flash"),
+        requests_per_minute=settings.get("requests_per_minute", 60),
+        tokens_per_minute=settings.get("tokens_per_minute", 1_000_000),
+        max_concurrency=settings.get("max_concurrency", 8),
+        max_retries=settings.get("max_retries", 4),
+        backoff_base=settings.get("backoff_base_seconds", 1.0),
+        backoff_max=settings.get("backoff_max_seconds", 30.0),
+        timeout=settings.get("timeout_seconds", 60.0),
+        deadline=settings.get("deadline_seconds", 180.0),
+    )
+
+
+def configure_llm_client(config) -> AsyncLLMClient:
+    """Replace the shared client with one built from `config`."""
+    global _client
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+        _client = build_llm_client(config)
+        return _client
+
+
+def get_llm_client() -> AsyncLLMClient:
+    """Return the shared client, creating a default Gemini client on first use."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            from src.utils.config_loader import load_config
+            try:
+                config = load_config()
+            except FileNotFoundError:
+                config = {}
+            _client = build_llm_client(config)
+        return _client
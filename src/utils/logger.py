@@ -1,45 +1,216 @@
+import atexit
+import gzip
 import json
+import queue
+import shutil
+import threading
+import time
 from datetime import datetime
 from pathlib import Path
 
 # === Setup ===
 LOG_DIR = Path("logs")
-LOG_DIR.mkdir(exist_ok=True)
 LOG_FILE = LOG_DIR / "system.log"
 
+LEVELS = {"DEBUG": 10, "INFO": 20, "WARNING": 30, "ERROR": 40}
 
-def _write_log(entry: dict):
-    """Internal helper to append JSON log entries."""
-    with open(LOG_FILE, "a", encoding="utf-8") as f:
-        f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+class BufferedLogWriter:
+    """
+    BufferedLogWriter
+    ------------------
+    Queue-backed background writer for the structured log.
+
+    Callers only enqueue entries. A worker thread serializes them, caps large
+    `details` payloads, and appends them in batches, flushing once
+    `batch_size` entries are queued or `flush_interval` seconds have passed.
+    The file rotates at `max_bytes`, keeping `backup_count` old files
+    (gzip-compressed when `compress` is set).
+    """
+
+    def __init__(self, path=LOG_FILE, batch_size=200, flush_interval=1.0, max_bytes=5 * 1024 * 1024,
+                 backup_count=3, compress=False, max_detail_chars=2000, structured=True):
+        self.path = Path(path)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.compress = compress
+        self.max_detail_chars = max_detail_chars
+        self.structured = structured
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def submit(self, entry: dict):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+                    self._thread.start()
+        self._queue.put(entry)
+
+    def flush(self):
+        """Block until everything submitted so far is on disk."""
+        if self._thread is None:
+            return
+        done = threading.Event()
+        self._queue.put(done)
+        done.wait()
+
+    def close(self):
+        self.flush()
+
+    def _run(self):
+        buffer = []
+        deadline = time.monotonic() + self.flush_interval
+        while True:
+            try:
+                item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                item = None
+            try:
+                if isinstance(item, dict):
+                    try:
+                        buffer.append(self._format(item))
+                    except Exception as e:
+                        print(f"[Logger] Dropped unserializable log entry ({item.get('agent')}, "
+                              f"{item.get('event') or item.get('step')}): {e}")
+                if buffer and (item is None or isinstance(item, threading.Event) or len(buffer) >= self.batch_size):
+                    self._write(buffer)
+                    buffer = []
+            except Exception as e:
+                print(f"[Logger] Dropped a log batch: {e}")
+                buffer = []
+            finally:
+                # A waiting flush() is always released, even if the batch was lost
+                if isinstance(item, threading.Event):
+                    item.set()
+            if item is None or not buffer:
+                deadline = time.monotonic() + self.flush_interval
+
+    def _format(self, entry: dict) -> str:
+        details = entry.get("details")
+        if details is not None and self.max_detail_chars:
+            text = json.dumps(details, ensure_ascii=False, default=str)
+            if len(text) > self.max_detail_chars:
+                entry = {**entry, "details": {
+                    "truncated": True,
+                    "original_chars": len(text),
+                    "keys": list(details)[:20] if isinstance(details, dict) else None,
+                    "preview": text[: self.max_detail_chars],
+                }}
+        if self.structured:
+            return json.dumps(entry, ensure_ascii=False, default=str)
+        fields = [entry.get("timestamp", ""), entry.get("level", ""), entry.get("agent", "")]
+        rest = {k: v for k, v in entry.items() if k not in ("timestamp", "level", "agent")}
+        return " | ".join(fields + [json.dumps(rest, ensure_ascii=False, default=str)])
+
+    def _write(self, lines):
+        try:
+            data = "\n".join(lines) + "\n"
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            if self.max_bytes and self.path.exists() and self.path.stat().st_size + len(data) > self.max_bytes:
+                self._rotate()
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(data)
+        except Exception as e:
+            print(f"[Logger] Failed to write log batch: {e}")
+
+    def _rotate(self):
+        suffix = ".gz" if self.compress else ""
+        for i in range(self.backup_count - 1, 0, -1):
+            src = self.path.with_name(f"{self.path.name}.{i}{suffix}")
+            if src.exists():
+                src.replace(self.path.with_name(f"{self.path.name}.{i + 1}{suffix}"))
+        if self.backup_count <= 0:
+            self.path.unlink()
+            return
+        target = self.path.with_name(f"{self.path.name}.1{suffix}")
+        if self.compress:
+            with open(self.path, "rb") as src, gzip.open(target, "wb") as dst:
+                shutil.copyfileobj(src, dst)
+            self.path.unlink()
+        else:
+            self.path.replace(target)
+
+
+_writer = BufferedLogWriter()
+_level = LEVELS["INFO"]
+atexit.register(lambda: _writer.close())
+
+
+def configure_logging(config):
+    """Apply the `logging` section of config.yaml (level, batching, rotation, payload caps)."""
+    global _writer, _level
+    settings = config.get("logging", {})
+    _writer.close()
+    _level = LEVELS.get(str(settings.get("level", "INFO")).upper(), LEVELS["INFO"])
+    _writer = BufferedLogWriter(
+        path=Path(settings.get("file", LOG_FILE)),
+        batch_size=settings.get("batch_size", 200),
+        flush_interval=settings.get("flush_interval_seconds", 1.0),
+        max_bytes=int(settings.get("max_mb", 5) * 1024 * 1024),
+        backup_count=settings.get("backup_count", 3),
+        compress=settings.get("compress", False),
+        max_detail_chars=settings.get("max_detail_chars", 2000),
+        structured=settings.get("structured", True),
+    )
+    return _writer
+
+
+def flush_logs():
+    """Wait until all queued log entries are written."""
+    _writer.flush()
+
+
+def _snapshot(details):
+    """
+    JSON-safe copy of `details`, taken on the caller's thread: the writer
+    serializes later, and callers keep mutating the dicts they log.
+    """
+    try:
+        return json.loads(json.dumps(details, ensure_ascii=False, default=str))
+    except (TypeError, ValueError) as e:
+        return {"unserializable": True, "error": str(e), "repr": repr(details)[:2000]}
+
+
+def _enabled(level: str) -> bool:
+    return LEVELS.get(level, LEVELS["INFO"]) >= _level
 
 
-def log_event(agent_name: str, event: str, details: dict = None):
+def log_event(agent_name: str, event: str, details: dict = None, level: str = "INFO"):
     """
     Generic event logger for all agents.
     Example:
         log_event("PlannerAgent", "completed", {"steps": 4})
     """
+    if not _enabled(level):
+        return
     entry = {
         "timestamp": datetime.now().isoformat(),
+        "level": level,
         "agent": agent_name,
         "event": event,
-        "details": details or {}
+        "details": _snapshot(details or {})
     }
-    _write_log(entry)
+    _writer.submit(entry)
 
 
-def log_step(agent_name: str, message: str, step: str = None):
+def log_step(agent_name: str, message: str, step: str = None, level: str = "INFO"):
     """
     Step-level logger (used heavily in agents).
     Compatible with existing calls like:
         log_step("CreativeAgent", "Loading data...")
     """
+    if not _enabled(level):
+        return
     entry = {
         "timestamp": datetime.now().isoformat(),
+        "level": level,
         "agent": agent_name,
         "step": step or "default",
         "message": message
     }
-    _write_log(entry)
+    _writer.submit(entry)
     print(f"[{agent_name}] {message}")
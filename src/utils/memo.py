@@ -0,0 +1,148 @@
+"""
+Stage-level memoization for the agent graph.
+
+Each stage's result, and the artifacts it published to the ArtifactSink, are
+stored under a key derived from everything that determines them:
+
+- the stage name and MEMO_VERSION,
+- the config sections the stage reads,
+- the content hashes of its prompt files,
+- the dataset content hash (stages that read the rows),
+- the query (planner only),
+- the fingerprints (output hashes) of its upstream stages.
+
+So with an unchanged CSV and query every stage is a cache hit, and editing
+prompts/creative_prompt.md reruns only the Creative stage and whatever
+consumes its output (the Report). Entries live in a size-bounded SQLite
+store with LRU eviction (LLMCache); `force=True` recomputes every stage and
+refreshes the stored entries.
+"""
+
+import json
+import threading
+from pathlib import Path
+
+from src.utils.fingerprint import dataset_path, digest, env_flag, file_signature
+from src.utils.llm import LLMCache
+from src.utils.logger import log_step
+
+# Bump when a stage's output format changes, to invalidate old entries
+MEMO_VERSION = 1
+
+
+def enabled(config) -> bool:
+    """On unless disabled in config or LLM responses are bypassed (LLM_CACHE_BYPASS=1)."""
+    if env_flag("LLM_CACHE_BYPASS"):
+        return False
+    return config.get("memo", {}).get("enabled", True)
+
+
+class StageMemo:
+    """
+    StageMemo
+    ----------
+    Wraps DAG stage functions so that unchanged stages are served from cache.
+
+        memo = StageMemo.from_config(config, force=False)
+        fn = memo.wrap("insight", run_insight, {"config": ["llm", "prompts"],
+                                                "files": ["prompts/insight_prompt.md"]},
+                       deps=["data"], config=config, sink=sink)
+
+    Input spec keys: "config" (section names), "files" (paths), "data" (True to
+    include the dataset hash), "query", and "store" (False for stages whose
+    output is not JSON; they are always run and fingerprinted by their key).
+    `status` maps each stage to "hit", "miss", "forced" or "uncached".
+    """
+
+    def __init__(self, path=".cache/stage_memo.sqlite", max_bytes=200 * 1024 * 1024, max_entries=2000,
+                 ttl_seconds=30 * 24 * 3600, force=False, dataset_validation="hash"):
+        self.store = LLMCache(path=path, ttl_seconds=ttl_seconds, max_entries=max_entries,
+                              max_bytes=max_bytes, name="Stage memo")
+        self.force = force
+        self.dataset_validation = dataset_validation
+        self.fingerprints = {}
+        self.status = {}
+        self._file_hashes = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config, force: bool = False):
+        settings = config.get("memo", {})
+        return cls(
+            path=settings.get("path", ".cache/stage_memo.sqlite"),
+            max_bytes=int(settings.get("max_mb", 200) * 1024 * 1024),
+            max_entries=settings.get("max_entries", 2000),
+            ttl_seconds=settings.get("ttl_days", 30) * 24 * 3600,
+            force=force,
+            dataset_validation=settings.get("dataset_validation", "hash"),
+        )
+
+    def file_hash(self, path, validation="hash"):
+        """Content hash of `path` (None if missing), computed once per file version."""
+        path = Path(path)
+        try:
+            version = (str(path.resolve()), validation, tuple(sorted(file_signature(path).items())))
+        except OSError:
+            return None
+        with self._lock:
+            if version not in self._file_hashes:
+                self._file_hashes[version] = file_signature(path, validation)
+            return self._file_hashes[version]
+
+    def key(self, stage: str, spec: dict, deps, config) -> str:
+        parts = {
+            "stage": stage,
+            "version": MEMO_VERSION,
+            "query": spec.get("query"),
+            "config": {section: config.get(section) for section in spec.get("config", [])},
+            "files": {str(p): self.file_hash(p) for p in spec.get("files", [])},
+            "data": self.file_hash(dataset_path(config), self.dataset_validation) if spec.get("data") else None,
+            "upstream": {dep: self.fingerprints.get(dep) for dep in deps},
+        }
+        return digest(parts)
+
+    def wrap(self, stage: str, fn, spec: dict, deps, config, sink):
+        """Memoized version of the stage function `fn(inputs)`."""
+        store = spec.get("store", True)
+
+        def run(inputs):
+            key = self.key(stage, spec, deps, config)
+            if not store:
+                self.fingerprints[stage] = key
+                self.status[stage] = "uncached"
+                return fn(inputs)
+
+            if not self.force:
+                cached = self.store.get(key)
+                if cached is not None:
+                    entry = json.loads(cached)
+                    for name, payload in entry["artifacts"].items():
+                        sink.put(name, payload)
+                    self.fingerprints[stage] = entry["fingerprint"]
+                    self.status[stage] = "hit"
+                    log_step("StageMemo", f"{stage}: unchanged inputs, served from cache.", "memo")
+                    return entry["output"]
+
+            with sink.record() as artifacts:
+                output = fn(inputs)
+            self.status[stage] = "forced" if self.force else "miss"
+            try:
+                output_text = json.dumps(output, sort_keys=True, ensure_ascii=False)
+                fingerprint = digest(output_text)
+                self.store.set(key, stage, json.dumps(
+                    {"output": output, "artifacts": artifacts, "fingerprint": fingerprint}, ensure_ascii=False
+                ))
+            except (TypeError, ValueError) as e:
+                log_step("StageMemo", f"{stage}: output not cacheable ({e}).", "memo", level="WARNING")
+                fingerprint = key
+            self.fingerprints[stage] = fingerprint
+            return output
+
+        return run
+
+    def describe(self) -> str:
+        """One line per status, for the end-of-run summary."""
+        groups = {}
+        for stage, status in self.status.items():
+            groups.setdefault(status, []).append(stage)
+        return "; ".join(f"{status}: {', '.join(stages)}" for status, stages in sorted(groups.items()))
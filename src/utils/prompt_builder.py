@@ -0,0 +1,248 @@
+"""
+Token-budgeted prompt assembly.
+
+Prompts used to embed whole summaries with json.dumps(..., indent=2), where a
+large share of the tokens is indentation, quotes and keys repeated on every
+row. PromptBuilder instead renders context compactly:
+
+- lists of records become TSV tables (header once, one line per row),
+- dicts of same-shaped dicts (e.g. per-metric stats) become tables too,
+- other dicts become "key: value" lines, nested blocks indented,
+- floats are rounded and low-value fields (`drop_fields`) are removed.
+
+Sections are added with a priority. When the prompt exceeds the token budget,
+the lowest-priority sections are shrunk first, by cutting their lists (which
+are ranked most-important-first, optionally by `rank_by`) and finally by
+dropping the section. `report` records what was truncated.
+"""
+
+from src.utils.llm_client import estimate_tokens
+
+FLOAT_DIGITS = 4
+
+
+def _scalar(value) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, float):
+        if value != value:
+            return ""
+        rounded = round(value, FLOAT_DIGITS)
+        return str(int(rounded)) if rounded.is_integer() and abs(rounded) < 1e15 else str(rounded)
+    if isinstance(value, dict):
+        return "; ".join(f"{k}={_scalar(v)}" for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return ", ".join(_scalar(v) for v in value)
+    # Cells and lines must stay single-line
+    return str(value).replace("\t", " ").replace("\n", " ")
+
+
+def to_table(rows, columns=None) -> str:
+    """TSV rendering of a list of dicts: a header line, then one line per row."""
+    if columns is None:
+        columns = []
+        for row in rows:
+            columns.extend(k for k in row if k not in columns)
+    lines = ["\t".join(columns)]
+    lines.extend("\t".join(_scalar(row.get(c)) for c in columns) for row in rows)
+    return "\n".join(lines)
+
+
+def _is_records(value) -> bool:
+    return isinstance(value, list) and bool(value) and all(isinstance(v, dict) for v in value)
+
+
+def _is_keyed_records(value) -> bool:
+    """A dict whose values are all dicts with the same keys (rendered as one table)."""
+    if not isinstance(value, dict) or len(value) < 2:
+        return False
+    shapes = {tuple(v) if isinstance(v, dict) else None for v in value.values()}
+    return len(shapes) == 1 and None not in shapes and all(
+        not isinstance(x, (dict, list)) for v in value.values() for x in v.values()
+    )
+
+
+def encode(value, indent: int = 0) -> str:
+    """Compact, line-oriented rendering of a JSON-like value."""
+    pad = "  " * indent
+    if _is_records(value):
+        return "\n".join(pad + line for line in to_table(value).split("\n"))
+    if _is_keyed_records(value):
+        rows = [{"key": k, **v} for k, v in value.items()]
+        return "\n".join(pad + line for line in to_table(rows).split("\n"))
+    if isinstance(value, dict):
+        lines = []
+        for key, item in value.items():
+            if isinstance(item, (dict, list)) and (_is_records(item) or _is_keyed_records(item)
+                                                   or (isinstance(item, dict) and item)):
+                lines.append(f"{pad}{key}:")
+                lines.append(encode(item, indent + 1))
+            else:
+                lines.append(f"{pad}{key}: {_scalar(item)}")
+        return "\n".join(lines)
+    return pad + _scalar(value)
+
+
+def prune(value, drop_fields=(), list_limit=None, rank_by=None, _path="", _cuts=None):
+    """
+    Copy of `value` without `drop_fields` keys and with every list cut to `list_limit` items.
+
+    Lists of dicts that carry `rank_by` are sorted by its absolute value
+    (largest first) before cutting. Cuts are recorded in `_cuts` as
+    {path: [kept, total]}.
+    """
+    if isinstance(value, dict):
+        return {
+            k: prune(v, drop_fields, list_limit, rank_by, f"{_path}.{k}" if _path else k, _cuts)
+            for k, v in value.items() if k not in drop_fields
+        }
+    if isinstance(value, list):
+        items = value
+        if rank_by and _is_records(items) and all(rank_by in v for v in items):
+            items = sorted(items, key=lambda v: -abs(v[rank_by] or 0))
+        if list_limit is not None and len(items) > list_limit:
+            if _cuts is not None:
+                _cuts[_path or "."] = [list_limit, len(items)]
+            items = items[:list_limit]
+        return [prune(v, drop_fields, list_limit, rank_by, f"{_path}[]", _cuts) for v in items]
+    return value
+
+
+def _longest_list(value) -> int:
+    if isinstance(value, dict):
+        return max((_longest_list(v) for v in value.values()), default=0)
+    if isinstance(value, list):
+        return max([len(value)] + [_longest_list(v) for v in value])
+    return 0
+
+
+class _Section:
+    def __init__(self, name, content, priority, required, drop_fields, rank_by, min_items, header):
+        self.name = name
+        self.content = content
+        self.priority = priority
+        self.required = required
+        self.drop_fields = set(drop_fields)
+        self.rank_by = rank_by
+        self.min_items = min_items
+        self.header = header
+        self.list_limit = None
+        self.dropped = False
+        self.cuts = {}
+        self.text = self.render()
+        self.original_tokens = estimate_tokens(self.text)
+
+    def render(self):
+        if isinstance(self.content, str):
+            body = self.content
+        else:
+            self.cuts = {}
+            body = encode(prune(self.content, self.drop_fields, self.list_limit, self.rank_by, _cuts=self.cuts))
+        return f"{self.header}\n{body}" if self.header else body
+
+    @property
+    def tokens(self):
+        return 0 if self.dropped else estimate_tokens(self.text)
+
+    def shrink_to(self, tokens: int) -> bool:
+        """Cut lists to the longest length that fits in `tokens`; False when even `min_items` doesn't fit."""
+        if isinstance(self.content, str):
+            return self.tokens <= tokens
+        longest = _longest_list(self.content)
+        low, high = min(self.min_items, longest), longest
+        self.list_limit = low
+        self.text = self.render()
+        if self.tokens > tokens:
+            return False
+        # Largest limit that still fits
+        while low < high:
+            mid = (low + high + 1) // 2
+            self.list_limit = mid
+            if estimate_tokens(self.render()) <= tokens:
+                low = mid
+            else:
+                high = mid - 1
+        self.list_limit = low
+        self.text = self.render()
+        return True
+
+
+class PromptBuilder:
+    """
+    PromptBuilder
+    --------------
+    Assembles a prompt from prioritized sections within a token budget.
+
+        builder = PromptBuilder(budget_tokens=3000)
+        builder.add("instructions", template, required=True)
+        builder.add("summary", summary, priority=2, drop_fields={"timestamp"}, header="Data Summary:")
+        prompt = builder.build()
+        builder.report   # tokens per section and what was cut
+
+    Required sections are never shrunk. `budget_tokens=None` disables the budget
+    (content is still rendered compactly).
+    """
+
+    def __init__(self, budget_tokens=None, drop_fields=()):
+        self.budget_tokens = budget_tokens
+        self.drop_fields = set(drop_fields)
+        self.sections = []
+        self.report = {}
+
+    def add(self, name, content, priority: int = 0, required: bool = False, drop_fields=(),
+            rank_by=None, min_items: int = 1, header=None):
+        """Add a section: a string (kept verbatim) or a JSON-like value (rendered compactly)."""
+        if name in self.drop_fields and not required:
+            return self
+        self.sections.append(_Section(name, content, priority, required,
+                                      self.drop_fields | set(drop_fields), rank_by, min_items, header))
+        return self
+
+    def _total(self):
+        # Sections are joined by blank lines (about one token each)
+        return sum(s.tokens for s in self.sections) + max(len(self.sections) - 1, 0)
+
+    def build(self) -> str:
+        """Pack the sections into the budget and return the prompt text (in insertion order)."""
+        budget = self.budget_tokens
+        if budget is not None and self._total() > budget:
+            # Least important first; later additions of equal priority go first
+            order = sorted((s for s in self.sections if not s.required),
+                           key=lambda s: (s.priority, -self.sections.index(s)))
+            for section in order:
+                overflow = self._total() - budget
+                if overflow <= 0:
+                    break
+                if not section.shrink_to(section.tokens - overflow):
+                    section.dropped = True
+
+        prompt = "\n\n".join(s.text for s in self.sections if not s.dropped)
+        tokens = estimate_tokens(prompt)
+        self.report = {
+            "budget_tokens": budget,
+            "tokens": tokens,
+            "original_tokens": sum(s.original_tokens for s in self.sections),
+            "truncated": any(s.dropped or s.cuts for s in self.sections),
+            "sections": [
+                {
+                    "name": s.name,
+                    "tokens": s.tokens,
+                    "original_tokens": s.original_tokens,
+                    **({"dropped": True} if s.dropped else {}),
+                    **({"cut_lists": s.cuts} if s.cuts and not s.dropped else {}),
+                }
+                for s in self.sections
+            ],
+        }
+        return prompt
+
+    def describe(self) -> str:
+        """One-line summary of the last build, for logs."""
+        report = self.report
+        cut = [s["name"] for s in report.get("sections", []) if s.get("dropped") or s.get("cut_lists")]
+        note = f"; truncated: {', '.join(cut)}" if cut else ""
+        budget = report.get("budget_tokens")
+        return (f"~{report.get('tokens')} tokens (from ~{report.get('original_tokens')}"
+                f"{f', budget {budget}' if budget else ''}){note}")
@@ -0,0 +1,111 @@
+"""
+Cache of finished pipeline runs, for the CLI fast path.
+
+A completed run's artifacts (data_summary.json, insights.json, ..., report.md)
+are stored under a key built from the normalized query, the data file
+signature, the prompt template hashes and a digest of the config. When the same query is asked again
+against the same data and config, the CLI restores those artifacts into
+reports/ without importing pandas, the agents or the LLM client.
+
+This module must stay free of heavy imports; it runs before them.
+"""
+
+import json
+from pathlib import Path
+
+from src.utils.fingerprint import dataset_path, digest, env_flag, file_signature, prompt_hashes
+
+# Settings that do not change a run's results
+IGNORED_CONFIG_SECTIONS = {"env", "logging", "tracing", "batch", "service", "report_cache"}
+
+
+def normalize_query(query: str) -> str:
+    return " ".join(str(query).lower().split())
+
+
+def enabled(config) -> bool:
+    """On unless disabled in config; a bypassed LLM cache implies fresh answers, so this is bypassed too."""
+    settings = config.get("report_cache", {})
+    if env_flag("REPORT_CACHE_BYPASS") or env_flag("LLM_CACHE_BYPASS"):
+        return False
+    return settings.get("enabled", True)
+
+
+class ReportCache:
+    """
+    ReportCache
+    ------------
+    One directory per cached run: the artifacts plus a manifest.json.
+
+        cache = ReportCache(".cache/reports")
+        key = cache.key(query, config)
+        if cache.restore(key, "reports"):    # fast path
+            ...
+        cache.store(key, sink.artifacts, query=query)
+    """
+
+    def __init__(self, cache_dir=".cache/reports"):
+        self.cache_dir = Path(cache_dir)
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(config.get("report_cache", {}).get("dir", ".cache/reports"))
+
+    @staticmethod
+    def key(query: str, config) -> str | None:
+        """Cache key for `query` over the configured data and prompts (None if the data file is missing)."""
+        try:
+            signature = file_signature(dataset_path(config))
+        except (OSError, KeyError):
+            return None
+        prompts = prompt_hashes(config["paths"].get("prompts", "prompts"))
+        settings = {k: v for k, v in config.items() if k not in IGNORED_CONFIG_SECTIONS}
+        return digest(normalize_query(query), signature, prompts, settings)[:32]
+
+    def lookup(self, key):
+        """The manifest of a complete cached run, or None."""
+        if key is None:
+            return None
+        manifest_path = self.cache_dir / key / "manifest.json"
+        try:
+            manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+        if not all((self.cache_dir / key / name).exists() for name in manifest.get("artifacts", [])):
+            return None
+        return manifest
+
+    def restore(self, key, output_dir) -> list:
+        """Copy a cached run's artifacts into `output_dir`; returns the written paths ([] on a miss)."""
+        manifest = self.lookup(key)
+        if manifest is None:
+            return []
+        output_dir = Path(output_dir)
+        output_dir.mkdir(parents=True, exist_ok=True)
+        written = []
+        for name in manifest["artifacts"]:
+            target = output_dir / name
+            target.write_bytes((self.cache_dir / key / name).read_bytes())
+            written.append(target)
+        return written
+
+    def store(self, key, artifacts: dict, query: str = "", compact: bool = False):
+        """Save a finished run's artifacts (name -> dict/list/str) under `key`."""
+        if key is None:
+            return
+        run_dir = self.cache_dir / key
+        try:
+            run_dir.mkdir(parents=True, exist_ok=True)
+            for name, payload in artifacts.items():
+                if isinstance(payload, str):
+                    text = payload
+                elif compact:
+                    text = json.dumps(payload, ensure_ascii=False, separators=(",", ":"))
+                else:
+                    text = json.dumps(payload, indent=2, ensure_ascii=False)
+                (run_dir / name).write_text(text, encoding="utf-8")
+            # The manifest goes last, so a half-written entry is never served
+            manifest = {"query": query, "artifacts": sorted(artifacts)}
+            (run_dir / "manifest.json").write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+        except (OSError, TypeError) as e:
+            print(f"[ReportCache] Could not store run: {e}")
@@ -0,0 +1,318 @@
+"""
+Segment cube for attributing a ROAS change to dimension segments.
+
+Rows are reduced in one pass to the finest cells (every dimension plus the
+day) using categorical codes and a mixed-radix integer key, with spend and
+revenue summed per cell by np.bincount. After a period split, all 63
+group-by combinations of the six dimensions are rolled up from those cells,
+never from the raw rows again.
+
+The contribution of a segment to the change in overall spend-weighted ROAS is
+
+    R2_seg / S2_total - R1_seg / S1_total
+
+(R = revenue, S = spend, 1 = baseline period, 2 = current period). Summed over
+the segments of any single grouping it equals the total change exactly. It is
+further split into a rate effect (the segment's own ROAS moved) and a mix
+effect (its share of spend moved), which add up to the contribution.
+"""
+
+from itertools import combinations
+
+import numpy as np
+import pandas as pd
+
+DIMENSIONS = ["campaign_name", "adset_name", "creative_type", "audience_type", "platform", "country"]
+UNKNOWN = "Unknown"
+# Above this many possible cells a chunk is hashed instead of bincounted densely
+MAX_DENSE_CELLS = 4_000_000
+
+
+def radix_key(codes, cardinalities) -> np.ndarray:
+    """Mixed-radix int64 key of several code arrays (the first array varies slowest)."""
+    if np.prod([float(c) for c in cardinalities]) >= 2 ** 62:
+        raise ValueError("Segment cube key space does not fit in int64; use fewer dimensions.")
+    key = np.zeros(len(codes[0]), dtype="int64")
+    for values, card in zip(codes, cardinalities):
+        key *= card
+        key += values
+    return key
+
+
+def decode_key(key, cardinalities) -> list:
+    codes = []
+    for card in reversed(cardinalities):
+        codes.append(key % card)
+        key = key // card
+    return codes[::-1]
+
+
+def encode_levels(levels: dict, column: pd.Series) -> np.ndarray:
+    """
+    Integer codes of `column` in a growing {label: code} dictionary shared across
+    chunks (missing values -> UNKNOWN). Categorical columns are mapped via their codes.
+    """
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        local_codes = column.cat.codes.to_numpy()
+        local_levels = column.cat.categories
+    else:
+        local_codes, local_levels = pd.factorize(column)
+    mapping = np.array(
+        [levels.setdefault(str(level), len(levels)) for level in local_levels] + [0], dtype="int64"
+    )
+    if (local_codes < 0).any():
+        mapping[-1] = levels.setdefault(UNKNOWN, len(levels))
+    return mapping[local_codes]
+
+
+def _round(value, digits=4):
+    return None if value is None or not np.isfinite(value) else round(float(value), digits)
+
+
+class SegmentCube:
+    """
+    SegmentCube
+    ------------
+    Mergeable spend/revenue cube over categorical dimensions and days.
+
+    Feed it frames with `update` (a whole dataset or chunks of one), then read
+    `rollup(dims)` for one grouping or `drivers()` for the ranked attribution
+    that goes into the data summary.
+    """
+
+    def __init__(self, dimensions=None, split_date=None):
+        self.dimensions = list(dimensions or DIMENSIONS)
+        self.split_date = split_date
+        self._levels = {dim: {} for dim in self.dimensions}
+        self._days = {}
+        self._partials = []
+        self._cells = None
+        self.rows = 0
+
+    # ------------------------------------------------------------------ ingest
+    def update(self, frame: pd.DataFrame):
+        """Fold a frame into per-(cell, day) spend/revenue sums."""
+        dates = frame["date"]
+        if not pd.api.types.is_datetime64_any_dtype(dates):
+            dates = pd.to_datetime(dates, errors="coerce")
+        days = dates.to_numpy().astype("datetime64[D]")
+        spend = frame["spend"].to_numpy(dtype="float64", na_value=np.nan)
+        revenue = frame["revenue"].to_numpy(dtype="float64", na_value=np.nan)
+        # Spend-weighted ROAS needs both sides of the ratio
+        undated = np.isnat(days)
+        valid = ~undated & np.isfinite(spend) & np.isfinite(revenue)
+        rows = int(valid.sum())
+        if rows == 0:
+            return self
+        if undated.any():
+            keep = ~undated
+            frame, days, spend, revenue, valid = frame[keep], days[keep], spend[keep], revenue[keep], valid[keep]
+        if rows < len(valid):
+            # Zero-weight incomplete rows instead of copying every code array
+            spend = np.where(valid, spend, 0.0)
+            revenue = np.where(valid, revenue, 0.0)
+
+        codes = [encode_levels(self._levels[dim], frame[dim]) for dim in self.dimensions]
+        day_codes, day_values = pd.factorize(days.view("int64"))
+        day_map = np.array([self._days.setdefault(int(d), len(self._days)) for d in day_values], dtype="int64")
+        codes.append(day_map[day_codes])
+
+        cards = [len(self._levels[dim]) for dim in self.dimensions] + [len(self._days)]
+        key = radix_key(codes, cards)
+        if np.prod([float(c) for c in cards]) <= MAX_DENSE_CELLS:
+            size = int(np.prod(cards))
+            spend_sum = np.bincount(key, weights=spend, minlength=size)
+            revenue_sum = np.bincount(key, weights=revenue, minlength=size)
+            count = np.bincount(key, weights=valid, minlength=size)
+            cells = np.flatnonzero(count)
+            spend_sum, revenue_sum = spend_sum[cells], revenue_sum[cells]
+        else:
+            inverse, cells = pd.factorize(key)
+            spend_sum = np.bincount(inverse, weights=spend)
+            revenue_sum = np.bincount(inverse, weights=revenue)
+
+        self._partials.append((np.stack(decode_key(cells, cards), axis=1), spend_sum, revenue_sum))
+        self._cells = None
+        self.rows += rows
+        return self
+
+    # ---------------------------------------------------------------- periods
+    def _finalize(self):
+        """Collapse the per-day partials into per-cell baseline/current totals."""
+        if self._cells is not None:
+            return self._cells
+        if not self._partials:
+            self._cells = None
+            return None
+
+        codes = np.concatenate([p[0] for p in self._partials])
+        spend = np.concatenate([p[1] for p in self._partials])
+        revenue = np.concatenate([p[2] for p in self._partials])
+        if len(self._partials) > 1:
+            # Chunks overlap in (cell, day); merge them so the cube stays compact
+            cards = [len(self._levels[d]) for d in self.dimensions] + [len(self._days)]
+            inverse, uniques = pd.factorize(radix_key(list(codes.T), cards))
+            codes = np.stack(decode_key(uniques, cards), axis=1)
+            spend = np.bincount(inverse, weights=spend)
+            revenue = np.bincount(inverse, weights=revenue)
+            self._partials = [(codes, spend, revenue)]
+
+        day_values = np.empty(len(self._days), dtype="int64")
+        for day, code in self._days.items():
+            day_values[code] = day
+        cell_days = day_values[codes[:, -1]]
+        sorted_days = np.unique(day_values)
+        if self.split_date is not None:
+            split = np.datetime64(pd.Timestamp(self.split_date).date(), "D").astype("int64")
+        else:
+            # Baseline = first half of the observed days, current = second half
+            split = sorted_days[len(sorted_days) // 2]
+        current = cell_days >= split
+
+        dims = len(self.dimensions)
+        cards = [len(self._levels[d]) for d in self.dimensions]
+        inverse, uniques = pd.factorize(radix_key(list(codes[:, :dims].T), cards))
+        n = len(uniques)
+        self._cells = {
+            "codes": np.stack(decode_key(uniques, cards), axis=1) if n else np.zeros((0, dims), dtype="int64"),
+            "spend": np.stack([np.bincount(inverse, weights=np.where(current, 0, spend), minlength=n),
+                               np.bincount(inverse, weights=np.where(current, spend, 0), minlength=n)]),
+            "revenue": np.stack([np.bincount(inverse, weights=np.where(current, 0, revenue), minlength=n),
+                                 np.bincount(inverse, weights=np.where(current, revenue, 0), minlength=n)]),
+            "split": str(np.datetime64(int(split), "D")),
+            "periods": [
+                [str(np.datetime64(int(sorted_days[0]), "D")), str(np.datetime64(int(split) - 1, "D"))],
+                [str(np.datetime64(int(split), "D")), str(np.datetime64(int(sorted_days[-1]), "D"))],
+            ],
+        }
+        return self._cells
+
+    def totals(self) -> dict:
+        cells = self._finalize()
+        if cells is None:
+            return {}
+        spend = cells["spend"].sum(axis=1)
+        revenue = cells["revenue"].sum(axis=1)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            roas = revenue / spend
+        return {"spend": spend, "revenue": revenue, "roas": roas}
+
+    # ---------------------------------------------------------------- rollups
+    ROLLUP_FIELDS = ["spend_base", "spend_cur", "revenue_base", "revenue_cur",
+                     "roas_base", "roas_cur", "contribution", "rate_effect", "mix_effect"]
+
+    def _rollup_arrays(self, dims):
+        """(per-dimension level codes, {field: array}) for one grouping, or None when empty."""
+        cells = self._finalize()
+        if cells is None or not len(cells["codes"]):
+            return None
+        idx = [self.dimensions.index(d) for d in dims]
+        cards = [len(self._levels[d]) for d in dims]
+        if dims:
+            inverse, uniques = pd.factorize(radix_key([cells["codes"][:, i] for i in idx], cards))
+        else:
+            inverse, uniques = np.zeros(len(cells["codes"]), dtype="int64"), np.zeros(1, dtype="int64")
+        n = len(uniques)
+        spend = [np.bincount(inverse, weights=cells["spend"][p], minlength=n) for p in (0, 1)]
+        revenue = [np.bincount(inverse, weights=cells["revenue"][p], minlength=n) for p in (0, 1)]
+
+        totals = self.totals()
+        with np.errstate(divide="ignore", invalid="ignore"):
+            contribution = (revenue[1] / totals["spend"][1]) - (revenue[0] / totals["spend"][0])
+            roas_base = revenue[0] / spend[0]
+            roas_cur = revenue[1] / spend[1]
+            share_base = spend[0] / totals["spend"][0]
+            share_cur = spend[1] / totals["spend"][1]
+        # A segment absent from one period has no rate change, only mix
+        r1 = np.where(np.isfinite(roas_base), roas_base, np.nan_to_num(roas_cur))
+        r2 = np.where(np.isfinite(roas_cur), roas_cur, r1)
+        values = {
+            "spend_base": spend[0], "spend_cur": spend[1],
+            "revenue_base": revenue[0], "revenue_cur": revenue[1],
+            "roas_base": roas_base, "roas_cur": roas_cur, "contribution": contribution,
+            "rate_effect": (share_base + share_cur) / 2 * (r2 - r1),
+            "mix_effect": (r1 + r2) / 2 * (share_cur - share_base),
+        }
+        return decode_key(uniques, cards), values
+
+    def _label(self, dim, code):
+        return list(self._levels[dim])[code]
+
+    def rollup(self, dims) -> pd.DataFrame:
+        """Baseline/current spend, revenue, ROAS and contribution for one grouping."""
+        dims = list(dims)
+        result = self._rollup_arrays(dims)
+        if result is None:
+            return pd.DataFrame(columns=dims + self.ROLLUP_FIELDS)
+        codes, values = result
+        out = {dim: np.array(list(self._levels[dim]), dtype=object)[c] for dim, c in zip(dims, codes)}
+        out.update(values)
+        return pd.DataFrame(out, columns=dims + self.ROLLUP_FIELDS)
+
+    def groupings(self, max_depth=None):
+        """All non-empty dimension subsets (63 for six dimensions), coarsest first."""
+        depth = len(self.dimensions) if max_depth is None else min(max_depth, len(self.dimensions))
+        for k in range(1, depth + 1):
+            yield from combinations(self.dimensions, k)
+
+    def drivers(self, top_k: int = 10, min_spend_share: float = 0.01, per_dimension: int = 3,
+                max_depth=None) -> dict:
+        """
+        Segments ranked by contribution to the overall ROAS change, across every grouping.
+
+        Only segments moving in the same direction as the total are ranked, and
+        segments below `min_spend_share` of total spend are ignored as noise.
+        `by_dimension` lists the leading segments of each single dimension.
+        Selection stays in numpy; records are only built for the segments kept.
+        """
+        cells = self._finalize()
+        if cells is None:
+            return {}
+        totals = self.totals()
+        change = float(totals["roas"][1] - totals["roas"][0])
+        direction = -1.0 if change < 0 else 1.0
+        total_spend = float(totals["spend"].sum())
+
+        # (signed contribution, depth, dims, codes, values, row) for each grouping's best segments
+        candidates, by_dimension = [], {}
+        for dims in self.groupings(max_depth):
+            codes, values = self._rollup_arrays(list(dims))
+            share = (values["spend_base"] + values["spend_cur"]) / total_spend if total_spend else 0.0
+            values["spend_share"] = np.broadcast_to(share, values["contribution"].shape)
+            score = values["contribution"] * direction
+            keep = np.flatnonzero((values["spend_share"] >= min_spend_share) & (score > 0))
+            best = keep[np.argsort(-score[keep], kind="stable")][:max(top_k, per_dimension)]
+            if len(dims) == 1:
+                by_dimension[dims[0]] = [self._segment_record(dims, codes, values, i, change)
+                                         for i in best[:per_dimension]]
+            candidates.extend((score[i], len(dims), dims, codes, values, i) for i in best[:top_k])
+
+        candidates.sort(key=lambda c: (-c[0], c[1]))
+        top_segments = [self._segment_record(dims, codes, values, i, change)
+                        for _, _, dims, codes, values, i in candidates[:top_k]]
+
+        return {
+            "split_date": cells["split"],
+            "baseline_period": cells["periods"][0],
+            "current_period": cells["periods"][1],
+            "baseline_roas": _round(totals["roas"][0]),
+            "current_roas": _round(totals["roas"][1]),
+            "roas_change": _round(change),
+            "top_segments": top_segments,
+            "by_dimension": by_dimension,
+        }
+
+    def _segment_record(self, dims, codes, values, i, change) -> dict:
+        contribution = values["contribution"][i]
+        return {
+            "segment": {dim: self._label(dim, c[i]) for dim, c in zip(dims, codes)},
+            "contribution": _round(contribution),
+            "rate_effect": _round(values["rate_effect"][i]),
+            "mix_effect": _round(values["mix_effect"][i]),
+            "share_of_change": _round(contribution / change) if change else None,
+            "spend_share": _round(values["spend_share"][i]),
+            "baseline_roas": _round(values["roas_base"][i]),
+            "current_roas": _round(values["roas_cur"][i]),
+            "baseline_spend": _round(values["spend_base"][i], 2),
+            "current_spend": _round(values["spend_cur"][i], 2),
+        }
@@ -0,0 +1,298 @@
+"""
+Mergeable, bounded-memory aggregates for summarizing datasets chunk by chunk.
+
+Every accumulator here supports `update` (fold in a new batch of rows) and
+`merge` (combine two partial results), so a file can be summarized from any
+iterator of DataFrames and partial results can be combined in any order.
+"""
+
+import numpy as np
+import pandas as pd
+
+from src.utils.timeseries import COMPONENTS, daily_totals
+
+
+class RunningStats:
+    """
+    RunningStats
+    -------------
+    Count / sum / centred sum of squares / min / max of a numeric column.
+    Uses Chan's parallel update so that merged variances stay numerically stable.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+
+    @property
+    def sum(self):
+        return self.mean * self.count
+
+    @property
+    def std(self):
+        """Sample standard deviation (ddof=1, as in DataFrame.describe)."""
+        return float(np.sqrt(self.m2 / (self.count - 1))) if self.count > 1 else float("nan")
+
+    def update(self, values):
+        values = np.asarray(values, dtype="float64")
+        values = values[~np.isnan(values)]
+        if values.size == 0:
+            return self
+        other = RunningStats()
+        other.count = int(values.size)
+        other.mean = float(values.mean())
+        other.m2 = float(((values - other.mean) ** 2).sum())
+        other.min = float(values.min())
+        other.max = float(values.max())
+        return self.merge(other)
+
+    def merge(self, other: "RunningStats"):
+        if other.count == 0:
+            return self
+        total = self.count + other.count
+        delta = other.mean - self.mean
+        self.m2 += other.m2 + delta * delta * self.count * other.count / total
+        self.mean += delta * other.count / total
+        self.count = total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    def to_dict(self):
+        return {"count": self.count, "mean": self.mean, "m2": self.m2,
+                "min": self.min if self.count else None, "max": self.max if self.count else None}
+
+    @classmethod
+    def from_dict(cls, data):
+        stats = cls()
+        stats.count, stats.mean, stats.m2 = data["count"], data["mean"], data["m2"]
+        if stats.count:
+            stats.min, stats.max = data["min"], data["max"]
+        return stats
+
+
+class QuantileSketch:
+    """
+    QuantileSketch
+    ---------------
+    A small KLL-style quantile sketch. Items live in levels; an item on level i
+    stands for 2**i original values. When a level grows past `capacity` it is
+    sorted and every other item is promoted to the next level, so memory stays
+    O(capacity * log(n)). Quantiles are exact until the first compaction.
+    """
+
+    def __init__(self, capacity: int = 2048, seed: int = 0):
+        self.capacity = capacity
+        self.levels = [np.empty(0)]
+        self._rng = np.random.default_rng(seed)
+
+    def update(self, values):
+        values = np.asarray(values, dtype="float64")
+        values = values[~np.isnan(values)]
+        if values.size:
+            self.levels[0] = np.concatenate([self.levels[0], values])
+            self._compress()
+        return self
+
+    def merge(self, other: "QuantileSketch"):
+        for level, items in enumerate(other.levels):
+            if level == len(self.levels):
+                self.levels.append(np.empty(0))
+            self.levels[level] = np.concatenate([self.levels[level], items])
+        self._compress()
+        return self
+
+    def _compress(self):
+        level = 0
+        while level < len(self.levels):
+            items = self.levels[level]
+            if items.size > self.capacity:
+                items = np.sort(items)
+                keep = items[: items.size % 2]
+                promoted = items[keep.size:][int(self._rng.integers(2))::2]
+                self.levels[level] = keep
+                if level + 1 == len(self.levels):
+                    self.levels.append(np.empty(0))
+                self.levels[level + 1] = np.concatenate([self.levels[level + 1], promoted])
+            level += 1
+
+    def quantile(self, q: float):
+        if len(self.levels) == 1 or all(items.size == 0 for items in self.levels[1:]):
+            items = self.levels[0]
+            return float(np.quantile(items, q)) if items.size else float("nan")
+
+        items = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(lvl.size, 2.0 ** i) for i, lvl in enumerate(self.levels)])
+        order = np.argsort(items, kind="stable")
+        items, weights = items[order], weights[order]
+        # Centre each item on its weight and interpolate linearly between centres
+        centres = (np.cumsum(weights) - weights / 2) / weights.sum()
+        return float(np.interp(q, centres, items))
+
+    def to_dict(self):
+        return {"capacity": self.capacity, "levels": [items.tolist() for items in self.levels]}
+
+    @classmethod
+    def from_dict(cls, data, seed: int = 0):
+        sketch = cls(capacity=data["capacity"], seed=seed)
+        sketch.levels = [np.asarray(items, dtype="float64") for items in data["levels"]] or [np.empty(0)]
+        return sketch
+
+
+class MetricsAccumulator:
+    """
+    MetricsAccumulator
+    -------------------
+    Everything DataAgent.summarize_metrics needs, as mergeable partials:
+    describe()-style stats per metric, per-date ROAS sums/counts, per-date
+    ROAS/CTR/CPM components (see timeseries.COMPONENTS) and the distinct set
+    of low-CTR campaigns (in order of first appearance).
+    """
+
+    QUANTILES = (0.25, 0.5, 0.75)
+
+    def __init__(self, numeric_cols, low_ctr_threshold: float, sketch_capacity: int = 2048):
+        self.numeric_cols = list(numeric_cols)
+        self.low_ctr_threshold = low_ctr_threshold
+        self.rows = 0
+        self.stats = {col: RunningStats() for col in self.numeric_cols}
+        self.sketches = {col: QuantileSketch(sketch_capacity) for col in self.numeric_cols}
+        self.date_roas = {}
+        self.date_totals = {}
+        self.low_ctr_campaigns = {}
+        self.low_ctr_has_missing_campaign = False
+        self.low_ctr_rows = 0
+        self.low_ctr_ctr = RunningStats()
+        self.low_ctr_roas = RunningStats()
+
+    def update(self, df: pd.DataFrame):
+        self.rows += len(df)
+        for col in self.numeric_cols:
+            values = df[col].to_numpy(dtype="float64", na_value=np.nan)
+            self.stats[col].update(values)
+            self.sketches[col].update(values)
+
+        dates = df["date"]
+        if not pd.api.types.is_datetime64_any_dtype(dates):
+            dates = pd.to_datetime(dates, errors="coerce")
+        per_date = df["roas"].astype("float64").groupby(dates.rename("date")).agg(["sum", "count"])
+        for date, total, count in zip(per_date.index, per_date["sum"], per_date["count"]):
+            key = date.strftime("%Y-%m-%d")
+            prev = self.date_roas.get(key, (0.0, 0))
+            self.date_roas[key] = (prev[0] + float(total), prev[1] + int(count))
+        self._add_totals(daily_totals(df))
+
+        low = df[df["ctr"] < self.low_ctr_threshold]
+        self.low_ctr_rows += len(low)
+        self.low_ctr_ctr.update(low["ctr"].to_numpy(dtype="float64", na_value=np.nan))
+        self.low_ctr_roas.update(low["roas"].to_numpy(dtype="float64", na_value=np.nan))
+        for name in pd.unique(low["campaign_name"].astype(object)):
+            if pd.isna(name):
+                self.low_ctr_has_missing_campaign = True
+            else:
+                self.low_ctr_campaigns.setdefault(name, None)
+        return self
+
+    def merge(self, other: "MetricsAccumulator"):
+        self.rows += other.rows
+        for col in self.numeric_cols:
+            self.stats[col].merge(other.stats[col])
+            self.sketches[col].merge(other.sketches[col])
+        for key, (total, count) in other.date_roas.items():
+            prev = self.date_roas.get(key, (0.0, 0))
+            self.date_roas[key] = (prev[0] + total, prev[1] + count)
+        for key, values in other.date_totals.items():
+            prev = self.date_totals.get(key, [0.0] * len(COMPONENTS))
+            self.date_totals[key] = [a + b for a, b in zip(prev, values)]
+        for name in other.low_ctr_campaigns:
+            self.low_ctr_campaigns.setdefault(name, None)
+        self.low_ctr_has_missing_campaign |= other.low_ctr_has_missing_campaign
+        self.low_ctr_rows += other.low_ctr_rows
+        self.low_ctr_ctr.merge(other.low_ctr_ctr)
+        self.low_ctr_roas.merge(other.low_ctr_roas)
+        return self
+
+    def to_dict(self):
+        """JSON-serializable form, used to persist per-date partials."""
+        return {
+            "rows": self.rows,
+            "stats": {col: self.stats[col].to_dict() for col in self.numeric_cols},
+            "sketches": {col: self.sketches[col].to_dict() for col in self.numeric_cols},
+            "date_roas": {key: list(value) for key, value in self.date_roas.items()},
+            "date_totals": self.date_totals,
+            "low_ctr_campaigns": list(self.low_ctr_campaigns),
+            "low_ctr_has_missing_campaign": self.low_ctr_has_missing_campaign,
+            "low_ctr_rows": self.low_ctr_rows,
+            "low_ctr_ctr": self.low_ctr_ctr.to_dict(),
+            "low_ctr_roas": self.low_ctr_roas.to_dict(),
+        }
+
+    @classmethod
+    def from_dict(cls, data, low_ctr_threshold: float):
+        acc = cls(list(data["stats"]), low_ctr_threshold)
+        acc.rows = data["rows"]
+        acc.stats = {col: RunningStats.from_dict(v) for col, v in data["stats"].items()}
+        acc.sketches = {col: QuantileSketch.from_dict(v) for col, v in data["sketches"].items()}
+        acc.date_roas = {key: tuple(value) for key, value in data["date_roas"].items()}
+        acc.date_totals = {key: list(value) for key, value in data.get("date_totals", {}).items()}
+        acc.low_ctr_campaigns = dict.fromkeys(data["low_ctr_campaigns"])
+        acc.low_ctr_has_missing_campaign = data["low_ctr_has_missing_campaign"]
+        acc.low_ctr_rows = data["low_ctr_rows"]
+        acc.low_ctr_ctr = RunningStats.from_dict(data["low_ctr_ctr"])
+        acc.low_ctr_roas = RunningStats.from_dict(data["low_ctr_roas"])
+        return acc
+
+    def describe(self):
+        """Same layout as DataFrame.describe().to_dict() (approximate quartiles)."""
+        described = {}
+        for col in self.numeric_cols:
+            stats, sketch = self.stats[col], self.sketches[col]
+            empty = stats.count == 0
+            described[col] = {
+                "count": float(stats.count),
+                "mean": float("nan") if empty else stats.mean,
+                "std": stats.std,
+                "min": float("nan") if empty else stats.min,
+                **{f"{int(q * 100)}%": sketch.quantile(q) for q in self.QUANTILES},
+                "max": float("nan") if empty else stats.max,
+            }
+        return described
+
+    def daily_roas(self) -> pd.Series:
+        """Mean ROAS per date, sorted by date."""
+        if not self.date_roas:
+            return pd.Series(dtype="float64")
+        keys = sorted(self.date_roas)
+        return pd.Series(
+            [self.date_roas[k][0] / self.date_roas[k][1] if self.date_roas[k][1] else np.nan for k in keys],
+            index=pd.to_datetime(keys),
+        )
+
+    def _add_totals(self, daily: pd.DataFrame):
+        for date, values in zip(daily.index, daily.to_numpy()):
+            key = date.strftime("%Y-%m-%d")
+            prev = self.date_totals.get(key, [0.0] * len(COMPONENTS))
+            self.date_totals[key] = [a + float(b) for a, b in zip(prev, values)]
+
+    def daily_totals(self) -> pd.DataFrame:
+        """Per-date ROAS/CTR/CPM components, sorted by date (same layout as timeseries.daily_totals)."""
+        keys = sorted(self.date_totals)
+        return pd.DataFrame([self.date_totals[k] for k in keys], index=pd.to_datetime(keys),
+                            columns=COMPONENTS, dtype="float64")
+
+    def low_ctr_summary(self):
+        """Same block as the in-memory low-CTR filter produces."""
+        def average(stats):
+            if not self.low_ctr_rows:
+                return None
+            return round(stats.mean, 4) if stats.count else float("nan")
+
+        return {
+            "count": len(self.low_ctr_campaigns) + int(self.low_ctr_has_missing_campaign),
+            "avg_ctr": average(self.low_ctr_ctr),
+            "avg_roas": average(self.low_ctr_roas),
+            "sample_campaigns": list(self.low_ctr_campaigns)[:5],
+        }
@@ -0,0 +1,186 @@
+"""
+Synthetic ad-export generator.
+
+Fits a small profile to the sample dataset (joint frequencies of the
+categorical columns, log-normal spend / impressions / conversion rate / order
+value, a truncated-normal CTR, missing-value rates and the date range) and
+draws any number of rows from it. Rows are produced in fixed-size blocks, each
+with its own generator seeded from (seed, block index), so the output for a
+given seed is identical whether it is built in memory or streamed to disk.
+
+Usage:
+    python -m src.utils.synthetic_data --rows 1000000
+    python -m src.utils.synthetic_data --rows 50000000 --out data/fb_ads_50m.csv
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# Columns whose joint distribution is resampled from the sample as whole tuples
+PROFILE_COLUMNS = [
+    "campaign_name", "adset_name", "creative_type", "creative_message",
+    "audience_type", "platform", "country",
+]
+OUTPUT_COLUMNS = [
+    "campaign_name", "adset_name", "date", "spend", "impressions", "clicks", "ctr",
+    "purchases", "revenue", "roas", "creative_type", "creative_message",
+    "audience_type", "platform", "country",
+]
+# Rows per independently seeded block; fixed so chunked and in-memory output match
+BLOCK_ROWS = 1_000_000
+
+
+def _log_normal(values) -> list:
+    """[mu, sigma] of log(values) over the finite, positive entries."""
+    values = np.asarray(values, dtype="float64")
+    logs = np.log(values[np.isfinite(values) & (values > 0)])
+    return [float(logs.mean()), float(logs.std())]
+
+
+def fit_profile(sample: pd.DataFrame) -> dict:
+    """Summarize a sample export into the JSON-serializable profile the generator draws from."""
+    sample = sample.copy()
+    sample.columns = [c.lower() for c in sample.columns]
+
+    tuples = sample[PROFILE_COLUMNS].astype(str).value_counts(sort=False)
+    dates = pd.to_datetime(sample["date"], errors="coerce").dropna()
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cvr = (sample["purchases"] / sample["clicks"]).to_numpy()
+        aov = (sample["revenue"] / sample["purchases"]).to_numpy()
+
+    ctr = sample["ctr"].dropna()
+    return {
+        "categories": {
+            "columns": PROFILE_COLUMNS,
+            "tuples": [list(t) for t in tuples.index],
+            "weights": (tuples.to_numpy() / tuples.sum()).tolist(),
+        },
+        "metrics": {
+            "log_spend": _log_normal(sample["spend"]),
+            "log_impressions": _log_normal(sample["impressions"]),
+            "ctr": [float(ctr.mean()), float(ctr.std()), float(ctr.min()), float(ctr.max())],
+            "log_cvr": _log_normal(cvr),
+            "zero_purchase_rate": float((sample["purchases"] == 0).mean()),
+            "log_aov": _log_normal(aov),
+        },
+        "missing": {c: float(sample[c].isna().mean()) for c in ("spend", "clicks", "revenue", "roas")},
+        "dates": {
+            "start": dates.min().strftime("%Y-%m-%d"),
+            "days": int((dates.max() - dates.min()).days) + 1,
+        },
+    }
+
+
+def load_profile(sample_path) -> dict:
+    return fit_profile(pd.read_csv(sample_path))
+
+
+def _generate_block(profile: dict, seed: int, block: int, start: int, stop: int, n_rows: int) -> pd.DataFrame:
+    """Rows [start, stop) of an n_rows dataset, drawn with the generator of `block`."""
+    rng = np.random.default_rng([seed, block])
+    size = stop - start
+    metrics = profile["metrics"]
+
+    # Categorical tuples, kept as categoricals so 10M+ row frames stay small
+    cats = profile["categories"]
+    tuple_idx = rng.choice(len(cats["weights"]), size=size, p=cats["weights"])
+    columns = {}
+    for j, col in enumerate(cats["columns"]):
+        levels, codes = np.unique([t[j] for t in cats["tuples"]], return_inverse=True)
+        columns[col] = pd.Categorical.from_codes(codes[tuple_idx], categories=levels)
+
+    # Dates are spread evenly and ascend with the row index, like a daily export
+    days = profile["dates"]["days"]
+    day_offset = (np.arange(start, stop, dtype="int64") * days) // max(n_rows, 1)
+    dates = pd.Timestamp(profile["dates"]["start"]) + pd.to_timedelta(day_offset, unit="D")
+    columns["date"] = dates.strftime("%Y-%m-%d")
+
+    spend = np.round(rng.lognormal(*metrics["log_spend"], size=size), 2)
+    impressions = np.maximum(np.rint(rng.lognormal(*metrics["log_impressions"], size=size)), 1)
+    ctr_mu, ctr_sd, ctr_lo, ctr_hi = metrics["ctr"]
+    ctr = np.clip(rng.normal(ctr_mu, ctr_sd, size=size), ctr_lo, ctr_hi)
+    clicks = np.rint(impressions * ctr)
+    cvr = rng.lognormal(*metrics["log_cvr"], size=size)
+    purchases = np.rint(clicks * cvr)
+    purchases[rng.random(size) < metrics["zero_purchase_rate"]] = 0
+    revenue = np.round(purchases * rng.lognormal(*metrics["log_aov"], size=size), 2)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        columns.update({
+            "spend": spend,
+            "impressions": impressions.astype("int64"),
+            "clicks": clicks,
+            "ctr": np.round(clicks / impressions, 4),
+            "purchases": purchases.astype("int64"),
+            "revenue": revenue,
+            "roas": np.round(revenue / spend, 2),
+        })
+
+    # Same share of blanks as the sample export
+    for col, rate in profile["missing"].items():
+        if rate > 0:
+            values = columns[col].astype("float64")
+            values[rng.random(size) < rate] = np.nan
+            columns[col] = values
+
+    return pd.DataFrame(columns, index=pd.RangeIndex(start, stop))[OUTPUT_COLUMNS]
+
+
+def iter_synthetic_chunks(n_rows: int, seed: int = 42, profile: dict | None = None,
+                          sample_path="data/sample_fb_ads.csv", chunk_rows: int = BLOCK_ROWS):
+    """Yield an n_rows synthetic dataset as frames of at most `chunk_rows` rows."""
+    profile = profile or load_profile(sample_path)
+    chunk_rows = max(1, min(chunk_rows, BLOCK_ROWS))
+    for block_start in range(0, n_rows, BLOCK_ROWS):
+        block = block_start // BLOCK_ROWS
+        block_stop = min(block_start + BLOCK_ROWS, n_rows)
+        frame = _generate_block(profile, seed, block, block_start, block_stop, n_rows)
+        for offset in range(0, len(frame), chunk_rows):
+            yield frame.iloc[offset:offset + chunk_rows]
+
+
+def generate_frame(n_rows: int, seed: int = 42, profile: dict | None = None,
+                   sample_path="data/sample_fb_ads.csv") -> pd.DataFrame:
+    """Build an n_rows synthetic dataset in memory (CSV-shaped: string dates, raw dtypes)."""
+    frames = list(iter_synthetic_chunks(n_rows, seed, profile, sample_path))
+    if not frames:
+        return pd.DataFrame(columns=OUTPUT_COLUMNS)
+    return pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+
+
+def write_csv(path, n_rows: int, seed: int = 42, profile: dict | None = None,
+              sample_path="data/sample_fb_ads.csv", chunk_rows: int = 250_000) -> Path:
+    """Stream an n_rows synthetic dataset to a CSV file without holding it in memory."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        f.write(",".join(OUTPUT_COLUMNS) + "\n")
+        for chunk in iter_synthetic_chunks(n_rows, seed, profile, sample_path, chunk_rows):
+            chunk.to_csv(f, header=False, index=False)
+    return path
+
+
+def main(argv=None):
+    sys.path.append(str(Path(__file__).resolve().parents[2]))
+    from src.utils.config_loader import load_config
+
+    config = load_config()
+    parser = argparse.ArgumentParser(description="Generate a synthetic Facebook Ads export")
+    parser.add_argument("--rows", type=int, default=1_000_000, help="10k to 50M rows")
+    parser.add_argument("--out", default=config["paths"]["full_data_path"])
+    parser.add_argument("--seed", type=int, default=config["project"].get("seed", 42))
+    parser.add_argument("--sample", default=config["paths"]["data_path"],
+                        help="Sample export whose schema and distributions are reproduced")
+    args = parser.parse_args(argv)
+
+    path = write_csv(args.out, args.rows, seed=args.seed, sample_path=args.sample)
+    print(f"Wrote {args.rows:,} synthetic rows to {path} (seed {args.seed}).")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,400 @@
+"""
+Vectorized daily time-series analysis for ROAS / CTR / CPM.
+
+Every function works on 2-D arrays shaped (series, days), so thousands of
+campaign or adset series are analysed in one batch of numpy operations:
+
+- spend-weighted daily ratios from summed components (revenue / spend, ...),
+- trailing rolling windows via cumulative sums,
+- an ordinary least-squares slope per series with its standard error and a
+  two-sided confidence,
+- a single mean-shift change point per series (spend-weighted, found by
+  scanning every split with cumulative sums),
+- ROAS drop alerts against `thresholds.roas_drop_pct`.
+
+Daily inputs are additive components rather than ratios, so partials from
+chunks or stored dates can simply be summed before the ratios are taken.
+"""
+
+import numpy as np
+import pandas as pd
+
+from src.utils.segment_cube import decode_key, radix_key, encode_levels
+
+# Additive per-day components; each ratio only uses rows where both of its inputs exist
+COMPONENTS = ["roas_spend", "revenue", "clicks", "ctr_impressions", "cpm_spend", "cpm_impressions"]
+SERIES_KEYS = ["campaign_name", "adset_name"]
+
+
+def ratio_components(frame: pd.DataFrame) -> np.ndarray:
+    """(rows, len(COMPONENTS)) array of the additive inputs to ROAS, CTR and CPM."""
+    def col(name):
+        if name not in frame.columns:
+            return np.full(len(frame), np.nan)
+        return frame[name].to_numpy(dtype="float64", na_value=np.nan)
+
+    spend, revenue, clicks, impressions = col("spend"), col("revenue"), col("clicks"), col("impressions")
+    roas_ok = np.isfinite(spend) & np.isfinite(revenue)
+    ctr_ok = np.isfinite(clicks) & np.isfinite(impressions)
+    cpm_ok = np.isfinite(spend) & np.isfinite(impressions)
+    return np.column_stack([
+        np.where(roas_ok, spend, 0.0), np.where(roas_ok, revenue, 0.0),
+        np.where(ctr_ok, clicks, 0.0), np.where(ctr_ok, impressions, 0.0),
+        np.where(cpm_ok, spend, 0.0), np.where(cpm_ok, impressions, 0.0),
+    ])
+
+
+def _day_numbers(frame: pd.DataFrame) -> np.ndarray:
+    dates = frame["date"]
+    if not pd.api.types.is_datetime64_any_dtype(dates):
+        dates = pd.to_datetime(dates, errors="coerce")
+    return dates.to_numpy().astype("datetime64[D]")
+
+
+def daily_totals(frame: pd.DataFrame) -> pd.DataFrame:
+    """Components summed per date (rows with unparseable dates are dropped)."""
+    days = _day_numbers(frame)
+    dated = ~np.isnat(days)
+    comps = ratio_components(frame)[dated]
+    codes, uniques = pd.factorize(days[dated].view("int64"))
+    sums = np.column_stack([np.bincount(codes, weights=comps[:, j], minlength=len(uniques))
+                            for j in range(len(COMPONENTS))]) if len(uniques) else np.zeros((0, len(COMPONENTS)))
+    index = pd.to_datetime(np.asarray(uniques, dtype="int64").astype("datetime64[D]"))
+    return pd.DataFrame(sums, index=index, columns=COMPONENTS).sort_index()
+
+
+def to_grid(daily: pd.DataFrame):
+    """Reindex per-date totals onto a contiguous day range: (days, (1, n_days, components))."""
+    if daily.empty:
+        return pd.DatetimeIndex([]), np.zeros((1, 0, len(COMPONENTS)))
+    days = pd.date_range(daily.index.min(), daily.index.max(), freq="D")
+    return days, daily.reindex(days, fill_value=0.0)[COMPONENTS].to_numpy()[None, :, :]
+
+
+class SeriesAccumulator:
+    """
+    SeriesAccumulator
+    ------------------
+    Per-(campaign, adset, day) component sums built chunk by chunk with
+    integer codes and np.bincount, materialized as a dense
+    (series, days, components) array for the batched analysis below.
+    """
+
+    def __init__(self, keys=None):
+        self.keys = list(keys or SERIES_KEYS)
+        self._levels = {key: {} for key in self.keys}
+        self._series = {}
+        self._days = {}
+        self._partials = []
+
+    def update(self, frame: pd.DataFrame):
+        days = _day_numbers(frame)
+        dated = ~np.isnat(days)
+        if not dated.any():
+            return self
+        if not dated.all():
+            frame, days = frame[dated], days[dated]
+
+        codes = [encode_levels(self._levels[key], frame[key]) for key in self.keys]
+        cards = [len(self._levels[key]) for key in self.keys]
+        series_codes, series_uniques = pd.factorize(radix_key(codes, cards))
+        combos = zip(*[c.tolist() for c in decode_key(np.asarray(series_uniques), cards)])
+        series_map = np.array([self._series.setdefault(combo, len(self._series)) for combo in combos],
+                              dtype="int64")
+        day_codes, day_uniques = pd.factorize(days.view("int64"))
+        day_map = np.array([self._days.setdefault(int(d), len(self._days)) for d in day_uniques], dtype="int64")
+
+        # One partial per chunk, keyed by (series, day) in this chunk's local code space
+        local_key = series_codes.astype("int64") * len(day_uniques) + day_codes
+        size = len(series_uniques) * len(day_uniques)
+        comps = ratio_components(frame)
+        sums = np.column_stack([np.bincount(local_key, weights=comps[:, j], minlength=size)
+                                for j in range(len(COMPONENTS))])
+        cells = np.flatnonzero(np.bincount(local_key, minlength=size))
+        self._partials.append((series_map[cells // len(day_uniques)], day_map[cells % len(day_uniques)], sums[cells]))
+        return self
+
+    def arrays(self):
+        """(labels frame, contiguous DatetimeIndex, (series, days, components) array)."""
+        names = {key: np.array(list(self._levels[key]), dtype=object) for key in self.keys}
+        combos = np.array(list(self._series), dtype="int64").reshape(len(self._series), len(self.keys))
+        labels = pd.DataFrame({key: names[key][combos[:, j]] for j, key in enumerate(self.keys)})
+        if not self._partials:
+            return labels, pd.DatetimeIndex([]), np.zeros((len(labels), 0, len(COMPONENTS)))
+        day_numbers = np.empty(len(self._days), dtype="int64")
+        for day, code in self._days.items():
+            day_numbers[code] = day
+        first, last = day_numbers.min(), day_numbers.max()
+        n_days = int(last - first) + 1
+        series = np.concatenate([p[0] for p in self._partials])
+        day = np.concatenate([day_numbers[p[1]] - first for p in self._partials])
+        sums = np.concatenate([p[2] for p in self._partials])
+        grid = _scatter(series * n_days + day, sums, len(self._series) * n_days).reshape(
+            len(self._series), n_days, len(COMPONENTS))
+        days = pd.date_range(pd.Timestamp(np.datetime64(int(first), "D")), periods=grid.shape[1], freq="D")
+        return labels, days, grid
+
+
+def rollup(labels: pd.DataFrame, grid: np.ndarray, keys):
+    """Sum series that share `keys` (e.g. adsets into their campaign)."""
+    codes, uniques = pd.factorize(pd.MultiIndex.from_frame(labels[list(keys)]))
+    n_days = grid.shape[1]
+    flat = (codes[:, None].astype("int64") * n_days + np.arange(n_days)).reshape(-1)
+    out = _scatter(flat, grid.reshape(-1, grid.shape[2]), len(uniques) * n_days)
+    return pd.DataFrame(list(uniques), columns=list(keys)), out.reshape(len(uniques), n_days, grid.shape[2])
+
+
+def _scatter(index: np.ndarray, values: np.ndarray, size: int) -> np.ndarray:
+    """Sum rows of `values` (n, components) into `size` bins, one bincount per component."""
+    return np.column_stack([np.bincount(index, weights=values[:, j], minlength=size)
+                            for j in range(values.shape[1])])
+
+
+# ---------------------------------------------------------------- analysis
+def ratio(num: np.ndarray, den: np.ndarray) -> np.ndarray:
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(den > 0, num / den, np.nan)
+
+
+def daily_ratios(grid: np.ndarray) -> dict:
+    """Spend-weighted daily ROAS, CTR and CPM, each (series, days)."""
+    c = {name: grid[..., j] for j, name in enumerate(COMPONENTS)}
+    return {
+        "roas": ratio(c["revenue"], c["roas_spend"]),
+        "ctr": ratio(c["clicks"], c["ctr_impressions"]),
+        "cpm": ratio(1000 * c["cpm_spend"], c["cpm_impressions"]),
+    }
+
+
+def rolling_sum(values: np.ndarray, window: int) -> np.ndarray:
+    """Trailing `window`-day sums along the last axis (shorter at the start)."""
+    csum = np.cumsum(values, axis=-1)
+    out = csum.copy()
+    out[..., window:] = csum[..., window:] - csum[..., :-window]
+    return out
+
+
+def rolling_ratio(num: np.ndarray, den: np.ndarray, window: int) -> np.ndarray:
+    return ratio(rolling_sum(num, window), rolling_sum(den, window))
+
+
+def _normal_cdf(z: np.ndarray) -> np.ndarray:
+    """Standard normal CDF (Abramowitz-Stegun 7.1.26 erf, |error| < 1.5e-7)."""
+    x = np.abs(z) / np.sqrt(2.0)
+    t = 1.0 / (1.0 + 0.3275911 * x)
+    poly = t * (0.254829592 + t * (-0.284496736 + t * (1.421413741 + t * (-1.453152027 + t * 1.061405429))))
+    erf = 1.0 - poly * np.exp(-x * x)
+    return 0.5 * (1.0 + np.sign(z) * erf)
+
+
+def ols_slope(y: np.ndarray) -> dict:
+    """
+    Least-squares slope of each row of `y` against the day index, skipping NaNs.
+
+    `confidence` is 1 - p of a two-sided t-test on the slope (t mapped to a
+    normal deviate with the Cornish-Fisher style correction t(1 - 1/4df) / sqrt(1 + t^2/2df)).
+    """
+    y = np.atleast_2d(y)
+    mask = np.isfinite(y)
+    x = np.broadcast_to(np.arange(y.shape[1], dtype="float64"), y.shape)
+    yv = np.where(mask, y, 0.0)
+    xv = np.where(mask, x, 0.0)
+    n = mask.sum(axis=1).astype("float64")
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mx = xv.sum(axis=1) / n
+        my = yv.sum(axis=1) / n
+        dx = np.where(mask, x - mx[:, None], 0.0)
+        dy = np.where(mask, y - my[:, None], 0.0)
+        sxx = (dx * dx).sum(axis=1)
+        slope = (dx * dy).sum(axis=1) / sxx
+        resid = np.where(mask, dy - slope[:, None] * dx, 0.0)
+        dof = n - 2
+        se = np.sqrt((resid * resid).sum(axis=1) / dof / sxx)
+        t = slope / se
+        z = t * (1 - 1 / (4 * dof)) / np.sqrt(1 + t * t / (2 * dof))
+    confidence = np.where(dof > 0, 1 - 2 * (1 - _normal_cdf(np.abs(z))), np.nan)
+    confidence = np.where(np.isfinite(se) & (se == 0) & (dof > 0), 1.0, confidence)
+    slope = np.where(n >= 2, slope, np.nan)
+    return {"slope": slope, "se": np.where(dof > 0, se, np.nan), "confidence": confidence, "n": n}
+
+
+def change_points(spend: np.ndarray, revenue: np.ndarray, min_segment: int = 3) -> dict:
+    """
+    Best single mean-shift split of each series' spend-weighted daily ROAS.
+
+    For every split k the between-segment sum of squares
+    W1 (m1 - m)^2 + W2 (m2 - m)^2 (W = spend, m = revenue / spend) is computed
+    from cumulative sums; `strength` is its share of the total weighted sum of
+    squares. `index` is the first day of the second segment (-1 if none).
+    """
+    spend, revenue = np.atleast_2d(spend), np.atleast_2d(revenue)
+    n_series, n_days = spend.shape
+    with np.errstate(divide="ignore", invalid="ignore"):
+        sq = np.where(spend > 0, revenue * revenue / spend, 0.0)
+    w1 = np.cumsum(spend, axis=1)[:, :-1]
+    r1 = np.cumsum(revenue, axis=1)[:, :-1]
+    w, r, q = spend.sum(axis=1), revenue.sum(axis=1), sq.sum(axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        m = r / w
+        total_ss = q - w * m * m
+        w2, r2 = w[:, None] - w1, r[:, None] - r1
+        between = r1 * r1 / w1 + r2 * r2 / w2 - (r * r / w)[:, None]
+
+    # Split after day k-1 needs min_segment days with spend on each side
+    active = np.cumsum(spend > 0, axis=1)
+    left = active[:, :-1]
+    right = active[:, -1:] - left
+    valid = (left >= min_segment) & (right >= min_segment) & (w1 > 0) & (w2 > 0)
+    between = np.where(valid & np.isfinite(between), between, -np.inf)
+
+    if n_days < 2:
+        empty = np.full(n_series, np.nan)
+        return {"index": np.full(n_series, -1), "before": empty, "after": empty, "strength": empty}
+    best = np.argmax(between, axis=1)
+    rows = np.arange(n_series)
+    found = np.isfinite(between[rows, best])
+    with np.errstate(divide="ignore", invalid="ignore"):
+        before = r1[rows, best] / w1[rows, best]
+        after = r2[rows, best] / w2[rows, best]
+        strength = np.where(total_ss > 0, between[rows, best] / total_ss, 0.0)
+    return {
+        "index": np.where(found, best + 1, -1),
+        "before": np.where(found, before, np.nan),
+        "after": np.where(found, after, np.nan),
+        "strength": np.where(found, np.clip(strength, 0.0, 1.0), np.nan),
+    }
+
+
+def analyze(grid: np.ndarray, window: int = 7, min_segment: int = 3) -> dict:
+    """All per-series statistics for a (series, days, components) grid, as arrays."""
+    spend, revenue = grid[..., 0], grid[..., 1]
+    ratios = daily_ratios(grid)
+    rolling = rolling_ratio(revenue, spend, window)
+    n_days = grid.shape[1]
+    recent = min(window, n_days // 2) or 1
+    with np.errstate(divide="ignore", invalid="ignore"):
+        first = ratio(revenue[:, :recent].sum(axis=1), spend[:, :recent].sum(axis=1))
+        last = ratio(revenue[:, -recent:].sum(axis=1), spend[:, -recent:].sum(axis=1))
+        previous = ratio(revenue[:, -2 * recent:-recent].sum(axis=1), spend[:, -2 * recent:-recent].sum(axis=1))
+    return {
+        "ratios": ratios,
+        "rolling_roas": rolling,
+        "roas_slope": ols_slope(ratios["roas"]),
+        "ctr_slope": ols_slope(ratios["ctr"]),
+        "cpm_slope": ols_slope(ratios["cpm"]),
+        "change_point": change_points(spend, revenue, min_segment),
+        "first_window_roas": first,
+        "last_window_roas": last,
+        "previous_window_roas": previous,
+        "window": recent,
+        "spend": spend.sum(axis=1),
+        "recent_spend": spend[:, -recent:].sum(axis=1),
+    }
+
+
+def _round(value, digits=4):
+    return None if value is None or not np.isfinite(value) else round(float(value), digits)
+
+
+def _direction(slope, confidence, min_confidence):
+    if not np.isfinite(slope) or not np.isfinite(confidence) or confidence < min_confidence:
+        return "flat"
+    return "decline" if slope < 0 else "growth"
+
+
+def trend_summary(daily: pd.DataFrame, window: int = 7, min_segment: int = 3,
+                  min_confidence: float = 0.9, drop_pct: float = 0.2, min_strength: float = 0.25) -> dict:
+    """The `roas_trend` block for one series of per-date component totals."""
+    days, grid = to_grid(daily)
+    if grid.shape[1] == 0:
+        return {"start_roas": None, "end_roas": None, "trend_direction": "unknown"}
+    stats = analyze(grid, window, min_segment)
+    slope = stats["roas_slope"]
+    cp = stats["change_point"]
+    start, end, previous = stats["first_window_roas"][0], stats["last_window_roas"][0], stats["previous_window_roas"][0]
+    change_pct = (end - previous) / previous if np.isfinite(previous) and previous else np.nan
+
+    change_point = None
+    if cp["index"][0] >= 0 and cp["strength"][0] >= min_strength:
+        change_point = {
+            "date": days[cp["index"][0]].strftime("%Y-%m-%d"),
+            "before_roas": _round(cp["before"][0]),
+            "after_roas": _round(cp["after"][0]),
+            "strength": _round(cp["strength"][0]),
+        }
+    shift_pct = ((cp["after"][0] - cp["before"][0]) / cp["before"][0]) if change_point and cp["before"][0] else np.nan
+    return {
+        "start_roas": _round(start),
+        "end_roas": _round(end),
+        "trend_direction": _direction(slope["slope"][0], slope["confidence"][0], min_confidence),
+        "window_days": int(stats["window"]),
+        "slope_per_day": _round(slope["slope"][0], 6),
+        "slope_stderr": _round(slope["se"][0], 6),
+        "slope_confidence": _round(slope["confidence"][0]),
+        "recent_change_pct": _round(change_pct),
+        "change_point": change_point,
+        "ctr_slope_per_day": _round(stats["ctr_slope"]["slope"][0], 8),
+        "cpm_slope_per_day": _round(stats["cpm_slope"]["slope"][0], 6),
+        "drop_alert": bool((np.isfinite(change_pct) and change_pct <= -drop_pct)
+                           or (np.isfinite(shift_pct) and shift_pct <= -drop_pct)),
+    }
+
+
+def trend_counts(stats: dict, min_confidence: float = 0.9) -> dict:
+    """How many series are in significant decline / growth, or flat."""
+    slope, confidence = stats["roas_slope"]["slope"], stats["roas_slope"]["confidence"]
+    significant = np.isfinite(slope) & np.isfinite(confidence) & (confidence >= min_confidence)
+    decline = int((significant & (slope < 0)).sum())
+    growth = int((significant & (slope > 0)).sum())
+    return {"decline": decline, "growth": growth, "flat": int(len(slope) - decline - growth)}
+
+
+def series_alerts(labels: pd.DataFrame, days: pd.DatetimeIndex, grid: np.ndarray, level: str,
+                  window: int = 7, min_segment: int = 3, drop_pct: float = 0.2,
+                  min_strength: float = 0.25, min_confidence: float = 0.9, limit: int | None = None,
+                  stats: dict | None = None):
+    """
+    ROAS drop alerts for every series in one batch; returns (alerts, total alert count).
+
+    `window_drop`: the last window's ROAS is at least `drop_pct` below the window
+    before it. `level_shift`: a change point of at least `min_strength` whose
+    after-ROAS is at least `drop_pct` below its before-ROAS. Alerts are ordered
+    by the recent spend exposed to the drop and only the first `limit` are built.
+    `stats` may be a precomputed analyze(grid, window, min_segment) result.
+    """
+    if grid.shape[1] == 0 or len(labels) == 0:
+        return [], 0
+    stats = stats or analyze(grid, window, min_segment)
+    cp = stats["change_point"]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        window_change = (stats["last_window_roas"] - stats["previous_window_roas"]) / stats["previous_window_roas"]
+        shift = (cp["after"] - cp["before"]) / cp["before"]
+    window_drop = np.isfinite(window_change) & (window_change <= -drop_pct)
+    level_shift = (cp["index"] >= 0) & (cp["strength"] >= min_strength) & np.isfinite(shift) & (shift <= -drop_pct)
+
+    flagged = np.flatnonzero(window_drop | level_shift)
+    drop = np.where(level_shift, -shift, -window_change)
+    exposure = np.nan_to_num(stats["recent_spend"] * drop)
+    order = flagged[np.argsort(-exposure[flagged], kind="stable")]
+    if limit is not None:
+        order = order[:limit]
+
+    slope = stats["roas_slope"]
+    alerts = []
+    for i in order:
+        record = {"level": level, **{k: labels[k].iat[i] for k in labels.columns}}
+        if level_shift[i]:
+            record.update(type="level_shift", date=days[cp["index"][i]].strftime("%Y-%m-%d"),
+                          baseline_roas=_round(cp["before"][i]), current_roas=_round(cp["after"][i]),
+                          drop_pct=_round(drop[i]), strength=_round(cp["strength"][i]))
+        else:
+            record.update(type="window_drop", date=days[-stats["window"]].strftime("%Y-%m-%d"),
+                          baseline_roas=_round(stats["previous_window_roas"][i]),
+                          current_roas=_round(stats["last_window_roas"][i]), drop_pct=_round(drop[i]))
+        record.update(
+            trend_direction=_direction(slope["slope"][i], slope["confidence"][i], min_confidence),
+            slope_per_day=_round(slope["slope"][i], 6),
+            recent_spend=_round(stats["recent_spend"][i], 2),
+        )
+        alerts.append(record)
+    return alerts, int(len(flagged))
@@ -0,0 +1,232 @@
+"""
+Lightweight profiling/tracing for pipeline stages.
+
+Wrap a function with @traced("Name") or a block with `with trace_span("Name"):`.
+When tracing is enabled (config `tracing.enabled` or `run.py --trace`), every
+span records wall time, thread CPU time, peak-RSS growth, optional tracemalloc
+deltas, rows processed and LLM token counts. Finished runs can be exported as a
+Chrome trace (chrome://tracing, Perfetto) and summarized as a table. When
+disabled, the wrappers cost one attribute check per call.
+"""
+
+import functools
+import json
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def _peak_rss_kb():
+    if resource is None:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+class Span:
+    """One timed region; `attrs` holds free-form counters such as rows or tokens."""
+
+    def __init__(self, name, category, attrs):
+        self.name = name
+        self.category = category
+        self.attrs = dict(attrs)
+        self.thread_id = threading.get_ident()
+        self.start = self.end = 0.0
+        self.cpu = 0.0
+
+    def set(self, **attrs):
+        self.attrs.update({k: v for k, v in attrs.items() if v is not None})
+        return self
+
+
+class Tracer:
+    """
+    Tracer
+    -------
+    Collects finished spans for one process.
+    """
+
+    def __init__(self, enabled=False, memory=False):
+        self.enabled = enabled
+        self.memory = memory
+        self.spans = []
+        self.origin = time.perf_counter()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def span(self, name, category="stage", **attrs):
+        span = Span(name, category, attrs)
+        rss_before = _peak_rss_kb()
+        mem_before = tracemalloc.get_traced_memory()[0] if self.memory and tracemalloc.is_tracing() else None
+        cpu_before = time.thread_time()
+        span.start = time.perf_counter()
+        try:
+            yield span
+        finally:
+            span.end = time.perf_counter()
+            span.cpu = time.thread_time() - cpu_before
+            rss_after = _peak_rss_kb()
+            if rss_before is not None:
+                span.attrs["peak_rss_growth_kb"] = rss_after - rss_before
+                span.attrs["peak_rss_kb"] = rss_after
+            if mem_before is not None:
+                current, peak = tracemalloc.get_traced_memory()
+                span.attrs["alloc_delta_kb"] = round((current - mem_before) / 1024, 1)
+                span.attrs["traced_peak_kb"] = round(peak / 1024, 1)
+            with self._lock:
+                self.spans.append(span)
+
+    def chrome_trace(self):
+        """Spans in Chrome trace-event format (complete "X" events, microseconds)."""
+        pid = os.getpid()
+        events = [
+            {
+                "name": s.name,
+                "cat": s.category,
+                "ph": "X",
+                "ts": round((s.start - self.origin) * 1e6, 1),
+                "dur": round((s.end - s.start) * 1e6, 1),
+                "pid": pid,
+                "tid": s.thread_id,
+                "args": {"cpu_ms": round(s.cpu * 1000, 2), **s.attrs},
+            }
+            for s in sorted(self.spans, key=lambda s: s.start)
+        ]
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def export(self, path):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(self.chrome_trace(), ensure_ascii=False), encoding="utf-8")
+        return path
+
+    def summary(self):
+        """Aggregate spans by name: calls, wall/CPU seconds, rows, tokens, max RSS growth."""
+        rows = {}
+        for s in self.spans:
+            r = rows.setdefault(s.name, {"calls": 0, "wall_s": 0.0, "cpu_s": 0.0, "rows": 0,
+                                         "prompt_tokens": 0, "response_tokens": 0, "rss_growth_kb": 0})
+            r["calls"] += 1
+            r["wall_s"] += s.end - s.start
+            r["cpu_s"] += s.cpu
+            r["rows"] += s.attrs.get("rows", 0) or 0
+            r["prompt_tokens"] += s.attrs.get("prompt_tokens", 0) or 0
+            r["response_tokens"] += s.attrs.get("response_tokens", 0) or 0
+            r["rss_growth_kb"] = max(r["rss_growth_kb"], s.attrs.get("peak_rss_growth_kb", 0) or 0)
+        return dict(sorted(rows.items(), key=lambda item: -item[1]["wall_s"]))
+
+    def summary_table(self):
+        header = f"{'span':<42} {'calls':>5} {'wall (s)':>9} {'cpu (s)':>8} {'rows':>10} {'tokens in/out':>15} {'rss +KB':>9}"
+        lines = [header, "-" * len(header)]
+        for name, r in self.summary().items():
+            tokens = f"{r['prompt_tokens']}/{r['response_tokens']}" if r["prompt_tokens"] else "-"
+            lines.append(
+                f"{name[:42]:<42} {r['calls']:>5} {r['wall_s']:>9.3f} {r['cpu_s']:>8.3f} "
+                f"{r['rows'] or '-':>10} {tokens:>15} {r['rss_growth_kb']:>9}"
+            )
+        return "\n".join(lines)
+
+    def export_langfuse(self, config, trace_name="agentic-fb-analyst"):
+        """Send spans to Langfuse when the SDK and keys are available (v2-style client API)."""
+        env = config.get("env", {})
+        if not (env.get("LANGFUSE_PUBLIC_KEY") and env.get("LANGFUSE_SECRET_KEY")):
+            print("[Tracing] Langfuse keys not set; skipping export.")
+            return False
+        try:
+            from datetime import datetime, timedelta
+            from langfuse import Langfuse
+
+            client = Langfuse(public_key=env["LANGFUSE_PUBLIC_KEY"], secret_key=env["LANGFUSE_SECRET_KEY"])
+            wall_origin = datetime.now() - timedelta(seconds=time.perf_counter() - self.origin)
+            trace = client.trace(name=trace_name)
+            for s in sorted(self.spans, key=lambda s: s.start):
+                trace.span(
+                    name=s.name,
+                    start_time=wall_origin + timedelta(seconds=s.start - self.origin),
+                    end_time=wall_origin + timedelta(seconds=s.end - self.origin),
+                    metadata={"cpu_s": s.cpu, **s.attrs},
+                )
+            client.flush()
+            return True
+        except Exception as e:
+            print(f"[Tracing] Langfuse export failed: {e}")
+            return False
+
+
+_tracer = Tracer()
+
+
+def configure_tracing(config, enabled=None):
+    """Enable/disable tracing from the `tracing` config section (`enabled` overrides it)."""
+    global _tracer
+    settings = config.get("tracing", {})
+    enabled = settings.get("enabled", False) if enabled is None else enabled
+    memory = settings.get("memory", False)
+    if enabled and memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    _tracer = Tracer(enabled=enabled, memory=memory)
+    return _tracer
+
+
+def get_tracer() -> Tracer:
+    return _tracer
+
+
+@contextmanager
+def trace_span(name, category="stage", **attrs):
+    """Context manager yielding a Span (or None when tracing is disabled)."""
+    tracer = _tracer
+    if not tracer.enabled:
+        yield None
+        return
+    with tracer.span(name, category, **attrs) as span:
+        yield span
+
+
+def traced(name=None, category="stage", rows=None):
+    """
+    Decorator form of trace_span. `rows(result, *args, **kwargs)` may return the
+    number of rows the call processed.
+    """
+    def decorator(fn):
+        span_name = name or fn.__qualname__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            tracer = _tracer
+            if not tracer.enabled:
+                return fn(*args, **kwargs)
+            with tracer.span(span_name, category) as span:
+                result = fn(*args, **kwargs)
+                if rows is not None:
+                    try:
+                        span.set(rows=rows(result, *args, **kwargs))
+                    except Exception:
+                        pass
+                return result
+
+        return wrapper
+
+    return decorator
+
+
+def finish_tracing(config):
+    """Write the Chrome trace, print the summary table and optionally export to Langfuse."""
+    tracer = _tracer
+    if not tracer.enabled or not tracer.spans:
+        return None
+    settings = config.get("tracing", {})
+    path = tracer.export(settings.get("output", "reports/trace.json"))
+    print("\nTrace summary:")
+    print(tracer.summary_table())
+    print(f"Chrome trace written to {path} (open in chrome://tracing or ui.perfetto.dev)")
+    if settings.get("langfuse", False):
+        tracer.export_langfuse(config)
+    return path
@@ -0,0 +1,20 @@
+import json
+
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def _bypass_llm_cache(monkeypatch):
+    """Keep mocked Gemini responses out of the developer's on-disk LLM cache."""
+    monkeypatch.setenv("LLM_CACHE_BYPASS", "1")
+
+
+@pytest.fixture
+def creative_llm(monkeypatch):
+    """Answer CreativeAgent's streamed shard calls with a well-formed (empty) recommendation list."""
+    from src.agents import creative_agent
+
+    def fake_stream(prompt, refresh=False, **kwargs):
+        yield json.dumps({"creative_recommendations": []})
+
+    monkeypatch.setattr(creative_agent, "stream_gemini", fake_stream)
@@ -0,0 +1,114 @@
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+import pandas as pd
+import pytest
+
+from src.utils.columnar_store import ColumnarStore, ingest_csv
+from src.utils.config_loader import load_config
+from src.utils.data_loader import clear_datasets, get_dataset, read_dataset_csv
+
+SORT_KEY = ["date", "campaign_name", "adset_name", "creative_message", "spend"]
+
+
+def _canonical(df):
+    """Rows in a fixed order (the store sorts each day by campaign, the CSV does not)."""
+    keys = {f"_{c}": df[c].astype(str) for c in SORT_KEY}
+    return df.assign(**keys).sort_values(list(keys), kind="stable").drop(columns=list(keys)).reset_index(drop=True)
+
+
+@pytest.fixture
+def store(tmp_path):
+    path = load_config()["paths"]["data_path"]
+    ingest_csv(path, tmp_path / "store", chunksize=37)
+    return ColumnarStore(tmp_path / "store"), read_dataset_csv(path)
+
+
+@pytest.mark.unit
+def test_store_round_trips_the_csv(store):
+    store, csv = store
+    df = store.read()
+
+    assert store.rows == len(csv) and store.columns == list(csv.columns)
+    assert store.dates == sorted(csv["date"].dt.strftime("%Y-%m-%d").unique())
+    pd.testing.assert_frame_equal(_canonical(df), _canonical(csv))
+
+    # Per-day frames share the store-wide categories
+    frames = list(store.iter_partitions(start="2025-01-01", end="2025-01-05"))
+    assert len(frames) == 5
+    assert isinstance(pd.concat(frames)["campaign_name"].dtype, pd.CategoricalDtype)
+
+
+@pytest.mark.unit
+def test_filters_only_touch_the_selected_partitions_and_rows(store):
+    store, csv = store
+    campaign = csv["campaign_name"].value_counts().index[0]
+    store.read(columns=["campaign_name", "spend"])
+    full_bytes = store.last_scan["bytes"]
+
+    df = store.read(columns=["date", "campaign_name", "spend"], last_days=14, campaigns=[campaign])
+    first = csv["date"].max() - pd.Timedelta(days=13)
+    expected = csv[(csv["date"] >= first) & (csv["campaign_name"] == campaign)]
+
+    assert list(df.columns) == ["campaign_name", "date", "spend"]  # stored column order
+    assert len(df) == len(expected) and set(df["campaign_name"]) == {campaign}
+    assert sorted(df["spend"].dropna()) == sorted(expected["spend"].dropna())
+    assert store.last_scan["partitions"] <= 14 and store.last_scan["rows"] == len(expected)
+    # Only the matching rows of two columns were read (the date comes from the partition)
+    assert store.last_scan["bytes"] == full_bytes // len(csv) * len(expected)
+
+    empty = store.read(campaigns=["no such campaign"])
+    assert empty.empty and list(empty.columns) == list(csv.columns)
+
+
+@pytest.mark.unit
+def test_reingest_replaces_the_days_in_the_feed(store, tmp_path):
+    store, csv = store
+    day = csv[csv["date"] == csv["date"].min()].copy()
+    day["spend"] = 1.0
+    feed = tmp_path / "correction.csv"
+    day.to_csv(feed, index=False)
+
+    summary = ingest_csv(feed, store.root)
+    updated = ColumnarStore(store.root)
+
+    assert summary == {"rows": len(day), "partitions": 1, "skipped_rows": 0}
+    assert updated.rows == len(csv)
+    assert (updated.read(end=day["date"].min())["spend"] == 1.0).all()
+    assert updated.manifest["partitions"][updated.dates[1]] == store.manifest["partitions"][store.dates[1]]
+
+
+@pytest.mark.unit
+def test_get_dataset_reads_the_configured_store_with_filters(store, tmp_path):
+    store, csv = store
+    config = load_config()
+    config["dataset"]["store"] = str(store.root)
+    config["dataset"]["filter"] = {"start_date": "2025-03-01", "end_date": None, "last_days": None, "campaigns": []}
+    clear_datasets()
+    try:
+        df = get_dataset(config)
+        assert get_dataset(config) is df
+        assert len(df) == (csv["date"] >= "2025-03-01").sum()
+        # Other paths are still read from their CSV
+        other = tmp_path / "other.csv"
+        other.write_text(Path(config["paths"]["data"]).read_text(encoding="utf-8"), encoding="utf-8")
+        assert len(get_dataset(config, other)) == len(csv)
+    finally:
+        clear_datasets()
+
+
+@pytest.mark.unit
+def test_data_agent_summarizes_from_the_store(store):
+    from src.agents.data_agent import DataAgent
+
+    store, _ = store
+    config = load_config()
+    expected = DataAgent(config).summarize_metrics(read_dataset_csv(config["paths"]["data"]))
+    config["dataset"]["store"] = str(store.root)
+    agent = DataAgent(config)
+
+    streamed = agent.summarize_metrics_streaming(agent.load_chunks())
+    assert streamed["dataset_rows"] == expected["dataset_rows"]
+    assert streamed["roas_trend"] == expected["roas_trend"]
+    assert streamed["low_ctr_summary"]["count"] == expected["low_ctr_summary"]["count"]
@@ -0,0 +1,50 @@
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.utils.compact_frame import compact_frame, format_memory_report, memory_report
+from src.utils.config_loader import load_config
+from src.utils.data_loader import read_dataset_csv
+
+
+@pytest.mark.unit
+def test_compact_frame_encodes_repeated_text_and_downcasts_numbers():
+    n = 1000
+    plain = pd.DataFrame({
+        "message": pd.Series(["a long creative message that repeats " * 3, "another message"] * (n // 2),
+                             dtype=object),
+        "note": pd.Series([f"unique-{i}" for i in range(n)], dtype=object),
+        "impressions": np.arange(n, dtype=np.int64),
+        "delta": np.arange(n, dtype=np.int64) - 10,
+        "spend": np.linspace(0, 1, n),
+    })
+    compact = compact_frame(plain.copy())
+
+    assert isinstance(compact["message"].dtype, pd.CategoricalDtype)
+    assert list(compact["message"].cat.categories) == sorted(set(plain["message"]))
+    assert compact["message"].cat.codes.dtype == np.int8
+    assert compact["note"].dtype == plain["note"].dtype  # near-unique text is left alone
+    assert compact["impressions"].dtype == np.uint16 and compact["delta"].dtype == np.int16
+    assert compact["spend"].dtype == np.float32
+    assert (compact["message"].astype(object) == plain["message"]).all()
+
+    report = memory_report(plain, compact)
+    assert report["columns"]["message"]["bytes_after"] < report["columns"]["message"]["bytes_before"] / 10
+    assert report["reduction"] > 1.5
+    assert "message" in format_memory_report(report)
+
+
+@pytest.mark.unit
+def test_dataset_load_interns_creative_messages_and_is_much_smaller():
+    path = load_config()["paths"]["data_path"]
+    plain = pd.read_csv(path)
+    plain.columns = [c.lower() for c in plain.columns]
+    df = read_dataset_csv(path)
+
+    assert isinstance(df["creative_message"].dtype, pd.CategoricalDtype)
+    assert df["creative_message"].astype(object).equals(plain["creative_message"].astype(object))
+    assert memory_report(plain, df)["reduction"] >= 4
@@ -3,13 +3,14 @@ from pathlib import Path
 sys.path.append(str(Path(__file__).resolve().parents[1]))
 
 import json
+import pandas as pd
 import pytest
 from src.agents.creative_agent import CreativeAgent
 from src.utils.config_loader import load_config
 
 
 @pytest.mark.unit
-def test_creative_agent_creates_output(tmp_path):
+def test_creative_agent_creates_output(tmp_path, creative_llm):
     config = load_config()
     insights_path = tmp_path / "insights.json"
     insights_path.write_text(json.dumps({"dummy": "insight"}))
@@ -25,3 +26,234 @@ def test_creative_agent_creates_output(tmp_path):
     result = creative_agent.run()
     assert "analysis" in result
     assert (tmp_path / "creatives.json").exists()
+
+
+@pytest.mark.unit
+def test_analyze_creatives_matches_row_rules():
+    import pandas as pd
+
+    config = load_config()
+    agent = CreativeAgent(config=config)
+    agent.data = pd.DataFrame({
+        "campaign_name": ["A", "B", "C", "D"],
+        "ctr": [0.01, 0.02, 0.02, float("nan")],
+        "roas": [3.0, 1.0, 4.0, 1.1],
+        "spend": [100.0, 200.0, 300.0, 400.0],
+    })
+
+    agent.analyze_creatives()
+    results = agent.analysis_results
+
+    assert [r["creative_id"] for r in results] == ["CR-0", "CR-1", "CR-3"]
+    for r in results:
+        assert r["identified_issue"] == agent.identify_issue(r["ctr"], r["roas"])
+
+
+@pytest.mark.unit
+def test_aggregate_creatives_collapses_days():
+    import pandas as pd
+
+    config = load_config()
+    agent = CreativeAgent(config=config)
+    agent.data = pd.DataFrame({
+        "campaign_name": ["A", "A", "A", "B"],
+        "adset_name": ["S1", "S1", "S1", "S2"],
+        "date": ["2025-01-01", "2025-01-02", "2025-01-03", "2025-01-01"],
+        "ctr": [0.01, 0.02, 0.01, 0.01],
+        "roas": [1.0, 3.0, 2.0, 5.0],
+        "spend": [100.0, 300.0, 100.0, 50.0],
+    })
+
+    agent.analyze_creatives()
+    summary = agent.aggregate_creatives()
+
+    assert list(summary["campaign_name"]) == ["A", "B"]
+    first = summary.iloc[0]
+    assert first["days_underperforming"] == 2
+    assert first["wasted_spend"] == 200.0
+    assert first["roas"] == pytest.approx((100 + 900 + 200) / 500)
+    assert first["roas_trend_slope"] == pytest.approx(0.5)
+    assert len(agent.select_top_creatives(k=1)) == 1
+
+
+@pytest.mark.unit
+def test_generate_improvements_shards_retries_and_merges(tmp_path, monkeypatch):
+    import threading
+
+    from src.agents import creative_agent as module
+
+    config = load_config()
+    config["creative"].update(top_k=7, shard_by="campaign", shard_size=2, max_workers=3, shard_retries=1)
+    agent = CreativeAgent(config=config, creative_output_path=tmp_path / "creatives.json")
+    agent.underperformers = [None] * 7
+    creatives = [{"creative_id": f"CR-{i}", "campaign_name": "A" if i < 4 else "B"} for i in range(7)]
+    agent.creative_summary = pd.DataFrame(creatives)
+    agent.select_top_creatives = lambda: creatives
+
+    shards = agent.shard_creatives(creatives)
+    assert [[c["creative_id"] for c in s] for s in shards] == [
+        ["CR-0", "CR-1"], ["CR-2", "CR-3"], ["CR-4", "CR-5"], ["CR-6"]
+    ]
+
+    calls, lock = [], threading.Lock()
+
+    def fake_stream(prompt, refresh=False):
+        ids = [f"CR-{i}" for i in range(7) if f"CR-{i}\t" in prompt]
+        with lock:
+            calls.append((tuple(ids), refresh))
+        if ids == ["CR-2", "CR-3"] and not refresh:
+            yield "not json at all"  # malformed once, fixed on retry
+            return
+        if ids == ["CR-6"]:
+            raise RuntimeError("quota exhausted")
+        # Answer in reverse order, in small chunks, to check streaming and the merge ordering
+        text = json.dumps({"creative_recommendations": [{"creative_id": i} for i in reversed(ids)]})
+        for start in range(0, len(text), 7):
+            yield text[start:start + 7]
+
+    streamed = []
+    monkeypatch.setattr(module, "stream_gemini", fake_stream)
+    output = agent.generate_improvements(insights={"hypotheses": []}, on_recommendation=streamed.append)
+
+    assert [r["creative_id"] for r in output["creative_recommendations"]] == [f"CR-{i}" for i in range(6)]
+    # Only the broken shards were retried
+    assert sorted(calls).count((("CR-0", "CR-1"), False)) == 1
+    assert (("CR-2", "CR-3"), True) in calls
+    assert output["shards"]["count"] == 4
+    assert output["shards"]["attempts"] == 6
+    assert output["shards"]["failed"] == [{"shard": 3, "creative_ids": ["CR-6"], "error": "RuntimeError: quota exhausted"}]
+    assert sorted(r["creative_id"] for r in streamed) == [f"CR-{i}" for i in range(6)]
+
+
+@pytest.mark.unit
+def test_shared_agent_reports_each_querys_own_prompts(tmp_path, monkeypatch):
+    import threading
+    from concurrent.futures import ThreadPoolExecutor
+
+    from src.agents import creative_agent as module
+
+    config = load_config()
+    config["creative"].update(shard_by="size", shard_size=1, max_workers=2)
+    agent = CreativeAgent(config=config, creative_output_path=tmp_path / "creatives.json")
+    agent.underperformers = [None] * 2
+    creatives = [{"creative_id": f"CR-{i}", "campaign_name": "A"} for i in range(2)]
+    agent.creative_summary = pd.DataFrame(creatives)
+    agent.select_top_creatives = lambda: creatives
+    # Every shard of both queries has its prompt built before any answer comes back
+    barrier = threading.Barrier(4, timeout=5)
+
+    def fake_stream(prompt, refresh=False):
+        barrier.wait()
+        yield json.dumps({"creative_recommendations": []})
+
+    monkeypatch.setattr(module, "stream_gemini", fake_stream)
+    queries = {"short": ["x"], "long": ["a much longer hypothesis"] * 50}
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        outputs = dict(zip(queries, pool.map(
+            lambda hypotheses: agent.generate_improvements(insights={"hypotheses": hypotheses}),
+            queries.values(),
+        )))
+
+    def insight_tokens(output):
+        return {s["tokens"] for p in output["shards"]["prompts"] for s in p["sections"] if s["name"] == "insights"}
+
+    assert len(outputs["short"]["shards"]["prompts"]) == 2
+    short, long = insight_tokens(outputs["short"]), insight_tokens(outputs["long"])
+    assert len(short) == len(long) == 1 and max(short) < min(long)
+    assert not hasattr(agent, "prompt_report")
+
+
+@pytest.mark.unit
+def test_parse_llm_output_keeps_complete_items_of_truncated_output():
+    agent = CreativeAgent(config=load_config())
+    text = 'Sure! ```json\n{"creative_recommendations": [{"creative_id": "CR-1", "note": "a } b"}, {"creative_id": "CR-2", "recom'
+    parsed = agent._parse_llm_output(text)
+    assert parsed == {"creative_recommendations": [{"creative_id": "CR-1", "note": "a } b"}], "truncated": True}
+    assert agent._parse_llm_output('{"other": 1}')["raw_output"] == '{"other": 1}'
+    assert agent._parse_llm_output("no json")["raw_output"] == "no json"
+
+
+@pytest.mark.unit
+def test_shard_without_a_recommendations_list_is_retried_then_failed(tmp_path, monkeypatch):
+    from src.agents import creative_agent as module
+
+    config = load_config()
+    config["creative"].update(top_k=2, shard_by="none", shard_size=1, max_workers=1, shard_retries=1)
+    agent = CreativeAgent(config=config, creative_output_path=tmp_path / "creatives.json")
+    agent.underperformers = [None] * 2
+    creatives = [{"creative_id": "CR-0", "campaign_name": "A"}, {"creative_id": "CR-1", "campaign_name": "A"}]
+    agent.creative_summary = pd.DataFrame(creatives)
+    agent.select_top_creatives = lambda: creatives
+
+    def fake_stream(prompt, refresh=False):
+        if "CR-1\t" in prompt:
+            yield json.dumps({"recommendations": [{"creative_id": "CR-1"}]})  # valid JSON, wrong key
+        else:
+            yield json.dumps({"creative_recommendations": [{"creative_id": "CR-0"}]})
+
+    monkeypatch.setattr(module, "stream_gemini", fake_stream)
+    output = agent.generate_improvements(insights={"hypotheses": []})
+
+    assert [r["creative_id"] for r in output["creative_recommendations"]] == ["CR-0"]
+    assert output["shards"]["attempts"] == 3
+    assert output["shards"]["failed"] == [{"shard": 1, "creative_ids": ["CR-1"], "error": "malformed LLM output"}]
+
+
+def _one_shard_agent(tmp_path, retries=1):
+    config = load_config()
+    config["creative"].update(top_k=2, shard_by="none", shard_size=2, max_workers=1, shard_retries=retries)
+    agent = CreativeAgent(config=config, creative_output_path=tmp_path / "creatives.json")
+    creatives = [{"creative_id": "CR-0", "campaign_name": "A"}, {"creative_id": "CR-1", "campaign_name": "A"}]
+    agent.creative_summary = pd.DataFrame(creatives)
+    return agent, creatives
+
+
+@pytest.mark.unit
+def test_stream_failing_mid_way_is_retried_without_repeating_callbacks(tmp_path, monkeypatch):
+    from src.agents import creative_agent as module
+
+    agent, creatives = _one_shard_agent(tmp_path)
+    text = json.dumps({"creative_recommendations": [{"creative_id": "CR-0"}, {"creative_id": "CR-1"}]})
+
+    def fake_stream(prompt, refresh=False):
+        if not refresh:
+            yield text[:text.index("CR-1") - 10]  # the first recommendation completes
+            raise ConnectionError("stream reset")
+        yield text
+
+    monkeypatch.setattr(module, "stream_gemini", fake_stream)
+    streamed = []
+    result = agent._run_shard(0, creatives, {}, "{}", on_recommendation=streamed.append)
+
+    assert result["attempts"] == 2 and result["error"] is None and not result["truncated"]
+    assert [r["creative_id"] for r in result["recommendations"]] == ["CR-0", "CR-1"]
+    assert [r["creative_id"] for r in streamed] == ["CR-0", "CR-1"]
+
+    # When every attempt breaks, the partial output is kept but the failure stays visible
+    monkeypatch.setattr(module, "stream_gemini", lambda prompt, refresh=False: fake_stream(prompt, False))
+    result = agent._run_shard(0, creatives, {}, "{}")
+    assert result["error"] == "ConnectionError: stream reset" and result["truncated"]
+    assert [r["creative_id"] for r in result["recommendations"]] == ["CR-0"]
+
+
+@pytest.mark.unit
+def test_repaired_shard_response_replaces_the_cached_malformed_one(tmp_path, monkeypatch):
+    from src.utils import llm
+
+    class StubClient:
+        calls = 0
+
+        def stream_sync(self, prompt, model=None):
+            StubClient.calls += 1
+            yield "not json" if StubClient.calls == 1 else json.dumps({"creative_recommendations": []})
+
+    monkeypatch.delenv("LLM_CACHE_BYPASS")
+    monkeypatch.setattr(llm, "_cache_enabled", True)
+    monkeypatch.setattr(llm, "_cache", llm.LLMCache(path=tmp_path / "llm.sqlite"))
+    monkeypatch.setattr(llm, "get_llm_client", lambda: StubClient())
+    agent, creatives = _one_shard_agent(tmp_path)
+
+    attempts = [agent._run_shard(0, creatives, {}, "{}")["attempts"] for _ in range(3)]
+
+    assert attempts == [2, 1, 1]  # later runs are served the repaired response from cache
+    assert StubClient.calls == 2
@@ -0,0 +1,59 @@
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+import time
+import pytest
+from src.utils.dag import DAGScheduler
+
+
+@pytest.mark.unit
+def test_dag_runs_independent_nodes_concurrently():
+    def sleeper(value, seconds=0.2):
+        def fn(inputs):
+            time.sleep(seconds)
+            return value + sum(inputs.values())
+        return fn
+
+    dag = DAGScheduler(max_workers=4)
+    dag.add("a", sleeper(1))
+    dag.add("b", sleeper(2))
+    dag.add("c", sleeper(3), deps=["a", "b"])
+    results = dag.run()
+
+    assert results["c"] == 6
+    assert dag.wall_time < 0.55  # a and b overlap: ~0.4s instead of ~0.6s
+    path, _ = dag.critical_path()
+    assert path[-1] == "c" and len(path) == 2
+
+
+@pytest.mark.unit
+def test_dag_skips_dependents_of_failed_node():
+    def boom(inputs):
+        raise RuntimeError("boom")
+
+    dag = DAGScheduler()
+    dag.add("bad", boom)
+    dag.add("after_bad", lambda inputs: 1, deps=["bad"])
+    dag.add("independent", lambda inputs: 2)
+    results = dag.run()
+
+    assert results == {"independent": 2}
+    assert "bad" in dag.errors and dag.skipped == ["after_bad"]
+
+
+@pytest.mark.unit
+def test_dag_skips_every_transitive_dependent_of_failed_node():
+    def boom(inputs):
+        raise RuntimeError("boom")
+
+    dag = DAGScheduler()
+    dag.add("a", boom)
+    dag.add("b", lambda inputs: 1, deps=["a"])
+    dag.add("c", lambda inputs: 2, deps=["b"])
+    dag.add("r", lambda inputs: 3, deps=["c"])
+    dag.run()
+
+    assert list(dag.errors) == ["a"]
+    assert dag.skipped == ["b", "c", "r"]
+    assert dag.results == {}
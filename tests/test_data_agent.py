@@ -16,3 +16,74 @@ def test_data_agent_generates_summary():
     assert "roas_trend" in summary
     assert "low_ctr_summary" in summary
     assert isinstance(summary["roas_trend"], dict)
+
+
+@pytest.mark.unit
+def test_dataset_cache_round_trip_and_invalidation(tmp_path):
+    import os
+    from src.utils.data_loader import DatasetCache, load_dataset
+
+    csv_path = tmp_path / "ads.csv"
+    csv_path.write_text(Path(load_config()["paths"]["data"]).read_text(encoding="utf-8"), encoding="utf-8")
+    cache = DatasetCache(cache_dir=tmp_path / "cache")
+
+    df = load_dataset(csv_path, cache)
+    assert str(df["campaign_name"].dtype) == "category"
+    assert str(df["roas"].dtype) == "float32"
+    assert cache.load(csv_path) is not None
+
+    stat = csv_path.stat()
+    os.utime(csv_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    assert cache.load(csv_path) is None
+
+
+@pytest.mark.unit
+def test_streaming_summary_matches_in_memory():
+    config = load_config()
+    agent = DataAgent(config)
+    agent.chunksize = 17
+
+    in_memory = agent.summarize_metrics(agent.load_data())
+    streamed = agent.summarize_metrics_streaming(agent.load_chunks())
+
+    assert streamed["dataset_rows"] == in_memory["dataset_rows"]
+    assert streamed["roas_trend"] == in_memory["roas_trend"]
+    assert streamed["low_ctr_summary"] == in_memory["low_ctr_summary"]
+    assert streamed["segment_drivers"]["roas_change"] == pytest.approx(
+        in_memory["segment_drivers"]["roas_change"], abs=1e-4
+    )
+    for col, stats in in_memory["overall_summary"].items():
+        for stat, value in stats.items():
+            assert streamed["overall_summary"][col][stat] == pytest.approx(value, rel=1e-5)
+
+
+@pytest.mark.unit
+def test_incremental_summary_ingests_new_dates_and_detects_edits(tmp_path, capsys):
+    import pandas as pd
+
+    config = load_config()
+    full = pd.read_csv(config["paths"]["data"]).sort_values("date", kind="stable")
+    last_day = full["date"].max()
+    csv_path = tmp_path / "ads.csv"
+    full[full["date"] < last_day].to_csv(csv_path, index=False)
+
+    config = {**config, "paths": {**config["paths"], "data": str(csv_path),
+                                  "aggregate_store": str(tmp_path / "daily.json")}}
+    agent = DataAgent(config)
+    agent.summarize_incremental()
+
+    full.to_csv(csv_path, index=False)
+    capsys.readouterr()
+    incremental = agent.summarize_incremental()
+    assert "Aggregated 1 new date(s)" in capsys.readouterr().out
+
+    expected = agent.summarize_metrics(pd.read_csv(csv_path))
+    assert incremental["dataset_rows"] == expected["dataset_rows"]
+    assert incremental["roas_trend"] == expected["roas_trend"]
+    assert incremental["low_ctr_summary"]["count"] == expected["low_ctr_summary"]["count"]
+
+    edited = full.copy()
+    edited.iloc[0, edited.columns.get_loc("spend")] += 1
+    edited.to_csv(csv_path, index=False)
+    agent.summarize_incremental()
+    assert "rebuilding aggregates" in capsys.readouterr().out
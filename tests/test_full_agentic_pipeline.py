@@ -13,7 +13,7 @@ class MockGenerativeModel:
     def __init__(self, *args, **kwargs):
         pass
 
-    def generate_content(self, prompt):
+    def generate_content(self, prompt, **kwargs):
         # Return simple structured mock output to simulate Gemini response
         class Response:
             text = json.dumps({
@@ -27,6 +27,9 @@ class MockGenerativeModel:
             })
         return Response()
 
+# The creative stage streams its own response shape
+pytestmark = pytest.mark.usefixtures("creative_llm")
+
 # Replace real class with mock globally
 genai.GenerativeModel = MockGenerativeModel
 
@@ -120,3 +123,41 @@ def test_full_agentic_pipeline(config, reports_dir):
 
     except Exception as e:
         pytest.fail(f"Full pipeline test failed with error: {e}")
+
+
+@pytest.mark.integration
+def test_pipeline_runs_in_memory(config, tmp_path):
+    """Artifacts flow between stages in memory; nothing is written with persist=False."""
+    from src.orchestrator import run_pipeline
+    from src.utils.artifacts import ArtifactSink
+
+    sink = ArtifactSink(tmp_path / "reports", persist=False)
+    dag = run_pipeline("Analyze ROAS drop", config, sink=sink)
+
+    assert not dag.failed, dag.errors
+    for name in ["data_summary.json", "insights.json", "evaluation_results.json",
+                 "creatives.json", "report.md"]:
+        assert name in sink.artifacts
+    assert not (tmp_path / "reports").exists()
+
+
+@pytest.mark.integration
+def test_batch_mode_writes_per_query_reports(config, tmp_path):
+    from src.batch import run_batch
+
+    queries = tmp_path / "queries.jsonl"
+    queries.write_text(
+        "\n".join(json.dumps(q) for q in [
+            {"request_id": "q-1", "query": "Analyze ROAS drop"},
+            {"request_id": "q-2", "query": "Why did CTR fall in US"},
+            {"title": "Analyze ROAS drop for Men ComfortMax Launch"},
+        ]),
+        encoding="utf-8",
+    )
+
+    results = run_batch(queries, output_dir=tmp_path / "batch", workers=2, config=config)
+
+    assert [r["status"] for r in results] == ["completed"] * 3
+    for r in results:
+        assert (Path(r["output_dir"]) / "report.md").exists()
+    assert (tmp_path / "batch" / "batch_summary.json").exists()
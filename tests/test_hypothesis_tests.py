@@ -0,0 +1,79 @@
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+import numpy as np
+import pytest
+from src.agents.evaluator_agent import EvaluatorAgent
+from src.utils import hypothesis_tests
+from src.utils.config_loader import load_config
+from src.utils.synthetic_data import generate_frame
+
+HYPOTHESES = {"hypotheses": [
+    {"id": "H1", "title": "Creative fatigue", "confidence": 0.7},
+    {"id": "H2", "title": "Rising auction competition", "confidence": 0.6},
+    {"id": "H3", "title": "Audience targeting differences", "confidence": 0.6},
+    {"id": "H4", "title": "Landing page outage", "confidence": 0.5},
+]}
+
+
+@pytest.fixture(scope="module")
+def frame():
+    return generate_frame(20_000, seed=7)
+
+
+@pytest.mark.unit
+def test_classify_maps_keywords_to_test_types():
+    assert hypothesis_tests.classify({"title": "Ad creative fatigue"}) == "fatigue"
+    assert hypothesis_tests.classify({"title": "Higher CPMs from auction pressure"}) == "competition"
+    assert hypothesis_tests.classify({"title": "Weak lookalike audience"}) == "audience"
+    assert hypothesis_tests.classify({"title": "Budget shift", "evidence": "Retargeting CTR is higher"}) == "audience"
+    assert hypothesis_tests.classify({"title": "Landing page outage"}) is None
+
+
+@pytest.mark.unit
+def test_results_are_seeded_and_independent_of_block_layout(frame):
+    arrays = hypothesis_tests.prepare_arrays(frame)
+    first = hypothesis_tests.run_tests(hypothesis_tests.TEST_TYPES, arrays, permutations=1200, seed=3)
+    again = hypothesis_tests.run_tests(hypothesis_tests.TEST_TYPES, arrays, permutations=1200, seed=3)
+    # A tiny matrix budget changes how each block is chunked, not what it draws
+    original = hypothesis_tests.MAX_BLOCK_ELEMENTS
+    hypothesis_tests.MAX_BLOCK_ELEMENTS = 50_000
+    try:
+        chunked = hypothesis_tests.run_tests(hypothesis_tests.TEST_TYPES, arrays, permutations=1200, seed=3)
+    finally:
+        hypothesis_tests.MAX_BLOCK_ELEMENTS = original
+
+    assert set(first) == set(hypothesis_tests.TEST_TYPES)
+    for test_type in first:
+        assert first[test_type]["permuted"].shape[0] == 1200
+        assert np.array_equal(first[test_type]["permuted"], again[test_type]["permuted"])
+        assert np.array_equal(first[test_type]["permuted"], chunked[test_type]["permuted"])
+
+
+@pytest.mark.unit
+def test_injected_effects_are_detected(frame):
+    df = frame.copy()
+    days = (df["date"].astype("datetime64[ns]") - df["date"].astype("datetime64[ns]").min()).dt.days
+    late = days >= days.max() / 2
+    # CPM up 40% in the second half at unchanged CTR, Retargeting CTR doubled
+    df.loc[late, "spend"] = df.loc[late, "spend"] * 1.4
+    retargeting = df["audience_type"] == "Retargeting"
+    df.loc[retargeting, "clicks"] = df.loc[retargeting, "clicks"] * 2
+
+    config = load_config()
+    config["evaluation"] = {"permutations": 500}
+    results = {r["id"]: r for r in EvaluatorAgent(config, data=df).validate_hypotheses(HYPOTHESES, {})}
+
+    assert results["H2"]["test"]["type"] == "competition"
+    assert results["H2"]["validated"] is True
+    assert results["H2"]["test"]["p_value"] < 0.01
+    assert results["H2"]["test"]["effect"]["cpm_change"] == pytest.approx(0.4, abs=0.05)
+    assert results["H3"]["validated"] is True
+    assert results["H1"]["validated"] is False  # no decay was injected
+    assert results["H4"]["test"] == {"type": "untested"}
+    assert results["H4"]["validated_confidence"] == 0.5
+
+    # Same data, same seed: same verdicts
+    rerun = EvaluatorAgent(config, data=df).validate_hypotheses(HYPOTHESES, {})
+    assert rerun == list(results.values())
@@ -0,0 +1,47 @@
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+import json
+
+import pytest
+from src.utils.json_stream import JSONStreamParser, iter_items
+
+PLAN = {
+    "objective": "Analyze {ROAS} drop",
+    "subtasks": [
+        {"agent": "Data Agent", "action": "Summarize \"spend\" and \\\\ roas", "inputs": {"subtasks": []}},
+        {"agent": "Insight Agent", "action": "Explain [drops]", "depends_on": [1]},
+        {"agent": "Creative Agent", "action": "Propose copy"},
+    ],
+}
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("chunk_size", [1, 3, 16, 10_000])
+def test_items_are_emitted_as_they_complete_at_any_chunking(chunk_size):
+    text = "Here is the plan:\n```json\n" + json.dumps(PLAN, indent=2) + "\n```\nLet me know {if} needed."
+    parser = JSONStreamParser("subtasks")
+    seen = []
+    for start in range(0, len(text), chunk_size):
+        for item in parser.feed(text[start:start + chunk_size]):
+            seen.append((item, parser.complete))
+
+    assert [item for item, _ in seen] == PLAN["subtasks"]
+    if chunk_size == 1:
+        # Each item is available before the root object closes
+        assert not any(done for _, done in seen)
+    assert parser.complete and parser.document() == PLAN
+
+
+@pytest.mark.unit
+def test_truncated_stream_keeps_complete_items():
+    text = json.dumps(PLAN)
+    cut = text.index('"Creative Agent"') + 5
+    chunks = [text[i:i + 11] for i in range(0, cut, 11)]
+    assert list(iter_items(chunks, "subtasks")) == PLAN["subtasks"][:2]
+
+    parser = JSONStreamParser("subtasks")
+    parser.feed(text[:cut])
+    assert parser.document() is None
+    assert parser.result({"objective": "q"}) == {"objective": "q", "subtasks": PLAN["subtasks"][:2]}
@@ -0,0 +1,30 @@
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+import pytest
+from src.utils.llm import LLMCache
+
+
+@pytest.mark.unit
+def test_llm_cache_hits_and_lru_eviction(tmp_path):
+    cache = LLMCache(path=tmp_path / "llm.sqlite", max_entries=2)
+
+    key_a = cache.make_key("gemini-2.0-flash", "prompt A", 0.7)
+    assert key_a != cache.make_key("gemini-2.0-flash", "prompt A", 0.2)
+    assert cache.get(key_a) is None
+
+    cache.set(key_a, "gemini-2.0-flash", "response A")
+    assert cache.get(key_a) == "response A"
+
+    key_b = cache.make_key("gemini-2.0-flash", "prompt B")
+    key_c = cache.make_key("gemini-2.0-flash", "prompt C")
+    cache.set(key_b, "gemini-2.0-flash", "response B")
+    cache.get(key_a)  # A is now more recently used than B
+    cache.set(key_c, "gemini-2.0-flash", "response C")
+
+    assert cache.get(key_b) is None
+    assert cache.get(key_a) == "response A"
+    stats = cache.stats()
+    assert stats["entries"] == 2
+    assert stats["hits"] == 3 and stats["misses"] == 2
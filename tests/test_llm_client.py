@@ -0,0 +1,153 @@
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from src.utils.llm_client import AsyncLLMClient, HTTPTransport, LLMError
+
+
+class FakeLLMServer:
+    """
+    Local stand-in for the model API: fails the first `failures` requests with
+    `status`, and answers the first `slow` requests only after `delay` seconds.
+    Streaming requests get `chunks` as NDJSON lines, `chunk_delay` seconds apart.
+    """
+
+    def __init__(self, failures=0, status=429, slow=0, delay=0.0, chunks=(), chunk_delay=0.0):
+        self.requests = []
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                server.requests.append(body)
+                if len(server.requests) <= slow:
+                    time.sleep(delay)
+                if body.get("stream") and chunks:
+                    self.send_response(200)
+                    self.send_header("Content-Type", "application/x-ndjson")
+                    self.send_header("Connection", "close")
+                    self.end_headers()
+                    try:
+                        for text in chunks:
+                            self.wfile.write(json.dumps({"text": text}).encode() + b"\n")
+                            self.wfile.flush()
+                            time.sleep(chunk_delay)
+                    except OSError:
+                        pass  # client gave up
+                    self.close_connection = True
+                    return
+                if len(server.requests) <= failures:
+                    code, payload = status, {"error": "try later"}
+                else:
+                    code, payload = 200, {"text": f"echo: {body['prompt']}"}
+                data = json.dumps(payload).encode()
+                self.send_response(code)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}/generate"
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.httpd.shutdown()
+
+
+@pytest.mark.unit
+def test_client_retries_rate_limited_requests():
+    server = FakeLLMServer(failures=2, status=429)
+    client = AsyncLLMClient(HTTPTransport(server.url), backoff_base=0.01, max_retries=3)
+    try:
+        assert client.generate_sync("hello") == "echo: hello"
+        assert len(server.requests) == 3
+        assert client.stats["retries"] == 2
+    finally:
+        client.close()
+        server.close()
+
+
+@pytest.mark.unit
+def test_client_gives_up_on_non_retryable_errors():
+    server = FakeLLMServer(failures=5, status=400)
+    client = AsyncLLMClient(HTTPTransport(server.url), backoff_base=0.01)
+    try:
+        with pytest.raises(LLMError) as excinfo:
+            client.generate_sync("hello")
+        assert excinfo.value.status == 400
+        assert len(server.requests) == 1
+    finally:
+        client.close()
+        server.close()
+
+
+@pytest.mark.unit
+def test_timed_out_attempt_is_abandoned_by_the_transport_before_the_retry():
+    server = FakeLLMServer(slow=1, delay=1.0)
+    transport = HTTPTransport(server.url)
+    client = AsyncLLMClient(transport, backoff_base=0.01, max_retries=2, max_concurrency=1, timeout=0.2)
+    finished = []
+    call = transport._call
+
+    def tracked_call(*args):
+        try:
+            return call(*args)
+        finally:
+            finished.append(time.monotonic())
+
+    transport._call = tracked_call
+    try:
+        started = time.monotonic()
+        assert client.generate_sync("hello") == "echo: hello"
+        assert client.stats["retries"] == 1 and len(server.requests) == 2
+        # The first attempt's thread ended at its socket timeout, not when the slow response came
+        assert finished[0] - started < 0.9
+    finally:
+        client.close()
+        server.close()
+
+
+@pytest.mark.unit
+def test_stalled_stream_is_cut_off_by_the_read_timeout():
+    server = FakeLLMServer(chunks=["a", "b"], chunk_delay=1.0)
+    client = AsyncLLMClient(HTTPTransport(server.url), backoff_base=0.01, timeout=0.2)
+    received = []
+    try:
+        started = time.monotonic()
+        with pytest.raises(LLMError) as excinfo:
+            for chunk in client.stream_sync("hello"):
+                received.append(chunk)
+        assert excinfo.value.status == 408
+        assert received == ["a"] and time.monotonic() - started < 0.9
+        # Text was already handed out, so the stream is not retried
+        assert len(server.requests) == 1
+    finally:
+        client.close()
+        server.close()
+
+
+@pytest.mark.unit
+def test_stream_is_abandoned_once_the_deadline_passes_between_chunks():
+    server = FakeLLMServer(chunks=[str(i) for i in range(10)], chunk_delay=0.1)
+    client = AsyncLLMClient(HTTPTransport(server.url), timeout=1.0)
+    received = []
+    try:
+        with pytest.raises(LLMError) as excinfo:
+            for chunk in client.stream_sync("hello", deadline=0.25):
+                received.append(chunk)
+        assert excinfo.value.status == 504
+        assert 0 < len(received) < 10
+    finally:
+        client.close()
+        server.close()
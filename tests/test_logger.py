@@ -0,0 +1,61 @@
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+import gzip
+import json
+import pytest
+from src.utils.logger import BufferedLogWriter
+
+
+@pytest.mark.unit
+def test_log_writer_batches_truncates_and_rotates(tmp_path):
+    log_file = tmp_path / "system.log"
+    writer = BufferedLogWriter(path=log_file, batch_size=1000, flush_interval=60,
+                               max_bytes=2000, backup_count=2, compress=True, max_detail_chars=100)
+
+    writer.submit({"agent": "Test", "event": "big", "details": {"rows": list(range(1000))}})
+    assert not log_file.exists()  # still buffered
+    writer.flush()
+
+    entry = json.loads(log_file.read_text(encoding="utf-8").splitlines()[0])
+    assert entry["details"]["truncated"] is True
+    assert entry["details"]["keys"] == ["rows"]
+
+    for i in range(40):
+        writer.submit({"agent": "Test", "event": f"event-{i}", "details": {"i": i}})
+        writer.flush()
+
+    assert (tmp_path / "system.log.1.gz").exists()
+    with gzip.open(tmp_path / "system.log.1.gz", "rt", encoding="utf-8") as f:
+        assert all(json.loads(line)["agent"] == "Test" for line in f)
+    assert log_file.stat().st_size <= 2000
+
+
+@pytest.mark.unit
+def test_unserializable_payload_is_dropped_without_killing_the_writer(tmp_path, capsys):
+    writer = BufferedLogWriter(path=tmp_path / "system.log", flush_interval=60)
+    writer.submit({"agent": "Test", "event": "bad", "details": {("tuple", "key"): 1}})
+    writer.submit({"agent": "Test", "event": "good", "details": {}})
+    writer.flush()  # returns instead of hanging on a dead worker
+
+    lines = (tmp_path / "system.log").read_text(encoding="utf-8").splitlines()
+    assert [json.loads(line)["event"] for line in lines] == ["good"]
+    assert "Dropped unserializable log entry" in capsys.readouterr().out
+
+
+@pytest.mark.unit
+def test_log_event_snapshots_details_on_the_calling_thread(tmp_path, monkeypatch):
+    from src.utils import logger
+
+    writer = BufferedLogWriter(path=tmp_path / "system.log", flush_interval=60)
+    monkeypatch.setattr(logger, "_writer", writer)
+    plan = {"steps": [1]}
+    logger.log_event("Test", "plan", plan)
+    logger.log_event("Test", "odd", {("tuple", "key"): 1})
+    plan["steps"].append(2)  # later mutation must not leak into the logged entry
+    logger.flush_logs()
+
+    entries = [json.loads(line) for line in (tmp_path / "system.log").read_text(encoding="utf-8").splitlines()]
+    assert entries[0]["details"] == {"steps": [1]}
+    assert entries[1]["details"]["unserializable"] is True
@@ -0,0 +1,128 @@
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+import json
+
+import pytest
+
+import google.generativeai as genai
+
+from src.utils.artifacts import ArtifactSink
+from src.utils.config_loader import load_config
+from src.utils.dag import DAGScheduler
+from src.utils.memo import StageMemo
+
+
+def _graph(memo, config, sink, prompt, calls):
+    """data -> creative (reads `prompt`) -> report, mirroring the real stage shapes."""
+    def data(inputs):
+        calls.append("data")
+        sink.put("data_summary.json", {"rows": 3})
+        return {"rows": 3}
+
+    def creative(inputs):
+        calls.append("creative")
+        return {"ideas": Path(prompt).read_text(), "rows": inputs["data"]["rows"]}
+
+    def report(inputs):
+        calls.append("report")
+        sink.put("report.md", f"# {inputs['creative']['ideas']}")
+        return "done"
+
+    dag = DAGScheduler(max_workers=2)
+    specs = {"data": {"data": True}, "creative": {"files": [prompt]}, "report": {}}
+    for name, fn, deps in [("data", data, []), ("creative", creative, ["data"]), ("report", report, ["creative"])]:
+        dag.add(name, memo.wrap(name, fn, specs[name], deps, config, sink), deps=deps)
+    return dag
+
+
+@pytest.fixture
+def workspace(tmp_path):
+    config = load_config()
+    data = tmp_path / "ads.csv"
+    data.write_text("date,spend\n2025-01-01,1.0\n", encoding="utf-8")
+    prompt = tmp_path / "creative_prompt.md"
+    prompt.write_text("v1", encoding="utf-8")
+    config["paths"]["data"] = str(data)
+    return config, data, prompt, tmp_path / "memo.sqlite"
+
+
+def _run(config, prompt, path, force=False):
+    memo, sink, calls = StageMemo(path, force=force), ArtifactSink(persist=False), []
+    dag = _graph(memo, config, sink, str(prompt), calls)
+    dag.run()
+    assert not dag.failed, dag.errors
+    return memo, sink, calls
+
+
+@pytest.mark.unit
+def test_only_stages_with_changed_inputs_rerun(workspace):
+    config, data, prompt, path = workspace
+    assert _run(config, prompt, path)[2] == ["data", "creative", "report"]
+
+    memo, sink, calls = _run(config, prompt, path)
+    assert calls == []
+    assert memo.status == {"data": "hit", "creative": "hit", "report": "hit"}
+    # Artifacts published by cached stages are replayed into the sink
+    assert sink.artifacts == {"data_summary.json": {"rows": 3}, "report.md": "# v1"}
+
+    prompt.write_text("v2", encoding="utf-8")
+    memo, sink, calls = _run(config, prompt, path)
+    assert calls == ["creative", "report"]
+    assert sink.get("report.md") == "# v2"
+
+    # New rows change the dataset hash, but the data stage's output is the same,
+    # so everything downstream is still served from cache
+    with open(data, "a", encoding="utf-8") as f:
+        f.write("2025-01-02,2.0\n")
+    assert _run(config, prompt, path)[2] == ["data"]
+
+    memo, _, calls = _run(config, prompt, path, force=True)
+    assert calls == ["data", "creative", "report"]
+    assert set(memo.status.values()) == {"forced"}
+
+
+@pytest.mark.unit
+def test_store_evicts_least_recently_used_entries_by_size(tmp_path):
+    memo = StageMemo(tmp_path / "memo.sqlite", max_bytes=2500)
+    for i in range(5):
+        memo.store.set(f"k{i}", "stage", "x" * 1000)
+    stats = memo.store.stats()
+    assert stats["bytes"] <= 2500 and stats["entries"] == 2
+    assert memo.store.get("k4") is not None and memo.store.get("k0") is None
+
+
+class MockGenerativeModel:
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def generate_content(self, prompt, **kwargs):
+        class Response:
+            text = json.dumps({"objective": "Analyze ROAS drop",
+                               "subtasks": [{"agent": "Data Agent", "action": "Analyze data trends"}]})
+        return Response()
+
+
+@pytest.mark.integration
+def test_repeated_pipeline_run_is_served_from_the_memo(monkeypatch, tmp_path, creative_llm):
+    from src.orchestrator import run_pipeline
+
+    monkeypatch.setattr(genai, "GenerativeModel", MockGenerativeModel)
+    config = load_config()
+    first_sink = ArtifactSink(persist=False)
+    run_pipeline("Analyze ROAS drop", config, sink=first_sink, memo=StageMemo(tmp_path / "memo.sqlite"))
+
+    memo, sink = StageMemo(tmp_path / "memo.sqlite"), ArtifactSink(persist=False)
+    dag = run_pipeline("Analyze ROAS drop", config, sink=sink, memo=memo)
+
+    assert not dag.failed, dag.errors
+    assert memo.status.pop("creative_analysis") == "uncached"
+    assert set(memo.status.values()) == {"hit"}
+    assert sink.artifacts == json.loads(json.dumps(first_sink.artifacts))
+
+    # A new query only changes the plan, which only the report consumes
+    memo = StageMemo(tmp_path / "memo.sqlite")
+    run_pipeline("Why did CTR fall", config, sink=ArtifactSink(persist=False), memo=memo)
+    assert {s for s, status in memo.status.items() if status == "miss"} <= {"planner", "report"}
+    assert memo.status["insight"] == memo.status["creative"] == "hit"
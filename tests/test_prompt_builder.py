@@ -0,0 +1,78 @@
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+import json
+
+import pytest
+from src.utils.llm_client import estimate_tokens
+from src.utils.prompt_builder import PromptBuilder, encode, to_table
+
+SUMMARY = {
+    "overall_summary": {
+        "spend": {"count": 100.0, "mean": 531.04213, "max": 14375.31},
+        "roas": {"count": 99.0, "mean": 10.598, "max": 690.85},
+    },
+    "roas_trend": {"start_roas": 6.5, "end_roas": 4.9, "trend_direction": "decline", "change_point": None},
+    "segment_drivers": {
+        "top_segments": [
+            {"segment": {"campaign_name": f"c{i}", "platform": "Instagram"}, "contribution": -0.1 / (i + 1),
+             "spend_share": 0.05, "baseline_spend": 1000.0}
+            for i in range(40)
+        ],
+    },
+    "timestamp": "2025-10-27T13:56:40",
+}
+
+
+@pytest.mark.unit
+def test_compact_encoding_is_tabular_and_smaller_than_indented_json():
+    table = to_table([{"id": "H1", "note": "a\tb"}, {"id": "H2", "confidence": 0.123456}])
+    assert table.split("\n") == ["id\tnote\tconfidence", "H1\ta b\t", "H2\t\t0.1235"]
+
+    text = encode(SUMMARY)
+    assert "key\tcount\tmean\tmax" in text
+    assert "spend\t100\t531.0421\t14375.31" in text
+    assert "campaign_name=c0; platform=Instagram" in text
+    assert estimate_tokens(text) < 0.6 * estimate_tokens(json.dumps(SUMMARY, indent=2))
+
+
+@pytest.mark.unit
+def test_builder_packs_to_budget_and_reports_cuts():
+    instructions = "Explain the ROAS change. " * 20
+    builder = PromptBuilder(budget_tokens=None, drop_fields={"timestamp", "baseline_spend"})
+    builder.add("instructions", instructions, required=True)
+    for key, value in SUMMARY.items():
+        builder.add(key, value, priority=2 if key == "segment_drivers" else 3, header=f"## {key}")
+    unbounded = builder.build()
+    assert "baseline_spend" not in unbounded and "## timestamp" not in unbounded
+    assert builder.report["truncated"] is False
+
+    budget = estimate_tokens(unbounded) // 2
+    builder.budget_tokens = budget
+    prompt = builder.build()
+    report = builder.report
+
+    assert estimate_tokens(prompt) <= budget
+    assert prompt.startswith(instructions)
+    assert "trend_direction: decline" in prompt
+    # Lowest-priority section is cut, keeping its highest-ranked rows
+    segments = next(s for s in report["sections"] if s["name"] == "segment_drivers")
+    kept, total = segments["cut_lists"]["top_segments"]
+    assert 1 <= kept < total == 40
+    assert "campaign_name=c0;" in prompt and f"campaign_name=c{kept};" not in prompt
+    assert report["truncated"] is True
+
+
+@pytest.mark.unit
+def test_rank_by_orders_items_and_sections_drop_when_nothing_fits():
+    hypotheses = {"hypotheses": [{"id": f"H{i}", "confidence": c} for i, c in enumerate([0.2, 0.9, 0.5])]}
+    builder = PromptBuilder(budget_tokens=None)
+    builder.add("insights", hypotheses, rank_by="confidence")
+    assert [line.split("\t")[0].strip() for line in builder.build().split("\n")[2:]] == ["H1", "H2", "H0"]
+
+    builder = PromptBuilder(budget_tokens=10)
+    builder.add("instructions", "x" * 36, required=True)
+    builder.add("insights", hypotheses, min_items=2)
+    assert builder.build() == "x" * 36
+    assert builder.report["sections"][1]["dropped"] is True
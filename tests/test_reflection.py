@@ -0,0 +1,105 @@
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+import pytest
+from src.agents.reflection import ReflectionLoop
+from src.utils.artifacts import ArtifactSink
+from src.utils.config_loader import load_config
+
+
+class FakeEvaluator:
+    """Scores hypotheses by a fixed title -> confidence table and counts the calls."""
+
+    def __init__(self, scores):
+        self.scores = scores
+        self.evaluated = []
+
+    def validate_hypotheses(self, insights, summary):
+        self.evaluated.append([h["title"] for h in insights["hypotheses"]])
+        return [{
+            "id": h["id"],
+            "title": h["title"],
+            "validated_confidence": self.scores.get(h["title"], 0.2),
+            "validated": self.scores.get(h["title"], 0.2) > 0.6,
+            "reasoning": "",
+            "test": {"type": "fatigue"},
+        } for h in insights["hypotheses"]]
+
+
+class FakeInsightAgent:
+    """Returns the queued proposals, one list per reflection round."""
+
+    def __init__(self, rounds):
+        self.rounds = list(rounds)
+        self.feedback = []
+        self.last_usage = {"prompt_tokens": 120, "response_tokens": 30}
+
+    def reflect(self, feedback, facts):
+        self.feedback.append(feedback)
+        return self.rounds.pop(0) if self.rounds else []
+
+
+def _config(threshold=0.75, max_reflections=3):
+    config = load_config()
+    config["thresholds"].update(evaluation_confidence=threshold, max_reflections=max_reflections,
+                                reflection_min_gain=0.02)
+    return config
+
+
+INSIGHTS = {"hypotheses": [
+    {"id": "H1", "title": "Creative fatigue", "confidence": 0.8},
+    {"id": "H2", "title": "Weather", "confidence": 0.6},
+]}
+
+
+@pytest.mark.unit
+def test_no_reflection_when_confidence_meets_threshold():
+    evaluator = FakeEvaluator({"Creative fatigue": 0.9, "Weather": 0.8})
+    insight = FakeInsightAgent([])
+    insights, evaluation = ReflectionLoop(_config(), insight, evaluator).run(INSIGHTS, {"roas_trend": {}})
+
+    assert evaluation["reflection"]["reflections"] == 0
+    assert evaluation["reflection"]["stop_reason"] == "threshold_met"
+    assert insight.feedback == []
+    assert insights is INSIGHTS
+
+
+@pytest.mark.unit
+def test_reflection_replaces_rejected_hypotheses_with_delta_context():
+    evaluator = FakeEvaluator({"Creative fatigue": 0.9, "Auction competition": 0.8})
+    insight = FakeInsightAgent([[{"id": "H1", "title": "Auction competition", "confidence": 0.7}]])
+    sink = ArtifactSink(persist=False)
+    insights, evaluation = ReflectionLoop(_config(), insight, evaluator).run(INSIGHTS, {"roas_trend": {}}, sink)
+
+    # Only the rejected hypothesis is sent back in full, and only the new one is re-evaluated
+    assert insight.feedback[0]["validated"] == ["Creative fatigue"]
+    assert [r["title"] for r in insight.feedback[0]["rejected"]] == ["Weather"]
+    assert evaluator.evaluated == [["Creative fatigue", "Weather"], ["Auction competition"]]
+
+    assert [h["title"] for h in insights["hypotheses"]] == ["Creative fatigue", "Auction competition"]
+    assert [h["id"] for h in insights["hypotheses"]] == ["H1", "H3"]
+    reflection = evaluation["reflection"]
+    assert reflection["stop_reason"] == "threshold_met"
+    assert reflection["final_confidence"] == pytest.approx(0.85)
+    assert reflection["iterations"][1]["prompt_tokens"] == 120
+    assert reflection["total_tokens"] == 150
+    assert sink.get("insights.json") is insights
+    assert sink.get("evaluation_results.json") is evaluation
+
+
+@pytest.mark.unit
+def test_reflection_stops_early_without_new_or_better_hypotheses():
+    # Repeated titles: nothing new to evaluate
+    evaluator = FakeEvaluator({"Creative fatigue": 0.5})
+    insight = FakeInsightAgent([[{"title": "creative  FATIGUE"}]])
+    _, evaluation = ReflectionLoop(_config(), insight, evaluator).run(INSIGHTS, {})
+    assert evaluation["reflection"]["stop_reason"] == "no_new_hypotheses"
+    assert evaluation["reflection"]["reflections"] == 1
+
+    # A worse replacement: confidence has converged, the original set is kept
+    insight = FakeInsightAgent([[{"title": "Tracking outage"}], [{"title": "Unused"}]])
+    insights, evaluation = ReflectionLoop(_config(), insight, FakeEvaluator({})).run(INSIGHTS, {})
+    assert evaluation["reflection"]["stop_reason"] == "converged"
+    assert evaluation["reflection"]["reflections"] == 1
+    assert insights is INSIGHTS
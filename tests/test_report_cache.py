@@ -0,0 +1,100 @@
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+import json
+import os
+import subprocess
+
+import pytest
+from src.utils.config_loader import load_config
+from src.utils.report_cache import ReportCache
+
+ROOT = Path(__file__).resolve().parents[1]
+ARTIFACTS = {"insights.json": {"hypotheses": [{"id": "H1"}]}, "report.md": "# Report\n"}
+
+
+@pytest.fixture
+def config(tmp_path):
+    config = load_config()
+    data = tmp_path / "ads.csv"
+    data.write_text("date,spend\n2025-01-01,1.0\n", encoding="utf-8")
+    config["paths"]["data"] = str(data)
+    prompts = tmp_path / "prompts"
+    prompts.mkdir()
+    (prompts / "insight_prompt.md").write_text("v1", encoding="utf-8")
+    config["paths"]["prompts"] = str(prompts)
+    config["report_cache"] = {"enabled": True, "dir": str(tmp_path / "cache")}
+    return config
+
+
+@pytest.mark.unit
+def test_key_tracks_query_data_and_config(config):
+    key = ReportCache.key("Analyze ROAS drop", config)
+    assert ReportCache.key("  analyze   roas DROP ", config) == key
+    assert ReportCache.key("Analyze CTR drop", config) != key
+
+    config["env"] = {"GOOGLE_API_KEY": "other"}
+    assert ReportCache.key("Analyze ROAS drop", config) == key
+    config["project"]["seed"] = -1
+    assert ReportCache.key("Analyze ROAS drop", config) != key
+
+    config["project"]["seed"] = load_config()["project"]["seed"]
+    assert ReportCache.key("Analyze ROAS drop", config) == key
+    with open(config["paths"]["data"], "a", encoding="utf-8") as f:
+        f.write("2025-01-02,2.0\n")
+    assert ReportCache.key("Analyze ROAS drop", config) != key
+
+    key = ReportCache.key("Analyze ROAS drop", config)
+    (Path(config["paths"]["prompts"]) / "insight_prompt.md").write_text("v2", encoding="utf-8")
+    assert ReportCache.key("Analyze ROAS drop", config) != key
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("value, bypassed", [("1", True), ("true", True), ("YES", True), ("0", False), ("", False)])
+def test_bypass_flags_are_parsed_like_the_llm_cache(config, monkeypatch, value, bypassed):
+    from src.utils import llm, memo, report_cache
+
+    monkeypatch.setattr(llm, "_cache_enabled", True)
+    monkeypatch.setattr(llm, "_cache", object())
+    monkeypatch.setenv("LLM_CACHE_BYPASS", value)
+    assert report_cache.enabled(config) is not bypassed
+    assert memo.enabled(config) is not bypassed
+    assert (llm.get_llm_cache() is None) is bypassed
+
+
+@pytest.mark.unit
+def test_store_and_restore_round_trip(config, tmp_path):
+    cache = ReportCache.from_config(config)
+    key = cache.key("Analyze ROAS drop", config)
+    assert cache.restore(key, tmp_path / "out") == []
+
+    cache.store(key, ARTIFACTS, query="Analyze ROAS drop")
+    restored = cache.restore(key, tmp_path / "out")
+    assert sorted(p.name for p in restored) == ["insights.json", "report.md"]
+    assert json.loads((tmp_path / "out" / "insights.json").read_text()) == ARTIFACTS["insights.json"]
+
+    # An entry with a missing artifact is never served
+    (cache.cache_dir / key / "report.md").unlink()
+    assert cache.lookup(key) is None
+
+
+@pytest.mark.integration
+def test_cached_report_is_served_without_the_analytics_stack(config, tmp_path):
+    cache = ReportCache.from_config(config)
+    cache.store(cache.key("Analyze ROAS drop", config), ARTIFACTS, query="Analyze ROAS drop")
+
+    script = (
+        "import json, sys\n"
+        "from src.orchestrator import serve_cached_report\n"
+        f"config = json.loads({json.dumps(json.dumps(config))})\n"
+        f"served = serve_cached_report('Analyze ROAS drop', config, reports_dir={str(tmp_path / 'reports')!r})\n"
+        "heavy = [m for m in ('pandas', 'numpy', 'google.generativeai') if m in sys.modules]\n"
+        "print(json.dumps({'served': served, 'heavy': heavy}))\n"
+    )
+    env = {k: v for k, v in os.environ.items() if not k.endswith("_CACHE_BYPASS")}
+    proc = subprocess.run([sys.executable, "-c", script], cwd=ROOT, env=env,
+                          capture_output=True, text=True, check=True)
+
+    assert json.loads(proc.stdout.strip().splitlines()[-1]) == {"served": True, "heavy": []}
+    assert (tmp_path / "reports" / "report.md").read_text() == "# Report\n"
@@ -0,0 +1,54 @@
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+import numpy as np
+import pandas as pd
+import pytest
+from src.utils.data_loader import iter_dataset_chunks, read_dataset_csv
+from src.utils.segment_cube import SegmentCube
+
+SAMPLE = "data/sample_fb_ads.csv"
+
+
+@pytest.mark.unit
+def test_cube_rollups_match_groupby_and_decompose_the_change():
+    df = read_dataset_csv(SAMPLE)
+    cube = SegmentCube(split_date="2025-02-15").update(df)
+    assert len(list(cube.groupings())) == 63
+
+    totals = cube.totals()
+    change = totals["roas"][1] - totals["roas"][0]
+    rows = df.dropna(subset=["spend", "revenue"])
+    current = rows["date"] >= pd.Timestamp("2025-02-15")
+    expected = rows.groupby(["platform", current], observed=True)["revenue"].sum().unstack()
+
+    rollup = cube.rollup(["platform"]).set_index("platform")
+    for platform, row in rollup.iterrows():
+        assert row["revenue_base"] == pytest.approx(expected.loc[platform, False], rel=1e-6)
+        assert row["revenue_cur"] == pytest.approx(expected.loc[platform, True], rel=1e-6)
+
+    for dims in [("campaign_name",), ("creative_type", "country"), tuple(cube.dimensions)]:
+        rollup = cube.rollup(dims)
+        assert rollup["contribution"].sum() == pytest.approx(change, abs=1e-9)
+        assert np.allclose(rollup["contribution"], rollup["rate_effect"] + rollup["mix_effect"])
+
+
+@pytest.mark.unit
+def test_chunked_cube_matches_single_pass_and_ranks_drivers():
+    whole = SegmentCube().update(read_dataset_csv(SAMPLE))
+    chunked = SegmentCube()
+    for chunk in iter_dataset_chunks(SAMPLE, 23):
+        chunked.update(chunk)
+
+    assert chunked.rows == whole.rows
+    left = whole.rollup(["adset_name", "audience_type"]).sort_values(["adset_name", "audience_type"])
+    right = chunked.rollup(["adset_name", "audience_type"]).sort_values(["adset_name", "audience_type"])
+    assert np.allclose(left["contribution"], right["contribution"])
+
+    drivers = whole.drivers(top_k=5)
+    contributions = [s["contribution"] for s in drivers["top_segments"]]
+    direction = 1 if drivers["roas_change"] >= 0 else -1
+    assert contributions == sorted(contributions, key=lambda c: -direction * c)
+    assert all(c * direction > 0 for c in contributions)
+    assert set(drivers["by_dimension"]) <= set(whole.dimensions)
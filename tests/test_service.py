@@ -0,0 +1,117 @@
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+
+import pytest
+
+# --- Mock Google Generative AI (prevents live API calls) ---
+import google.generativeai as genai
+
+GATE = threading.Event()
+
+
+class GatedGenerativeModel:
+    """Mock Gemini model that holds every call until GATE is set."""
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def generate_content(self, prompt, **kwargs):
+        GATE.wait(30)
+
+        class Response:
+            text = json.dumps({
+                "objective": "Analyze ROAS drop",
+                "subtasks": [
+                    {"agent": "Data Agent", "action": "Analyze data trends"},
+                    {"agent": "Insight Agent", "action": "Generate hypotheses"},
+                ]
+            })
+        return Response()
+
+
+from src.service import AnalystService, make_server
+from src.utils.config_loader import load_config
+
+
+def _request(base, path, payload=None):
+    data = json.dumps(payload).encode() if payload is not None else None
+    try:
+        with urllib.request.urlopen(urllib.request.Request(base + path, data=data), timeout=30) as resp:
+            return resp.status, json.loads(resp.read()), resp.headers
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read()), e.headers
+
+
+@pytest.fixture
+def service(monkeypatch, tmp_path, creative_llm):
+    monkeypatch.setattr(genai, "GenerativeModel", GatedGenerativeModel)
+    GATE.clear()
+    config = load_config()
+    config["service"].update(max_workers=1, queue_size=1, persist=False, retry_after_seconds=2)
+    config["llm"]["client"]["max_retries"] = 0
+    service = AnalystService(config, output_dir=tmp_path / "service").start()
+    server = make_server(service, host="127.0.0.1", port=0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield service, "http://%s:%s" % server.server_address[:2]
+    GATE.set()
+    server.shutdown()
+    server.server_close()
+    service.stop(timeout=30)
+
+
+@pytest.mark.integration
+def test_service_queues_applies_backpressure_and_reports_metrics(service):
+    service, base = service
+    assert _request(base, "/health")[0] == 200
+
+    status, first, _ = _request(base, "/analyze", {"query": "Analyze ROAS drop", "id": "q-1"})
+    assert status == 202 and first["status"] == "queued"
+    deadline = time.time() + 10
+    while service.metrics()["in_flight"] < 1 and time.time() < deadline:
+        time.sleep(0.01)
+
+    # One job runs (blocked on the model), one waits, the next is rejected
+    assert _request(base, "/analyze", {"query": "Why did CTR fall", "id": "q-2"})[0] == 202
+    status, body, headers = _request(base, "/analyze", {"query": "Analyze ROAS drop"})
+    assert status == 503 and headers["Retry-After"] == "2"
+    assert _request(base, "/analyze", {"id": "no-query"})[0] == 400
+
+    metrics = _request(base, "/metrics")[1]
+    assert metrics["queue"] == {"depth": 1, "capacity": 1}
+    assert metrics["in_flight"] == 1
+    assert metrics["jobs"]["rejected"] == 1
+
+    GATE.set()
+    for job_id in ["q-1", "q-2"]:
+        status, job, _ = _request(base, f"/jobs/{job_id}?wait=60")
+        assert status == 200 and job["status"] == "completed", job.get("errors")
+        assert "report.md" in job["result"]["artifacts"]
+        assert job["result"]["report"]
+
+    metrics = service.metrics()
+    assert metrics["jobs"] == {"accepted": 2, "rejected": 1, "completed": 2, "failed": 0}
+    assert metrics["queue"]["depth"] == 0 and metrics["in_flight"] == 0
+    assert metrics["latency_seconds"]["run"]["p50"] > 0
+    assert _request(base, "/jobs/unknown")[0] == 404
+
+
+@pytest.mark.unit
+def test_shared_state_is_reused_until_the_data_file_changes(tmp_path):
+    config = load_config()
+    data = tmp_path / "ads.csv"
+    data.write_text(Path(config["paths"]["data"]).read_text(encoding="utf-8"), encoding="utf-8")
+    config["paths"]["data"] = str(data)
+    config.setdefault("dataset", {})["cache"] = False
+    service = AnalystService(config)
+
+    first = service.shared_state()
+    assert service.shared_state() is first
+    with open(data, "a", encoding="utf-8") as f:
+        f.write("\n")
+    assert service.shared_state() is not first
@@ -0,0 +1,38 @@
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+import pandas as pd
+import pytest
+from src.utils.data_loader import read_dataset_csv
+from src.utils.synthetic_data import generate_frame, iter_synthetic_chunks, load_profile, write_csv
+
+SAMPLE = "data/sample_fb_ads.csv"
+
+
+@pytest.mark.unit
+def test_generator_is_deterministic_and_chunk_independent():
+    profile = load_profile(SAMPLE)
+    frame = generate_frame(20_000, seed=7, profile=profile)
+    pd.testing.assert_frame_equal(frame, generate_frame(20_000, seed=7, profile=profile))
+    chunked = pd.concat(iter_synthetic_chunks(20_000, seed=7, profile=profile, chunk_rows=3_000), ignore_index=True)
+    pd.testing.assert_frame_equal(chunked, frame)
+    assert not frame.equals(generate_frame(20_000, seed=8, profile=profile))
+
+
+@pytest.mark.unit
+def test_generator_matches_sample_schema_and_distributions(tmp_path):
+    sample = pd.read_csv(SAMPLE)
+    path = write_csv(tmp_path / "synthetic.csv", 50_000, seed=42)
+    synthetic = read_dataset_csv(path)
+
+    assert list(synthetic.columns) == [c.lower() for c in sample.columns]
+    assert synthetic["date"].min() == pd.Timestamp(sample["date"].min())
+    assert synthetic["date"].max() == pd.Timestamp(sample["date"].max())
+    for col in ["creative_type", "audience_type", "platform", "country"]:
+        assert set(synthetic[col].astype(str)) <= set(sample[col])
+        shares = synthetic[col].astype(str).value_counts(normalize=True)
+        expected = sample[col].value_counts(normalize=True)
+        assert (shares - expected).abs().max() < 0.05
+    assert synthetic["ctr"].median() == pytest.approx(sample["ctr"].median(), rel=0.1)
+    assert synthetic["spend"].isna().mean() == pytest.approx(sample["spend"].isna().mean(), abs=0.01)
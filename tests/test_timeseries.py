@@ -0,0 +1,57 @@
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+import numpy as np
+import pandas as pd
+import pytest
+from src.utils import timeseries
+
+
+@pytest.mark.unit
+def test_batched_slope_rolling_and_change_points():
+    rng = np.random.default_rng(0)
+    n_series, n_days = 200, 60
+    y = rng.normal(5.0, 0.3, (n_series, n_days)) + 0.02 * np.arange(n_days)
+    y[3, 10] = np.nan
+
+    fit = timeseries.ols_slope(y)
+    assert fit["slope"][0] == pytest.approx(np.polyfit(np.arange(n_days), y[0], 1)[0])
+    valid = np.isfinite(y[3])
+    assert fit["slope"][3] == pytest.approx(np.polyfit(np.arange(n_days)[valid], y[3][valid], 1)[0])
+    assert (fit["confidence"] > 0.99).mean() > 0.9
+
+    spend = rng.uniform(50, 150, (n_series, n_days))
+    roas = np.full((n_series, n_days), 4.0)
+    roas[:, 40:] = 2.0  # every series drops 50% on day 40
+    revenue = spend * (roas + rng.normal(0, 0.1, roas.shape))
+    cp = timeseries.change_points(spend, revenue, min_segment=3)
+    assert (cp["index"] == 40).all()
+    assert np.allclose(cp["after"] / cp["before"], 0.5, atol=0.05)
+
+    rolling = timeseries.rolling_ratio(revenue, spend, 7)
+    expected = pd.Series(revenue[5]).rolling(7, min_periods=1).sum() / pd.Series(spend[5]).rolling(7, min_periods=1).sum()
+    assert np.allclose(rolling[5], expected)
+
+    grid = np.zeros((n_series, n_days, len(timeseries.COMPONENTS)))
+    grid[..., 0], grid[..., 1] = spend, revenue
+    labels = pd.DataFrame({"campaign_name": [f"c{i}" for i in range(n_series)]})
+    alerts, total = timeseries.series_alerts(labels, pd.date_range("2025-01-01", periods=n_days), grid,
+                                             "campaign", drop_pct=0.2, limit=5)
+    assert total == n_series and len(alerts) == 5
+    assert alerts[0]["type"] == "level_shift" and alerts[0]["date"] == "2025-02-10"
+
+
+@pytest.mark.unit
+def test_trend_summary_keeps_roas_trend_keys():
+    days = pd.date_range("2025-01-01", periods=30)
+    spend = np.full(30, 100.0)
+    daily = pd.DataFrame(0.0, index=days, columns=timeseries.COMPONENTS)
+    daily["roas_spend"] = spend
+    daily["revenue"] = spend * np.linspace(6, 3, 30)
+
+    trend = timeseries.trend_summary(daily, window=7, drop_pct=0.2)
+    assert {"start_roas", "end_roas", "trend_direction"} <= set(trend)
+    assert trend["trend_direction"] == "decline"
+    assert trend["start_roas"] > trend["end_roas"]
+    assert trend["slope_per_day"] == pytest.approx(-3 / 29, abs=1e-6)
@@ -0,0 +1,55 @@
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+import json
+import pytest
+from src.utils import tracing
+from src.utils.tracing import configure_tracing, finish_tracing, get_tracer, trace_span, traced
+
+
+@pytest.fixture
+def tracer():
+    yield configure_tracing({"tracing": {"enabled": True}})
+    configure_tracing({})
+
+
+@pytest.mark.unit
+def test_disabled_tracing_records_nothing():
+    configure_tracing({})
+
+    @traced("noop")
+    def work():
+        return 42
+
+    with trace_span("outer") as span:
+        assert span is None
+        assert work() == 42
+    assert get_tracer().spans == []
+
+
+@pytest.mark.unit
+def test_traced_spans_export_chrome_trace(tracer, tmp_path):
+    @traced("load", rows=lambda result, n: n)
+    def load(n):
+        return list(range(n))
+
+    with trace_span("pipeline"):
+        load(1000)
+        with trace_span("LLM.call", "llm", prompt_tokens=10) as span:
+            span.set(response_tokens=4)
+
+    summary = tracer.summary()
+    assert summary["load"]["rows"] == 1000
+    assert summary["LLM.call"]["prompt_tokens"] == 10
+    assert summary["LLM.call"]["response_tokens"] == 4
+    assert "load" in tracer.summary_table()
+
+    out = tmp_path / "trace.json"
+    assert finish_tracing({"tracing": {"output": str(out)}}) == out
+    events = json.loads(out.read_text())["traceEvents"]
+    assert {e["name"] for e in events} == {"pipeline", "load", "LLM.call"}
+    assert all(e["ph"] == "X" and e["dur"] >= 0 for e in events)
+    pipeline = next(e for e in events if e["name"] == "pipeline")
+    nested = next(e for e in events if e["name"] == "load")
+    assert pipeline["ts"] <= nested["ts"] and nested["ts"] + nested["dur"] <= pipeline["ts"] + pipeline["dur"] + 1